@@ -1,7 +1,11 @@
 import streamlit as st
 from config import config
-from utils.ai_model import get_ai_model
+from utils.ai_model import get_ai_model, render_inference_debug
 from utils.data_handler import HealthDataHandler
+from utils.data_cache import get_patient_health_data, render_cache_debug
+from utils.history_store import get_history_store
+from utils.profile_store import load_patient_profile, save_patient_profile
+from utils.speculation import track_page
 
 # Page configuration
 st.set_page_config(
@@ -63,16 +67,14 @@ st.markdown("""
 if 'ai_model' not in st.session_state:
     st.session_state.ai_model = get_ai_model()
 
+track_page('home')
+
+history_store = get_history_store()
+
 if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
+    st.session_state.chat_history = history_store.recent_chats(config.DEFAULT_PATIENT_ID, limit=10)
 
-if 'patient_data' not in st.session_state:
-    st.session_state.patient_data = {
-        'age': 30,
-        'gender': 'Not specified',
-        'conditions': 'None',
-        'medications': 'None'
-    }
+load_patient_profile(config.DEFAULT_PATIENT_ID)
 
 def main():
     """Main application"""
@@ -92,10 +94,12 @@ def main():
             value=st.session_state.patient_data['age']
         )
         
+        gender_options = ["Male", "Female", "Other", "Prefer not to say"]
         st.session_state.patient_data['gender'] = st.selectbox(
             "Gender",
-            ["Male", "Female", "Other", "Prefer not to say"],
-            index=0 if st.session_state.patient_data['gender'] == 'Male' else 1
+            gender_options,
+            index=gender_options.index(st.session_state.patient_data['gender'])
+            if st.session_state.patient_data['gender'] in gender_options else 0
         )
         
         st.session_state.patient_data['conditions'] = st.text_area(
@@ -109,12 +113,13 @@ def main():
             value=st.session_state.patient_data['medications'],
             help="List current medications"
         )
+        save_patient_profile(config.DEFAULT_PATIENT_ID)
         
         st.divider()
         
         # Quick Stats
         st.subheader("📊 Quick Stats")
-        health_data = HealthDataHandler.generate_sample_health_data(30)
+        health_data = get_patient_health_data()
         latest_metrics = health_data.iloc[-1]
         
         health_score = HealthDataHandler.calculate_health_score({
@@ -129,6 +134,9 @@ def main():
         st.metric("Health Score", f"{health_score}/100")
         st.markdown(f"**Risk Level:** :{risk_color}[{risk_level}]")
         
+        render_cache_debug()
+        render_inference_debug()
+        
         st.divider()
         st.markdown("**ℹ️ Disclaimer**")
         st.caption("This AI assistant provides information for educational purposes only. Always consult healthcare professionals for medical advice.")
@@ -199,6 +207,7 @@ def main():
             'user': user_input,
             'assistant': ai_response
         })
+        history_store.add_chat(config.DEFAULT_PATIENT_ID, user_input, ai_response)
         
         # Keep only last 10 exchanges
         if len(st.session_state.chat_history) > 10:
@@ -209,6 +218,7 @@ def main():
     # Clear chat button
     if st.session_state.chat_history:
         if st.button("🗑️ Clear Chat History"):
+            history_store.clear('chats', config.DEFAULT_PATIENT_ID)
             st.session_state.chat_history = []
             st.rerun()
     
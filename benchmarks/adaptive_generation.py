@@ -0,0 +1,91 @@
+"""Tokens and latency with fixed vs adaptive max_tokens and section early stopping
+
+Runs a fixed mix of symptom analyses, treatment plans, trend analyses and
+chats through GraniteHealthAI on the configured backend, twice:
+- "fixed": the hard-coded limits (700/700/550/450) with early stopping off
+- "adaptive": limits from the length history of the first pass, and
+  generation ending once every requested section is complete
+For each request type it reports output tokens, the mean max_tokens used,
+mean latency, and the change from fixed to adaptive. The response cache is
+off so every request reaches the model.
+
+    MODEL_BACKEND=local MODEL_NAME=ibm-granite/granite-3.0-2b-instruct python benchmarks/adaptive_generation.py --rounds 3
+"""
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SYMPTOMS = [["fever", "cough"], ["headache"], ["chest pain", "shortness of breath", "dizziness"],
+            ["fatigue", "joint pain", "rash", "fever", "nausea"]]
+CONDITIONS = ["Hypertension", "Migraine", "Type 2 Diabetes", "Asthma"]
+CHATS = ["How much water should an adult drink per day?", "Is it safe to exercise with a cold?"]
+METRICS = {"heart_rate": [72, 75, 80, 78, 90, 85], "blood_pressure_systolic": [120, 128, 135, 131, 140, 138]}
+
+
+def workload(model):
+    """(request type, call) pairs covering each request type and several input sizes"""
+    for symptoms in SYMPTOMS:
+        yield 'analyze_symptoms', lambda s=symptoms: model.analyze_symptoms(s, {'age': 45, 'gender': 'Female'})['analysis']
+    for condition in CONDITIONS:
+        yield 'generate_treatment_plan', lambda c=condition: model.generate_treatment_plan(c, {'age': 50})['plan']
+    yield 'analyze_health_trends', lambda: model.analyze_health_trends(METRICS)
+    for question in CHATS:
+        yield 'chat_response', lambda q=question: model.chat_response(q)
+
+
+def run(model, rounds: int) -> dict:
+    results = defaultdict(lambda: {'requests': 0, 'tokens': 0, 'seconds': 0.0})
+    for _ in range(rounds):
+        for method, call in workload(model):
+            started = time.perf_counter()
+            text = call()
+            r = results[method]
+            r['requests'] += 1
+            r['seconds'] += time.perf_counter() - started
+            r['tokens'] += model._count_tokens(text)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over the request mix per phase")
+    args = parser.parse_args()
+
+    os.environ.update(RESPONSE_CACHE_SIZE="0", GENERATION_LENGTHS_PATH="", ADAPTIVE_MIN_SAMPLES=str(args.rounds))
+    from config import config
+    from utils.ai_model import GraniteHealthAI
+
+    model = GraniteHealthAI()
+    if not model.client:
+        sys.exit("Model backend failed to initialize")
+
+    config.ADAPTIVE_MAX_TOKENS, config.SECTION_EARLY_STOP = False, False
+    fixed = run(model, args.rounds)
+    before = model.generation_stats()
+    config.ADAPTIVE_MAX_TOKENS, config.SECTION_EARLY_STOP = True, True
+    adaptive = run(model, args.rounds)
+    after = model.generation_stats()
+
+    print(f"{'request type':>24} {'tokens':>14} {'saved':>6} {'limit saved/req':>16} {'early stops':>12} "
+          f"{'latency s':>14} {'delta':>7}")
+    for method, f in fixed.items():
+        a = adaptive[method]
+        # Stats are kept per prompt template version, named "<method>@<variant>:<hash>"
+        stats = {key: sum(s[key] for version, s in after.items() if version.startswith(f"{method}@"))
+                 - sum(s[key] for version, s in before.items() if version.startswith(f"{method}@"))
+                 for key in ('requests', 'limit_tokens_saved', 'early_stops')}
+        f_latency, a_latency = f['seconds'] / f['requests'], a['seconds'] / a['requests']
+        saved = 1 - a['tokens'] / f['tokens'] if f['tokens'] else 0.0
+        print(f"{method:>24} {f['tokens']:>6} -> {a['tokens']:<5} {saved:>6.0%} "
+              f"{stats['limit_tokens_saved'] / stats['requests']:>16.0f} "
+              f"{stats['early_stops']:>5}/{stats['requests']:<6} "
+              f"{f_latency:>6.2f} -> {a_latency:<5.2f} {a_latency - f_latency:>+7.2f}")
+
+
+if __name__ == "__main__":
+    main()
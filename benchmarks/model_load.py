@@ -0,0 +1,79 @@
+"""Cold-start time and memory of N local-model workers, with and without shared weights
+
+Starts N worker processes one after another. Each loads the local model
+through ModelLoader, reports its load time, and then waits until every
+worker is loaded. Memory is then read from /proc:
+- USS: pages private to one process
+- PSS: shared pages split between the processes that map them
+With memory-mapped weights, every worker after the first should load
+almost instantly and add little USS. The sum of PSS is the real total.
+A bf16/fp16 checkpoint is only mapped with --keep-dtype, which runs it in
+that dtype instead of float32.
+
+    python benchmarks/model_load.py --workers 4 --model ibm-granite/granite-3b-code-instruct --keep-dtype
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run_worker(index: int, model_name: str, mmap_weights: bool, keep_dtype: bool, cache_dir: str,
+               loaded, release, results):
+    started = time.perf_counter()
+    from utils.backends import LocalTransformersBackend
+    from utils.model_loader import memory_usage
+
+    backend = LocalTransformersBackend(model_name, mmap_weights=mmap_weights, cache_dir=cache_dir,
+                                       mmap_keep_dtype=keep_dtype)
+    # One short generation so the weights are actually paged in
+    backend.generate([{"role": "user", "content": "Hello"}], max_tokens=4, temperature=0.0, top_p=1.0)
+    seconds = time.perf_counter() - started
+    loaded.set()
+    release.wait()
+    results.put({'index': index, **backend.load_stats, 'total_seconds': seconds, **memory_usage()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--model", default=os.getenv("MODEL_NAME", "ibm-granite/granite-3b-code-instruct"))
+    parser.add_argument("--keep-dtype", action="store_true", help="Map bf16/fp16 checkpoints in their stored dtype")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'mode':>8} {'worker':>7} {'start s':>8} {'weights s':>10} {'tokenizer':>10} {'dtype':>9} "
+          f"{'USS MB':>8} {'PSS MB':>8} {'RSS MB':>8}")
+    for mmap_weights in (False, True):
+        cache_dir = tempfile.mkdtemp(prefix="healthai-model-cache-")
+        release, results, workers = ctx.Event(), ctx.Queue(), []
+        for i in range(args.workers):
+            loaded = ctx.Event()
+            worker = ctx.Process(target=run_worker,
+                                 args=(i, args.model, mmap_weights, args.keep_dtype, cache_dir,
+                                       loaded, release, results))
+            worker.start()
+            workers.append(worker)
+            loaded.wait()
+        release.set()
+        rows = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+
+        rows.sort(key=lambda r: r['index'])
+        for i, r in enumerate(rows):
+            mode = "mmap" if r.get('mmap') else "private"
+            tokenizer = "cached" if r.get('tokenizer_cached') else "built"
+            print(f"{mode:>8} {i + 1:>7} {r['total_seconds']:>8.2f} {r['weights_seconds']:>10.2f} {tokenizer:>10} "
+                  f"{r['dtype']:>9} {r['uss_mb']:>8.0f} {r['pss_mb']:>8.0f} {r['rss_mb']:>8.0f}")
+        print(f"{mode:>8} {'total':>7} {'':>8} {'':>10} {'':>10} {'':>9} "
+              f"{sum(r['uss_mb'] for r in rows):>8.0f} {sum(r['pss_mb'] for r in rows):>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Latency and cost of small/large model routing, on stub backends
+
+Runs a mixed workload of chats, symptom analyses, treatment plans and
+trend analyses from several concurrent clients, three ways:
+- "large only": every call goes to the large model (no router)
+- "routed": data/routing_rules.json picks the model, no overflow
+- "routed+overflow": large-model calls also overflow to the small model
+  once the large one has max_inflight calls queued or running
+Both models are stub backends with fixed latencies, so the numbers show the
+routing policy rather than model speed. The response cache is off.
+
+    python benchmarks/model_routing.py --clients 8 --requests 20 --concurrency 4 --large-ms 400 --small-ms 60
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+def workload(model, client: int, i: int):
+    kind = i % 4
+    if kind == 0:
+        return model.chat_response(f"Client {client} question {i}: how much water should I drink?")
+    if kind == 1:
+        return model.analyze_symptoms(["fever", "cough", f"symptom {client}-{i}"], {'age': 40})['analysis']
+    if kind == 2:
+        return model.generate_treatment_plan(f"Hypertension {client}-{i}", {'age': 55})['plan']
+    return model.analyze_health_trends({"heart_rate": [70 + client, 75, 80 + i]})
+
+
+def run(model, clients: int, requests: int) -> float:
+    def client(n):
+        for i in range(requests):
+            workload(model, n, i)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--large-ms", type=float, default=400, help="Large stub latency per call")
+    parser.add_argument("--small-ms", type=float, default=60, help="Small stub latency per call")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent backend calls (INFERENCE_CONCURRENCY)")
+    args = parser.parse_args()
+
+    os.environ.update(MODEL_BACKEND="stub", SMALL_MODEL_NAME="small-stub", RESPONSE_CACHE_SIZE="0",
+                      GENERATION_LENGTHS_PATH="", INFERENCE_CONCURRENCY=str(args.concurrency))
+    from utils.ai_model import GraniteHealthAI
+    from utils.backends import StubBackend
+    from utils.model_router import LARGE, SMALL, ModelRouter
+    from config import config
+
+    total = args.clients * args.requests
+    print(f"{'mode':>16} {'route':>6} {'requests':>9} {'overflowed':>11} {'avg s':>7} {'p95 s':>7} "
+          f"{'cost':>7} {'req/s':>7}")
+    for mode in ("large only", "routed", "routed+overflow"):
+        model = GraniteHealthAI()
+        model.client = model.clients[LARGE] = StubBackend("large-stub", args.large_ms)
+        model.clients[SMALL] = StubBackend("small-stub", args.small_ms)
+        router = ModelRouter.load(config.ROUTING_RULES_PATH)
+        if mode == "large only":
+            # A router with no rules still measures the large route
+            router = ModelRouter([], routes=router.routes)
+        elif mode == "routed":
+            router.overflow = {}
+        model.router = router
+
+        elapsed = run(model, args.clients, args.requests)
+        for route, s in sorted(model.routing_stats().items()):
+            print(f"{mode:>16} {route:>6} {s['requests']:>9} {s['overflowed']:>11} {s['avg_seconds']:>7.3f} "
+                  f"{s['p95_seconds']:>7.3f} {s['cost']:>7.2f} {total / elapsed:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Bulk import and lookup latency of the patient profile store
+
+Imports --profiles synthetic profiles into a fresh database, then times
+single-profile reads (cold from SQLite and warm from the read-through
+cache), name prefix lookups, condition lookups and single-profile writes.
+The old single-file JSON save/load is timed for comparison.
+
+    python benchmarks/profile_store.py --profiles 50000 --lookups 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+NAMES = ["Ava", "Ben", "Chen", "Dana", "Eli", "Fatima", "Gus", "Hana", "Ivan", "Jo", "Kai", "Lena", "Mo", "Nia"]
+CONDITIONS = ["Hypertension", "Type 2 Diabetes", "Asthma", "Migraine", "COPD", "Arthritis", "Hypothyroidism",
+              "Depression", "Anxiety", "Obesity", "Atrial Fibrillation", "Chronic Kidney Disease"]
+
+
+def profiles(n: int, rng: random.Random):
+    for i in range(n):
+        yield {
+            'patient_id': f"p{i:06d}",
+            'name': f"{rng.choice(NAMES)} {rng.choice(NAMES)}son {i}",
+            'age': rng.randint(1, 99),
+            'gender': rng.choice(["Male", "Female", "Other"]),
+            'conditions': ", ".join(rng.sample(CONDITIONS, rng.randint(0, 3))) or "None",
+            'medications': "None",
+        }
+
+
+def timed(call, args_list) -> tuple:
+    """(p50 ms, p99 ms) over one call per argument tuple"""
+    samples = []
+    for args in args_list:
+        started = time.perf_counter()
+        call(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], samples[min(int(len(samples) * 0.99), len(samples) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=50000)
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    from utils.data_handler import HealthDataHandler
+    from utils.profile_store import ProfileStore
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ProfileStore(os.path.join(tmp, "profiles.db"), cache_size=args.lookups)
+        started = time.perf_counter()
+        written = store.bulk_import(profiles(args.profiles, rng), args.batch_size)
+        elapsed = time.perf_counter() - started
+        print(f"bulk import: {written} profiles in {elapsed:.2f}s ({written / elapsed:,.0f}/s)")
+
+        ids = [(f"p{rng.randrange(args.profiles):06d}",) for _ in range(args.lookups)]
+        print(f"{'operation':>22} {'p50 ms':>8} {'p99 ms':>8}")
+        for label, call, call_args in [
+            ("get (cold)", store.get, ids),
+            ("get (cached)", store.get, ids),
+            ("find_by_name", store.find_by_name, [(rng.choice(NAMES) + " " + rng.choice(NAMES)[:2],)
+                                                   for _ in range(args.lookups)]),
+            ("find_by_condition", lambda c: store.find_by_condition(c, limit=20),
+             [(rng.choice(CONDITIONS),) for _ in range(args.lookups)]),
+            ("put", lambda pid: store.put(pid, {'age': 40, 'conditions': "Asthma"}), ids[:1000]),
+        ]:
+            p50, p99 = timed(call, call_args)
+            print(f"{label:>22} {p50:>8.3f} {p99:>8.3f}")
+        print(f"cache: {store.stats()}")
+
+        # Old single-file storage: every save/load rewrites/reads the file
+        path = os.path.join(tmp, "patient_profile.json")
+        p50, p99 = timed(lambda: HealthDataHandler.save_patient_data({'age': 40}, path), [()] * 1000)
+        print(f"{'json save (1 patient)':>22} {p50:>8.3f} {p99:>8.3f}")
+        p50, p99 = timed(lambda: HealthDataHandler.load_patient_data(path), [()] * 1000)
+        print(f"{'json load (1 patient)':>22} {p50:>8.3f} {p99:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
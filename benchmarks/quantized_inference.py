@@ -0,0 +1,132 @@
+"""Local CPU inference: fp32 vs int8 dynamic quantization vs GGUF (llama.cpp)
+
+Each mode is measured in a fresh process. For each one, the script reports:
+- model load time, plus resident memory in total and added by the model
+- greedy-decoding throughput over a fixed prompt set
+- an accuracy spot-check against the fp32 outputs: the share of identical
+  replies and the mean text similarity
+
+    python benchmarks/quantized_inference.py --modes none int8
+    python benchmarks/quantized_inference.py --modes none int8 gguf --gguf-path models/granite-3b.Q4_K_M.gguf
+"""
+import argparse
+import difflib
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SYSTEM = "You are a professional healthcare assistant."
+
+# Fixed spot-check set covering the app's request types
+PROMPTS = [
+    "Analyze symptoms and provide likely conditions, severity and first aid.\n\nSymptoms: fever, cough, fatigue",
+    "Analyze symptoms and provide likely conditions, severity and first aid.\n\nSymptoms: chest pain, shortness of breath",
+    "Provide a medical treatment plan for: Hypertension\nPatient: Age 55 Gender: Male",
+    "Provide a medical treatment plan for: Migraine\nPatient: Age 30 Gender: Female",
+    "How much water should an adult drink per day?",
+    "What are early warning signs of type 2 diabetes?",
+]
+
+
+def resident_mb() -> float:
+    """Resident set size of this process"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def run_child(mode: str, model_name: str, gguf_path: str, max_tokens: int, threads: int):
+    from utils.backends import create_backend
+    if mode == "gguf":
+        import llama_cpp  # noqa: F401
+    else:
+        import torch  # noqa: F401
+        import transformers  # noqa: F401
+
+    # Runtime libraries are loaded first so the delta is the model itself
+    before = resident_mb()
+    started = time.perf_counter()
+    backend = create_backend("local", model_name, quantization=mode, gguf_path=gguf_path, threads=threads)
+    load_seconds = time.perf_counter() - started
+
+    # Warm-up call so one-off kernel setup is not charged to the first prompt
+    backend.generate([{"role": "user", "content": "Hello"}], max_tokens=4, temperature=0.0, top_p=1.0)
+
+    outputs, tokens = [], 0
+    started = time.perf_counter()
+    for prompt in PROMPTS:
+        messages = [{"role": "system", "content": SYSTEM}, {"role": "user", "content": prompt}]
+        text = backend.generate(messages, max_tokens=max_tokens, temperature=0.0, top_p=1.0)
+        outputs.append(text)
+        tokens += backend.count_tokens(text)
+    generate_seconds = time.perf_counter() - started
+    # After generation, so lazily mapped weights have been paged in
+    memory = resident_mb()
+
+    print(json.dumps({
+        'mode': mode,
+        'load_seconds': load_seconds,
+        'memory_mb': memory,
+        'model_memory_mb': memory - before,
+        'tokens': tokens,
+        'tokens_per_second': tokens / generate_seconds if generate_seconds else 0.0,
+        'outputs': outputs,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["none", "int8"], choices=["none", "int8", "gguf"])
+    parser.add_argument("--model", default=os.getenv("MODEL_NAME", "ibm-granite/granite-3b-code-instruct"))
+    parser.add_argument("--gguf-path", default=os.getenv("LOCAL_GGUF_PATH", ""))
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=0, help="torch / llama.cpp threads (0 = default)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.model, args.gguf_path, args.max_tokens, args.threads)
+        return
+
+    results = {}
+    for mode in args.modes:
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", mode, "--model", args.model, "--gguf-path", args.gguf_path,
+             "--max-tokens", str(args.max_tokens), "--threads", str(args.threads)],
+            cwd=ROOT, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print(f"{mode}: failed\n{proc.stderr.strip()[-2000:]}", file=sys.stderr)
+            continue
+        results[mode] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    baseline = results.get("none")
+    print(f"{'mode':>6} {'load s':>7} {'RSS MB':>8} {'model MB':>9} {'tok/s':>7} {'speedup':>8} "
+          f"{'identical':>10} {'similarity':>11}")
+    for mode, r in results.items():
+        speedup = r['tokens_per_second'] / baseline['tokens_per_second'] if baseline else float('nan')
+        if baseline:
+            pairs = list(zip(baseline['outputs'], r['outputs']))
+            identical = sum(a == b for a, b in pairs) / len(pairs)
+            similarity = sum(difflib.SequenceMatcher(None, a, b).ratio() for a, b in pairs) / len(pairs)
+        else:
+            identical = similarity = float('nan')
+        print(f"{mode:>6} {r['load_seconds']:>7.1f} {r['memory_mb']:>8.0f} {r['model_memory_mb']:>9.0f} "
+              f"{r['tokens_per_second']:>7.1f} "
+              f"{speedup:>7.2f}x {identical:>9.0%} {similarity:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Batch report generation throughput, with email delivery to a local SMTP sink
+
+Renders N treatment-plan reports through ReportService with 1..W background
+workers. "cold" reports each carry different vitals (every chart is drawn),
+"warm" reports share one patient's vitals (chart cache hits). With --email,
+every report is also mailed to an in-process SMTP server that only counts
+messages, so no real mail leaves the machine.
+
+    python benchmarks/report_throughput.py --reports 40 --workers 1 2 4 --email
+"""
+import argparse
+import os
+import socketserver
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Minimal SMTP server that accepts and counts messages"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.messages = 0
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self):
+        self.reply("220 sink ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("ascii", "replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 sink")
+            elif command.startswith("DATA"):
+                self.reply("354 end with <CRLF>.<CRLF>")
+                size = 0
+                for data in iter(self.rfile.readline, b""):
+                    if data == b".\r\n":
+                        break
+                    size += len(data)
+                with self.server.lock:
+                    self.server.messages += 1
+                    self.server.bytes += size
+                self.reply("250 queued")
+            elif command.startswith("QUIT"):
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+def make_reports(n: int, warm: bool) -> list:
+    from utils.data_handler import HealthDataHandler
+    from utils.reports import build_treatment_report
+
+    shared = HealthDataHandler.generate_sample_health_data(365)
+    plan = "\n".join(f"**Section {s}**\n" + "\n".join(f"- Recommendation {s}.{i}: " + "details " * 12
+                                                      for i in range(5)) for s in range(6))
+    reports = []
+    for i in range(n):
+        trends = shared if warm else HealthDataHandler.generate_sample_health_data(365)
+        result = {'condition': 'Hypertension', 'plan': plan, 'timestamp': f"2024-01-01 00:00:{i % 60:02d}"}
+        reports.append(build_treatment_report(result, {'age': 40 + i % 30, 'gender': 'Female',
+                                                       'severity': 'Moderate'}, trends))
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=40)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--formats", nargs="+", default=["pdf", "html"])
+    parser.add_argument("--email", action="store_true", help="Also mail every report to the local sink")
+    args = parser.parse_args()
+
+    sink = SMTPSink()
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    os.environ.update(SMTP_HOST="127.0.0.1", SMTP_PORT=str(sink.server_address[1]), SMTP_STARTTLS="False")
+
+    from config import config
+    from utils.reports import ReportRenderer, ReportService
+    config.SMTP_HOST, config.SMTP_PORT, config.SMTP_STARTTLS = "127.0.0.1", sink.server_address[1], False
+
+    print(f"{'data':>5} {'workers':>8} {'reports':>8} {'seconds':>8} {'reports/s':>10} {'chart hits':>11} {'emailed':>8}")
+    for warm in (False, True):
+        reports = make_reports(args.reports, warm)
+        for workers in args.workers:
+            service = ReportService(ReportRenderer(config.REPORT_TEMPLATE_DIR, config.REPORT_CHART_CACHE_SIZE), workers)
+            sent_before = sink.messages
+            started = time.perf_counter()
+            futures = [service.submit(report, tuple(args.formats)) for report in reports]
+            if args.email:
+                futures = [service.email(f"patient{i}@example.com", report, f.result())
+                           for i, (report, f) in enumerate(zip(reports, futures))]
+            for f in futures:
+                f.result()
+            elapsed = time.perf_counter() - started
+            service.shutdown()
+
+            stats = service.stats()
+            print(f"{'warm' if warm else 'cold':>5} {workers:>8} {len(reports):>8} {elapsed:>8.2f} "
+                  f"{len(reports) / elapsed:>10.1f} {stats['chart_cache']['hits']:>11} "
+                  f"{sink.messages - sent_before:>8}")
+    sink.shutdown()
+
+
+if __name__ == "__main__":
+    main()
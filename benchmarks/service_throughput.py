@@ -0,0 +1,98 @@
+"""Throughput of the shared service with 1..N Streamlit-style front-end processes
+
+Starts `python -m utils.service` on a Unix socket with the stub backend
+(fixed per-call latency, response cache off), then runs N client processes
+that each issue chat requests through RemoteHealthAI. Each row reports
+aggregate requests/sec and mean latency.
+
+    python benchmarks/service_throughput.py --processes 1 2 4 8 --requests 40 --latency-ms 50
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run_client(socket_path: str, worker: int, requests: int, ready, go, results):
+    from utils.service_client import RemoteHealthAI, ServiceClient
+
+    model = RemoteHealthAI(ServiceClient(f"unix://{socket_path}"))
+    # Time only the requests, not interpreter start-up and imports
+    ready.put(worker)
+    go.wait()
+    latencies = []
+    for i in range(requests):
+        started = time.perf_counter()
+        model.chat_response(f"Front end {worker} question {i}: how much water should I drink?")
+        latencies.append(time.perf_counter() - started)
+    results.put(latencies)
+
+
+def wait_for_socket(path: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    while not os.path.exists(path):
+        if time.time() > deadline:
+            raise TimeoutError(f"Service did not start on {path}")
+        time.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=40, help="Requests per front-end process")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Stub backend latency per call")
+    parser.add_argument("--workers", type=int, default=16, help="Service worker slots")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="healthai-bench-")
+    socket_path = os.path.join(tmp, "service.sock")
+    env = dict(
+        os.environ,
+        MODEL_BACKEND="stub",
+        STUB_LATENCY_MS=str(args.latency_ms),
+        RESPONSE_CACHE_SIZE="0",
+        HISTORY_DB_PATH=os.path.join(tmp, "history.db"),
+    )
+    service = subprocess.Popen(
+        [sys.executable, "-m", "utils.service", "--socket", socket_path, "--workers", str(args.workers)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    try:
+        wait_for_socket(socket_path)
+        print(f"{'front ends':>10} {'requests':>9} {'seconds':>8} {'req/s':>8} {'mean ms':>8} {'speedup':>8}")
+        baseline = None
+        for n in args.processes:
+            ready, go, results = multiprocessing.Queue(), multiprocessing.Event(), multiprocessing.Queue()
+            clients = [
+                multiprocessing.Process(target=run_client, args=(socket_path, w, args.requests, ready, go, results))
+                for w in range(n)
+            ]
+            for c in clients:
+                c.start()
+            for _ in clients:
+                ready.get()
+            started = time.perf_counter()
+            go.set()
+            latencies = [lat for _ in clients for lat in results.get()]
+            for c in clients:
+                c.join()
+            elapsed = time.perf_counter() - started
+
+            rate = len(latencies) / elapsed
+            baseline = baseline or rate
+            mean_ms = sum(latencies) / len(latencies) * 1000
+            print(f"{n:>10} {len(latencies):>9} {elapsed:>8.2f} {rate:>8.1f} {mean_ms:>8.1f} {rate / baseline:>7.2f}x")
+    finally:
+        service.terminate()
+        service.wait()
+
+
+if __name__ == "__main__":
+    main()
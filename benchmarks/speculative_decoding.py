@@ -0,0 +1,73 @@
+"""Local CPU decoding throughput with and without a speculative draft model
+
+Runs the fixed prompt set from quantized_inference.py through the local
+backend, first with plain greedy decoding, then with speculative decoding at
+each draft length. For every run it reports tokens/s, the speedup, the
+share of draft tokens the target accepted, and tokens produced per target
+forward pass. Greedy speculative decoding must reproduce the plain outputs
+exactly; the "identical" column checks that.
+
+    python benchmarks/speculative_decoding.py --model ibm-granite/granite-3.0-8b-instruct \
+        --draft-model ibm-granite/granite-3.0-2b-instruct --draft-tokens 2 4 6
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.quantized_inference import PROMPTS, SYSTEM  # noqa: E402
+
+
+def run(backend, max_tokens: int, speculative: bool) -> tuple:
+    """(outputs, tokens, seconds) over the prompt set"""
+    outputs, tokens = [], 0
+    started = time.perf_counter()
+    for prompt in PROMPTS:
+        messages = [{"role": "system", "content": SYSTEM}, {"role": "user", "content": prompt}]
+        text = backend.generate(messages, max_tokens=max_tokens, temperature=0.0, top_p=1.0,
+                                speculative=speculative)
+        outputs.append(text)
+        tokens += backend.count_tokens(text)
+    return outputs, tokens, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.getenv("MODEL_NAME", "ibm-granite/granite-3b-code-instruct"))
+    parser.add_argument("--draft-model", default=os.getenv("DRAFT_MODEL_NAME"),
+                        required=not os.getenv("DRAFT_MODEL_NAME"))
+    parser.add_argument("--draft-tokens", type=int, nargs="+", default=[2, 4, 6])
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--quantization", default="none", choices=["none", "int8"])
+    args = parser.parse_args()
+
+    from utils.backends import LocalTransformersBackend
+    backend = LocalTransformersBackend(args.model, quantization=args.quantization,
+                                       draft_model_name=args.draft_model)
+
+    # Warm-up so one-off kernel setup is not charged to the first run
+    backend.generate([{"role": "user", "content": "Hello"}], max_tokens=4, temperature=0.0, top_p=1.0,
+                     speculative=True)
+
+    baseline, tokens, seconds = run(backend, args.max_tokens, speculative=False)
+    plain_rate = tokens / seconds
+    print(f"{'draft k':>8} {'tok/s':>7} {'speedup':>8} {'accepted':>9} {'tok/pass':>9} {'identical':>10}")
+    print(f"{'-':>8} {plain_rate:>7.1f} {1:>7.2f}x {'-':>9} {1:>9.2f} {'-':>10}")
+
+    for k in args.draft_tokens:
+        backend.draft_tokens = k
+        before = backend.speculative_stats()
+        outputs, tokens, seconds = run(backend, args.max_tokens, speculative=True)
+        after = backend.speculative_stats()
+        delta = {key: after[key] - before[key] for key in ('proposed', 'accepted', 'target_passes', 'tokens')}
+        acceptance = delta['accepted'] / delta['proposed'] if delta['proposed'] else 0.0
+        identical = sum(a == b for a, b in zip(baseline, outputs)) / len(outputs)
+        print(f"{k:>8} {tokens / seconds:>7.1f} {tokens / seconds / plain_rate:>7.2f}x "
+              f"{acceptance:>8.0%} {delta['tokens'] / delta['target_passes']:>9.2f} {identical:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,83 @@ class Config:
     HUGGINGFACE_TOKEN = os.getenv("HUGGINGFACE_TOKEN")
     MODEL_NAME = os.getenv("MODEL_NAME", "ibm-granite/granite-3b-code-instruct")
     
+    # Inference Backend: huggingface, local (transformers) or stub (offline)
+    MODEL_BACKEND = os.getenv("MODEL_BACKEND", "huggingface")
+    STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "0"))
+    # Local backend on CPU: none (fp32), int8 (torch dynamic quantization) or
+    # gguf (llama.cpp, needs llama-cpp-python and LOCAL_GGUF_PATH)
+    LOCAL_QUANTIZATION = os.getenv("LOCAL_QUANTIZATION", "none")
+    LOCAL_GGUF_PATH = os.getenv("LOCAL_GGUF_PATH", "")
+    LOCAL_THREADS = int(os.getenv("LOCAL_THREADS", "0"))
+    # Memory-map safetensors weights so worker processes share one copy;
+    # tokenizer/config are cached in MODEL_CACHE_DIR. Mapped weights keep
+    # their file dtype, so bf16/fp16 checkpoints are only mapped (and run in
+    # that dtype instead of float32) with LOCAL_MMAP_KEEP_DTYPE=True
+    LOCAL_MMAP_WEIGHTS = os.getenv("LOCAL_MMAP_WEIGHTS", "True") == "True"
+    LOCAL_MMAP_KEEP_DTYPE = os.getenv("LOCAL_MMAP_KEEP_DTYPE", "False") == "True"
+    MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "data/model_cache")
+    # Speculative decoding on the local backend: a small draft model with the
+    # same tokenizer proposes DRAFT_TOKENS tokens per target forward pass, for
+    # the GraniteHealthAI methods listed in DRAFT_METHODS (off when unset)
+    DRAFT_MODEL_NAME = os.getenv("DRAFT_MODEL_NAME", "")
+    DRAFT_TOKENS = int(os.getenv("DRAFT_TOKENS", "4"))
+    DRAFT_METHODS = os.getenv("DRAFT_METHODS",
+                              "analyze_symptoms,generate_treatment_plan,analyze_health_trends").split(",")
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+    RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    # Ask for JSON sections (symptom fields, TREATMENT_TEMPLATES) and render
+    # each one as soon as it streams in
+    STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "True") == "True"
+    
+    # Multi-worker Deployment: when set, pages are thin clients of the shared
+    # service (http://host:port or unix:///path/to.sock)
+    SERVICE_URL = os.getenv("SERVICE_URL", "")
+    SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "8"))
+    
+    # Inference Scheduling: concurrent backend calls, and seconds a queued
+    # request waits before it is promoted one priority class
+    INFERENCE_CONCURRENCY = int(os.getenv("INFERENCE_CONCURRENCY", "4"))
+    PRIORITY_AGING_SECONDS = float(os.getenv("PRIORITY_AGING_SECONDS", "30"))
+    
+    # Symptom analyses with a red-flag symptom or at least this severity are
+    # served ahead of all other model calls
+    URGENT_SEVERITY = int(os.getenv("URGENT_SEVERITY", "8"))
+    RED_FLAG_SYMPTOMS = [
+        "chest pain", "shortness of breath", "difficulty breathing",
+        "severe bleeding", "confusion", "fainting", "slurred speech",
+        "sudden weakness", "seizure", "coughing blood",
+    ]
+    TRIAGE_RULES_PATH = os.getenv("TRIAGE_RULES_PATH", "data/triage_rules.json")
+    
+    # Speculative pre-generation of likely follow-ups (opt-in)
+    SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "False") == "True"
+    SPECULATION_MAX_INFLIGHT = int(os.getenv("SPECULATION_MAX_INFLIGHT", "2"))
+    
+    # Model routing: with SMALL_MODEL_NAME set, ROUTING_RULES_PATH decides
+    # which calls go to the small model, and large-model calls overflow to it
+    # under load (off when unset)
+    SMALL_MODEL_NAME = os.getenv("SMALL_MODEL_NAME", "")
+    SMALL_MODEL_BACKEND = os.getenv("SMALL_MODEL_BACKEND", "")
+    # Local small model: defaults to LOCAL_QUANTIZATION; gguf needs its own
+    # SMALL_MODEL_GGUF_PATH and falls back to int8 without one
+    SMALL_MODEL_QUANTIZATION = os.getenv("SMALL_MODEL_QUANTIZATION", "")
+    SMALL_MODEL_GGUF_PATH = os.getenv("SMALL_MODEL_GGUF_PATH", "")
+    ROUTING_RULES_PATH = os.getenv("ROUTING_RULES_PATH", "data/routing_rules.json")
+    
+    # Prompt templates and A/B experiments, loaded once at startup
+    PROMPT_TEMPLATES_PATH = os.getenv("PROMPT_TEMPLATES_PATH", "templates/prompts.json")
+    
+    # Adaptive max_tokens: once a request type and prompt size has
+    # ADAPTIVE_MIN_SAMPLES replies, cap new replies at the ADAPTIVE_QUANTILE
+    # length times ADAPTIVE_HEADROOM (history kept in GENERATION_LENGTHS_PATH).
+    # SECTION_EARLY_STOP ends a reply once every requested ✅ section is done.
+    ADAPTIVE_MAX_TOKENS = os.getenv("ADAPTIVE_MAX_TOKENS", "True") == "True"
+    ADAPTIVE_QUANTILE = float(os.getenv("ADAPTIVE_QUANTILE", "0.95"))
+    ADAPTIVE_HEADROOM = float(os.getenv("ADAPTIVE_HEADROOM", "1.15"))
+    ADAPTIVE_MIN_SAMPLES = int(os.getenv("ADAPTIVE_MIN_SAMPLES", "20"))
+    GENERATION_LENGTHS_PATH = os.getenv("GENERATION_LENGTHS_PATH", "data/generation_lengths.json")
+    SECTION_EARLY_STOP = os.getenv("SECTION_EARLY_STOP", "True") == "True"
+    
     # App Settings
     APP_TITLE = os.getenv("APP_TITLE", "HealthAI: Intelligent Healthcare Assistant")
     APP_ICON = os.getenv("APP_ICON", "🏥")
@@ -21,6 +98,68 @@ class Config:
     TEMPERATURE = float(os.getenv("TEMPERATURE", "0.7"))
     TOP_P = float(os.getenv("TOP_P", "0.9"))
     
+    # Cohort Analytics
+    COHORT_WORKERS = int(os.getenv("COHORT_WORKERS", "0"))
+    
+    # Compute Pool: worker processes for CPU-heavy analytics (0 runs inline)
+    COMPUTE_WORKERS = int(os.getenv("COMPUTE_WORKERS", str(max((os.cpu_count() or 1) - 1, 0))))
+    COMPUTE_MAX_PENDING = int(os.getenv("COMPUTE_MAX_PENDING", "0"))
+    COMPUTE_MIN_ELEMENTS = int(os.getenv("COMPUTE_MIN_ELEMENTS", "100000"))
+    
+    # Health Analytics
+    CHART_POINT_BUDGET = int(os.getenv("CHART_POINT_BUDGET", "180"))
+    
+    # Patient Data Cache
+    DEFAULT_PATIENT_ID = os.getenv("DEFAULT_PATIENT_ID", "default")
+    DATA_CACHE_MAX_MB = int(os.getenv("DATA_CACHE_MAX_MB", "256"))
+    SAMPLE_HISTORY_DAYS = int(os.getenv("SAMPLE_HISTORY_DAYS", "1825"))
+    
+    # Data Export: files are cached per patient data version
+    EXPORT_DIR = os.getenv("EXPORT_DIR", "data/exports")
+    EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "50000"))
+    EXPORT_CACHE_MAX_MB = int(os.getenv("EXPORT_CACHE_MAX_MB", "512"))
+    
+    # Reports: PDF/HTML rendering runs on background workers
+    REPORT_TEMPLATE_DIR = os.getenv("REPORT_TEMPLATE_DIR", "templates")
+    REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+    REPORT_CHART_CACHE_SIZE = int(os.getenv("REPORT_CHART_CACHE_SIZE", "64"))
+    REPORT_TREND_DAYS = int(os.getenv("REPORT_TREND_DAYS", "30"))
+    
+    # Email delivery for reports
+    SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+    SMTP_PORT = int(os.getenv("SMTP_PORT", "25"))
+    SMTP_USER = os.getenv("SMTP_USER", "")
+    SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+    SMTP_FROM = os.getenv("SMTP_FROM", "healthai@localhost")
+    SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "False") == "True"
+    SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+    
+    # History Storage
+    HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "data/history.db")
+    
+    # Patient Profiles: one SQLite record per patient, recently read profiles
+    # are kept in memory
+    PROFILE_DB_PATH = os.getenv("PROFILE_DB_PATH", "data/profiles.db")
+    PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "4096"))
+    
+    # Wearable Readings: buffered per patient and written to READINGS_DB_PATH
+    # in batches of READINGS_FLUSH_SIZE or every READINGS_FLUSH_INTERVAL
+    # seconds; unflushed readings are kept in an append-only log in
+    # READINGS_LOG_DIR (fsynced per group commit when READINGS_LOG_SYNC)
+    READINGS_DB_PATH = os.getenv("READINGS_DB_PATH", "data/readings.db")
+    READINGS_LOG_DIR = os.getenv("READINGS_LOG_DIR", "data/readings_log")
+    READINGS_FLUSH_SIZE = int(os.getenv("READINGS_FLUSH_SIZE", "5000"))
+    READINGS_FLUSH_INTERVAL = float(os.getenv("READINGS_FLUSH_INTERVAL", "5"))
+    READINGS_LOG_SYNC = os.getenv("READINGS_LOG_SYNC", "True") == "True"
+    
+    # Age bands used for history search filters and plan lookups
+    AGE_BANDS = {
+        "0-17": (0, 17),
+        "18-39": (18, 39),
+        "40-64": (40, 64),
+        "65+": (65, 120),
+    }
+    
     # Health Conditions Database
     COMMON_CONDITIONS = {
         "cold": ["runny nose", "sneezing", "sore throat", "cough"],
@@ -34,6 +173,45 @@ class Config:
         "depression": ["sadness", "fatigue", "loss of interest"],
     }
     
+    # Conditions offered on the Treatment Plans page (and pre-generated
+    # into the plan library)
+    TREATMENT_CONDITIONS = [
+        "Common Cold",
+        "Seasonal Flu",
+        "Migraine",
+        "Type 2 Diabetes",
+        "Hypertension (High Blood Pressure)",
+        "Anxiety Disorder",
+        "Depression",
+        "Gastritis",
+        "Allergic Rhinitis",
+        "Asthma",
+        "Back Pain",
+        "Insomnia",
+        "Acid Reflux (GERD)",
+        "Arthritis",
+        "Sinusitis",
+    ]
+    SYMPTOM_SEVERITY_LEVELS = ["Mild", "Moderate", "Severe", "Very Severe"]
+    
+    # Plan Library: pre-generated plans served before live generation
+    PLAN_LIBRARY_DIR = os.getenv("PLAN_LIBRARY_DIR", "data/plan_library")
+    PLAN_PERSONALIZE = os.getenv("PLAN_PERSONALIZE", "False") == "True"
+    PLAN_PERSONALIZE_MAX_TOKENS = int(os.getenv("PLAN_PERSONALIZE_MAX_TOKENS", "200"))
+    
+    # Treatment Plans page label for each COMMON_CONDITIONS entry
+    CONDITION_LABELS = {
+        "cold": "Common Cold",
+        "flu": "Seasonal Flu",
+        "migraine": "Migraine",
+        "allergies": "Allergic Rhinitis",
+        "diabetes": "Type 2 Diabetes",
+        "hypertension": "Hypertension (High Blood Pressure)",
+        "gastritis": "Gastritis",
+        "anxiety": "Anxiety Disorder",
+        "depression": "Depression",
+    }
+    
     # Treatment Guidelines
     TREATMENT_TEMPLATES = {
         "medications": "Recommended medications and dosages",
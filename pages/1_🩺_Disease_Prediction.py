@@ -1,9 +1,18 @@
 import streamlit as st
 import sys
 sys.path.append('..')
-from utils.ai_model import get_ai_model
+from utils.ai_model import get_ai_model, render_inference_debug
 from utils.data_handler import HealthDataHandler
+from utils.data_cache import get_patient_health_data
+from utils.history_store import get_history_store, render_history_search
+from utils.profile_store import load_patient_profile, save_patient_profile
+from utils.triage_rules import get_triage_engine, render_triage_banner
+from utils.speculation import speculation_session_id, track_page
+from utils.plan_library import get_plan_library
+from utils.structured_output import SYMPTOM_ANALYSIS_FIELDS, render_structured_stream, sections_to_markdown
+from utils.reports import build_symptom_report, render_report_actions, start_report
 from config import config
+import time
 
 st.set_page_config(
     page_title="Disease Prediction - HealthAI",
@@ -15,14 +24,32 @@ st.set_page_config(
 if 'ai_model' not in st.session_state:
     st.session_state.ai_model = get_ai_model()
 
-if 'prediction_history' not in st.session_state:
-    st.session_state.prediction_history = []
+# Set by the "Get Treatment Plan" callback; switch_page cannot run inside a callback
+if st.session_state.pop('open_treatment_plan', False):
+    st.switch_page("pages/2_💊_Treatment_Plans.py")
 
-if 'patient_data' not in st.session_state:
-    st.session_state.patient_data = {
-        'age': 30,
-        'gender': 'Not specified'
-    }
+track_page('disease_prediction')
+
+history_store = get_history_store()
+patient_id = config.DEFAULT_PATIENT_ID
+
+if 'prediction_history_before' not in st.session_state:
+    st.session_state.prediction_history_before = []
+
+
+def save_report():
+    failed = history_store.stats()['failed_rows']
+    history_store.flush()
+    if history_store.stats()['failed_rows'] > failed:
+        st.toast("Could not save the report to history. Please try again.")
+    else:
+        st.toast("Report saved to history!")
+
+
+def open_treatment_plan():
+    st.session_state.open_treatment_plan = True
+
+patient_data = load_patient_profile(patient_id)
 
 # Header
 st.title("🩺 Disease Prediction System")
@@ -88,19 +115,26 @@ with col2:
     st.subheader("👤 Patient Information")
     
     # Patient details
-    age = st.number_input("Age", min_value=1, max_value=120, value=30)
-    gender = st.selectbox("Gender", ["Male", "Female", "Other"])
+    age = st.number_input("Age", min_value=1, max_value=120, value=patient_data['age'])
+    gender_options = ["Male", "Female", "Other"]
+    gender = st.selectbox(
+        "Gender",
+        gender_options,
+        index=gender_options.index(patient_data['gender']) if patient_data['gender'] in gender_options else 0
+    )
     
     existing_conditions = st.text_area(
         "Existing Conditions",
+        value="" if patient_data['conditions'] == 'None' else patient_data['conditions'],
         placeholder="e.g., Diabetes, Hypertension",
         help="List any chronic health conditions"
     )
     
-    # Update session state
-    st.session_state.patient_data['age'] = age
-    st.session_state.patient_data['gender'] = gender
-    st.session_state.patient_data['conditions'] = existing_conditions
+    # Update the stored profile
+    patient_data['age'] = age
+    patient_data['gender'] = gender
+    patient_data['conditions'] = existing_conditions or 'None'
+    save_patient_profile(patient_id)
 
 st.markdown("---")
 
@@ -122,31 +156,21 @@ if analyze_button and len(selected_symptoms) > 0:
     st.markdown("---")
     st.subheader("📊 Analysis Results")
     
-    with st.spinner("🤖 AI is analyzing your symptoms..."):
-        # Prepare patient data
-        patient_info = {
-            'age': age,
-            'gender': gender,
-            'conditions': existing_conditions,
-            'duration': duration,
-            'severity': severity
-        }
-        
-        # Get AI analysis
-        analysis_result = st.session_state.ai_model.analyze_symptoms(
-            selected_symptoms,
-            patient_info
-        )
-        
-        # Save to history
-        st.session_state.prediction_history.append({
-            'symptoms': selected_symptoms,
-            'analysis': analysis_result['analysis'],
-            'timestamp': analysis_result['timestamp']
-        })
-    
-    # Display results
-    st.success("✅ Analysis Complete")
+    # Red-flag rules run before the model call so urgent advice shows at once
+    health_data = get_patient_health_data(patient_id)
+    latest_vitals = health_data.iloc[-1].to_dict()
+    triage_matches = get_triage_engine().evaluate(selected_symptoms, severity, duration, latest_vitals)
+    render_triage_banner(triage_matches)
+    
+    # Prepare patient data
+    patient_info = {
+        'age': age,
+        'gender': gender,
+        'conditions': existing_conditions,
+        'duration': duration,
+        'severity': severity,
+        'triage_level': triage_matches[0]['level'] if triage_matches else None
+    }
     
     # Symptoms summary
     st.markdown("**Reported Symptoms:**")
@@ -162,17 +186,62 @@ if analyze_button and len(selected_symptoms) > 0:
     # AI Analysis
     st.markdown("### 🤖 AI Medical Analysis")
     
-    analysis_container = st.container()
-    with analysis_container:
-        st.markdown(
-            f"""
-            <div style='background-color: #f0f8ff; padding: 20px; border-radius: 10px; 
-                        border-left: 5px solid #00b4d8;'>
-                {analysis_result['analysis'].replace('\n', '<br>')}
-            </div>
-            """,
-            unsafe_allow_html=True
+    if config.STRUCTURED_OUTPUT:
+        # Each section renders as soon as the model finishes it
+        sections = render_structured_stream(
+            st.session_state.ai_model.stream_symptom_analysis(selected_symptoms, patient_info),
+            SYMPTOM_ANALYSIS_FIELDS
         )
+        analysis_result = {
+            'analysis': sections_to_markdown(sections, SYMPTOM_ANALYSIS_FIELDS),
+            'sections': sections,
+            'timestamp': time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+    else:
+        with st.spinner("🤖 AI is analyzing your symptoms..."):
+            analysis_result = st.session_state.ai_model.analyze_symptoms(
+                selected_symptoms,
+                patient_info
+            )
+        
+        analysis_container = st.container()
+        with analysis_container:
+            st.markdown(
+                f"""
+                <div style='background-color: #f0f8ff; padding: 20px; border-radius: 10px; 
+                            border-left: 5px solid #00b4d8;'>
+                    {analysis_result['analysis'].replace('\n', '<br>')}
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
+    
+    st.success("✅ Analysis Complete")
+    
+    # Save to history (queued; committed off the render path)
+    history_store.add_prediction(
+        patient_id,
+        selected_symptoms,
+        analysis_result['analysis'],
+        analysis_result['timestamp'],
+        patient_info
+    )
+    
+    # PDF/HTML report renders on a background worker; see the Report section below
+    start_report('analysis_report', build_symptom_report(selected_symptoms, analysis_result, patient_info, health_data))
+    
+    # Likely follow-up: a treatment plan for the best-matching common condition
+    condition_matches = get_triage_engine().match_conditions(selected_symptoms)
+    if condition_matches:
+        suggested_condition = config.CONDITION_LABELS[condition_matches[0][0]]
+        st.session_state.suggested_condition = suggested_condition
+        # Library plans are already instant; only speculate when none exists
+        if get_plan_library().lookup(suggested_condition, age, gender, "Moderate") is None:
+            st.session_state.ai_model.speculate_treatment_plan(
+                speculation_session_id(),
+                suggested_condition,
+                {'age': age, 'gender': gender}
+            )
     
     # Warning section
     st.markdown("---")
@@ -193,27 +262,47 @@ if analyze_button and len(selected_symptoms) > 0:
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        if st.button("📋 Save Report", use_container_width=True):
-            st.success("Report saved to history!")
+        # Runs as a callback: the results block is gone on the rerun the click triggers
+        st.button("📋 Save Report", use_container_width=True, on_click=save_report)
     
     with col2:
-        if st.button("💊 Get Treatment Plan", use_container_width=True):
-            st.switch_page("pages/2_💊_Treatment_Plans.py")
+        st.button("💊 Get Treatment Plan", use_container_width=True, on_click=open_treatment_plan)
     
     with col3:
         if st.button("🔄 New Analysis", use_container_width=True):
             st.rerun()
 
+# Download / email the latest analysis (persists across reruns)
+render_report_actions('analysis_report')
+
 # History Section
-if st.session_state.prediction_history:
+before_id = st.session_state.prediction_history_before[-1] if st.session_state.prediction_history_before else None
+history_page = history_store.recent_predictions(patient_id, limit=5, before_id=before_id)
+
+if history_page or before_id:
     st.markdown("---")
     st.subheader("📜 Previous Analyses")
     
-    for idx, record in enumerate(reversed(st.session_state.prediction_history[-5:])):
-        with st.expander(f"Analysis {len(st.session_state.prediction_history) - idx} - {record['timestamp']}"):
+    for record in history_page:
+        label = f"Analysis {record['id']}" if record.get('id') else "Analysis (saving...)"
+        with st.expander(f"{label} - {record['timestamp']}"):
             st.markdown(f"**Symptoms:** {', '.join([s.title() for s in record['symptoms']])}")
             st.markdown("**Analysis:**")
             st.write(record['analysis'])
+    
+    page_col1, page_col2 = st.columns(2)
+    with page_col1:
+        if before_id and st.button("⬅️ Newer", use_container_width=True):
+            st.session_state.prediction_history_before.pop()
+            st.rerun()
+    with page_col2:
+        if len(history_page) == 5 and history_page[-1].get('id') and st.button("Older ➡️", use_container_width=True):
+            st.session_state.prediction_history_before.append(history_page[-1]['id'])
+            st.rerun()
+
+# Search Section
+st.markdown("---")
+render_history_search('predictions')
 
 # Sidebar
 with st.sidebar:
@@ -237,5 +326,9 @@ with st.sidebar:
         st.switch_page("app.py")
     
     if st.button("🗑️ Clear History", use_container_width=True):
-        st.session_state.prediction_history = []
-        st.rerun()
\ No newline at end of file
+        history_store.clear('predictions', patient_id)
+        history_store.flush()
+        st.session_state.prediction_history_before = []
+        st.rerun()
+    
+    render_inference_debug()
\ No newline at end of file
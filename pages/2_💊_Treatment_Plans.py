@@ -2,7 +2,15 @@ import streamlit as st
 import sys
 sys.path.append('..')
 from utils.ai_model import get_ai_model
+from utils.data_cache import get_patient_health_data
+from utils.history_store import get_history_store, render_history_search
+from utils.profile_store import load_patient_profile, save_patient_profile
+from utils.speculation import track_page
+from utils.plan_library import get_plan_library, personalize_plan
+from utils.structured_output import render_structured_stream, sections_to_markdown, treatment_plan_fields
+from utils.reports import build_treatment_report, render_report_actions, start_report
 from config import config
+import time
 
 st.set_page_config(
     page_title="Treatment Plans - HealthAI",
@@ -14,15 +22,15 @@ st.set_page_config(
 if 'ai_model' not in st.session_state:
     st.session_state.ai_model = get_ai_model()
 
-if 'treatment_history' not in st.session_state:
-    st.session_state.treatment_history = []
+track_page('treatment_plans')
 
-if 'patient_data' not in st.session_state:
-    st.session_state.patient_data = {
-        'age': 30,
-        'gender': 'Not specified',
-        'conditions': 'None'
-    }
+history_store = get_history_store()
+patient_id = config.DEFAULT_PATIENT_ID
+
+if 'treatment_history_before' not in st.session_state:
+    st.session_state.treatment_history_before = []
+
+patient_data = load_patient_profile(patient_id)
 
 # Header
 st.title("💊 Personalized Treatment Plans")
@@ -44,27 +52,14 @@ with col1:
     )
     
     if input_method == "Select from Common Conditions":
-        common_conditions = [
-            "Common Cold",
-            "Seasonal Flu",
-            "Migraine",
-            "Type 2 Diabetes",
-            "Hypertension (High Blood Pressure)",
-            "Anxiety Disorder",
-            "Depression",
-            "Gastritis",
-            "Allergic Rhinitis",
-            "Asthma",
-            "Back Pain",
-            "Insomnia",
-            "Acid Reflux (GERD)",
-            "Arthritis",
-            "Sinusitis"
-        ]
+        common_conditions = config.TREATMENT_CONDITIONS
         
+        # Preselect the condition suggested by the last symptom analysis
+        suggested = st.session_state.get('suggested_condition')
         condition = st.selectbox(
             "Select Condition:",
-            common_conditions
+            common_conditions,
+            index=common_conditions.index(suggested) if suggested in common_conditions else 0
         )
     else:
         condition = st.text_input(
@@ -77,7 +72,7 @@ with col1:
     
     symptom_severity = st.select_slider(
         "Current Symptom Severity:",
-        options=["Mild", "Moderate", "Severe", "Very Severe"],
+        options=config.SYMPTOM_SEVERITY_LEVELS,
         value="Moderate"
     )
     
@@ -93,12 +88,24 @@ with col1:
         placeholder="Any specific concerns, allergies, or preferences...",
         help="Provide context that might help customize your treatment plan"
     )
+    
+    plan_library = get_plan_library()
+    use_library = len(plan_library) > 0 and st.checkbox(
+        "⚡ Use pre-generated plan library",
+        value=True,
+        help=f"Serve the closest plan from library {plan_library.version} instantly"
+    )
 
 with col2:
     st.subheader("👤 Patient Profile")
     
-    age = st.number_input("Age", min_value=1, max_value=120, value=st.session_state.patient_data.get('age', 30))
-    gender = st.selectbox("Gender", ["Male", "Female", "Other", "Prefer not to say"])
+    age = st.number_input("Age", min_value=1, max_value=120, value=patient_data['age'])
+    gender_options = ["Male", "Female", "Other", "Prefer not to say"]
+    gender = st.selectbox(
+        "Gender",
+        gender_options,
+        index=gender_options.index(patient_data['gender']) if patient_data['gender'] in gender_options else 0
+    )
     
     weight = st.number_input("Weight (kg)", min_value=20, max_value=300, value=70)
     height = st.number_input("Height (cm)", min_value=50, max_value=250, value=170)
@@ -111,12 +118,13 @@ with col2:
     
     existing_conditions = st.text_area(
         "Other Health Conditions:",
-        value=st.session_state.patient_data.get('conditions', ''),
+        value="" if patient_data['conditions'] == 'None' else patient_data['conditions'],
         placeholder="List any other conditions"
     )
     
     current_medications = st.text_area(
         "Current Medications:",
+        value="" if patient_data['medications'] == 'None' else patient_data['medications'],
         placeholder="List medications you're taking"
     )
     
@@ -124,6 +132,13 @@ with col2:
         "Known Allergies:",
         placeholder="e.g., Penicillin, Sulfa drugs"
     )
+    
+    # Update the stored profile
+    patient_data['age'] = age
+    patient_data['gender'] = gender
+    patient_data['conditions'] = existing_conditions or 'None'
+    patient_data['medications'] = current_medications or 'None'
+    save_patient_profile(patient_id)
 
 st.markdown("---")
 
@@ -145,37 +160,48 @@ if generate_button and condition:
     st.markdown("---")
     st.subheader("📋 Your Personalized Treatment Plan")
     
-    with st.spinner("🤖 AI is creating your personalized treatment plan..."):
-        # Prepare patient data
-        patient_info = {
-            'age': age,
-            'gender': gender,
-            'weight': weight,
-            'height': height,
-            'bmi': f"{bmi:.1f}" if height > 0 else "N/A",
-            'conditions': existing_conditions,
-            'medications': current_medications,
-            'allergies': allergies,
-            'severity': symptom_severity,
-            'goals': ", ".join(treatment_goals),
-            'notes': additional_notes
-        }
-        
-        # Generate treatment plan
-        treatment_result = st.session_state.ai_model.generate_treatment_plan(
-            condition,
-            patient_info
-        )
-        
-        # Save to history
-        st.session_state.treatment_history.append({
-            'condition': condition,
-            'plan': treatment_result['plan'],
-            'timestamp': treatment_result['timestamp'],
-            'patient_info': patient_info
-        })
+    # Prepare patient data
+    patient_info = {
+        'age': age,
+        'gender': gender,
+        'weight': weight,
+        'height': height,
+        'bmi': f"{bmi:.1f}" if height > 0 else "N/A",
+        'conditions': existing_conditions,
+        'medications': current_medications,
+        'allergies': allergies,
+        'severity': symptom_severity,
+        'goals': ", ".join(treatment_goals),
+        'notes': additional_notes
+    }
     
-    st.success("✅ Treatment Plan Generated Successfully")
+    # Serve the closest library plan when there is one, else generate live
+    started = time.perf_counter()
+    library_plan = plan_library.lookup(condition, age, gender, symptom_severity) if use_library else None
+    treatment_result = None
+    if library_plan is not None:
+        plan_text = library_plan['plan']
+        if config.PLAN_PERSONALIZE:
+            with st.spinner("🤖 AI is personalizing your treatment plan..."):
+                adjustments = personalize_plan(st.session_state.ai_model, library_plan, condition, patient_info)
+            if adjustments:
+                plan_text += "\n\n**👤 Personal Adjustments**\n" + adjustments
+        treatment_result = {
+            'plan': plan_text,
+            'condition': condition,
+            'timestamp': time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+    elif not config.STRUCTURED_OUTPUT:
+        with st.spinner("🤖 AI is creating your personalized treatment plan..."):
+            treatment_result = st.session_state.ai_model.generate_treatment_plan(
+                condition,
+                patient_info
+            )
+    
+    if library_plan is not None:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        st.caption(f"📚 From plan library {plan_library.version} (Age {library_plan['age_band']}, "
+                   f"{library_plan['gender']}, {library_plan['severity']}) • {elapsed_ms:.0f} ms")
     
     # Display condition summary
     st.markdown("### 🏥 Condition Summary")
@@ -193,18 +219,46 @@ if generate_button and condition:
     # Display treatment plan
     st.markdown("### 💊 Comprehensive Treatment Plan")
     
-    plan_container = st.container()
-    with plan_container:
-        # Format and display the plan
-        st.markdown(
-            f"""
-            <div style='background-color: #f8f9fa; padding: 25px; border-radius: 10px; 
-                        border-left: 5px solid #00b4d8; line-height: 1.8;'>
-                {treatment_result['plan'].replace('\n', '<br>')}
-            </div>
-            """,
-            unsafe_allow_html=True
+    if treatment_result is None:
+        # Live structured generation: each section renders as soon as it is complete
+        plan_fields = treatment_plan_fields()
+        sections = render_structured_stream(
+            st.session_state.ai_model.stream_treatment_plan(condition, patient_info),
+            plan_fields
         )
+        treatment_result = {
+            'plan': sections_to_markdown(sections, plan_fields),
+            'sections': sections,
+            'condition': condition,
+            'timestamp': time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+    else:
+        plan_container = st.container()
+        with plan_container:
+            # Format and display the plan
+            st.markdown(
+                f"""
+                <div style='background-color: #f8f9fa; padding: 25px; border-radius: 10px; 
+                            border-left: 5px solid #00b4d8; line-height: 1.8;'>
+                    {treatment_result['plan'].replace('\n', '<br>')}
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
+    
+    st.success("✅ Treatment Plan Generated Successfully")
+    
+    # Save to history (queued; committed off the render path)
+    history_store.add_treatment_plan(
+        patient_id,
+        condition,
+        treatment_result['plan'],
+        treatment_result['timestamp'],
+        patient_info
+    )
+    
+    # PDF/HTML report renders on a background worker; see the Report section below
+    start_report('plan_report', build_treatment_report(treatment_result, patient_info, get_patient_health_data(patient_id)))
     
     st.markdown("---")
     
@@ -249,37 +303,50 @@ if generate_button and condition:
     # Action Buttons
     st.markdown("---")
     
-    action_col1, action_col2, action_col3, action_col4 = st.columns(4)
+    action_col1, action_col2 = st.columns(2)
     
     with action_col1:
-        if st.button("📥 Download Plan", use_container_width=True):
-            st.success("Download feature coming soon!")
-    
-    with action_col2:
-        if st.button("📧 Email Plan", use_container_width=True):
-            st.success("Email feature coming soon!")
-    
-    with action_col3:
         if st.button("📊 View Analytics", use_container_width=True):
             st.switch_page("pages/3_📊_Health_Analytics.py")
     
-    with action_col4:
+    with action_col2:
         if st.button("🔄 New Plan", use_container_width=True):
             st.rerun()
 
+# Download / email the latest plan (persists across reruns)
+render_report_actions('plan_report')
+
 # Treatment History
-if st.session_state.treatment_history:
+before_id = st.session_state.treatment_history_before[-1] if st.session_state.treatment_history_before else None
+history_page = history_store.recent_treatment_plans(patient_id, limit=5, before_id=before_id)
+
+if history_page or before_id:
     st.markdown("---")
     st.subheader("📜 Treatment Plan History")
     
-    for idx, record in enumerate(reversed(st.session_state.treatment_history[-5:])):
-        with st.expander(f"Plan {len(st.session_state.treatment_history) - idx}: {record['condition']} - {record['timestamp']}"):
+    for record in history_page:
+        label = f"Plan {record['id']}" if record.get('id') else "Plan (saving...)"
+        with st.expander(f"{label}: {record['condition']} - {record['timestamp']}"):
             st.markdown(f"**Condition:** {record['condition']}")
             st.markdown(f"**Patient Age:** {record['patient_info']['age']} years")
             st.markdown(f"**Severity:** {record['patient_info']['severity']}")
             st.markdown("---")
             st.markdown("**Treatment Plan:**")
             st.write(record['plan'])
+    
+    page_col1, page_col2 = st.columns(2)
+    with page_col1:
+        if before_id and st.button("⬅️ Newer", use_container_width=True):
+            st.session_state.treatment_history_before.pop()
+            st.rerun()
+    with page_col2:
+        if len(history_page) == 5 and history_page[-1].get('id') and st.button("Older ➡️", use_container_width=True):
+            st.session_state.treatment_history_before.append(history_page[-1]['id'])
+            st.rerun()
+
+# Search Section
+st.markdown("---")
+render_history_search('treatment_plans')
 
 # Sidebar
 with st.sidebar:
@@ -316,5 +383,7 @@ with st.sidebar:
         st.switch_page("app.py")
     
     if st.button("🗑️ Clear History", use_container_width=True):
-        st.session_state.treatment_history = []
+        history_store.clear('treatment_plans', patient_id)
+        history_store.flush()
+        st.session_state.treatment_history_before = []
         st.rerun()
\ No newline at end of file
@@ -4,6 +4,13 @@ sys.path.append('..')
 from utils.ai_model import get_ai_model
 from utils.data_handler import HealthDataHandler
 from utils.visualizations import HealthVisualizations
+from utils.data_cache import get_patient_health_data, get_patient_rollups, invalidate_patient_data, render_cache_debug
+from utils.vitals_buffer import render_vitals_debug
+from utils.export import render_export_panel
+from utils.anomaly_detection import VitalsAnomalyDetector
+from utils.metric_summary import MetricSummarizer
+from utils.speculation import speculation_session_id, track_page
+from config import config
 import pandas as pd
 
 st.set_page_config(
@@ -16,8 +23,20 @@ st.set_page_config(
 if 'ai_model' not in st.session_state:
     st.session_state.ai_model = get_ai_model()
 
-if 'health_data' not in st.session_state:
-    st.session_state.health_data = HealthDataHandler.generate_sample_health_data(30)
+track_page('health_analytics')
+
+PATIENT_ID = config.DEFAULT_PATIENT_ID
+
+days_map = {
+    "Last 7 Days": 7,
+    "Last 14 Days": 14,
+    "Last 30 Days": 30,
+    "Last 90 Days": 90,
+    "Last 1 Year": 365,
+    "Last 2 Years": 730,
+    "Last 5 Years": 1825
+}
+
 
 # Header
 st.title("📊 Health Analytics Dashboard")
@@ -31,37 +50,33 @@ col1, col2, col3 = st.columns([2, 1, 1])
 with col1:
     time_period = st.selectbox(
         "Select Time Period:",
-        ["Last 7 Days", "Last 14 Days", "Last 30 Days", "Last 90 Days"],
+        list(days_map.keys()),
         index=2
     )
 
 with col2:
     if st.button("🔄 Refresh Data", use_container_width=True):
-        days_map = {
-            "Last 7 Days": 7,
-            "Last 14 Days": 14,
-            "Last 30 Days": 30,
-            "Last 90 Days": 90
-        }
-        st.session_state.health_data = HealthDataHandler.generate_sample_health_data(
-            days_map[time_period]
-        )
+        invalidate_patient_data(PATIENT_ID)
         st.rerun()
 
-with col3:
-    if st.button("📥 Export Data", use_container_width=True):
-        csv = st.session_state.health_data.to_csv(index=False)
-        st.download_button(
-            label="Download CSV",
-            data=csv,
-            file_name="health_data.csv",
-            mime="text/csv"
-        )
 
-# Get data
-df = st.session_state.health_data
+# Get data: the patient's shared dataset, sliced to the selected period
+full_df = get_patient_health_data(PATIENT_ID)
+# The dataset is sorted by date: locate the period by binary search instead of a full scan
+range_end = full_df['date'].iloc[-1]
+range_start = (range_end - pd.Timedelta(days=days_map[time_period] - 1)).floor('D')
+df = full_df.iloc[full_df['date'].searchsorted(range_start):].reset_index(drop=True)
 latest_metrics = df.iloc[-1]
 
+with col3:
+    # Chunked export of the full history, cached per data fingerprint
+    render_export_panel(PATIENT_ID, full_df)
+
+# Trend charts read the coarsest rollup needed to stay within the point budget
+chart_df, chart_granularity = get_patient_rollups(PATIENT_ID).chart_frame(
+    full_df, PATIENT_ID, range_start, range_end, config.CHART_POINT_BUDGET
+)
+
 st.markdown("---")
 
 # Key Metrics Dashboard
@@ -142,7 +157,7 @@ st.markdown("---")
 # Comprehensive Dashboard
 st.subheader("📊 Comprehensive Health Metrics Dashboard")
 
-dashboard_fig = HealthVisualizations.create_multi_metric_dashboard(df)
+dashboard_fig = HealthVisualizations.create_multi_metric_dashboard(chart_df)
 st.plotly_chart(dashboard_fig, use_container_width=True)
 
 st.markdown("---")
@@ -158,7 +173,7 @@ tab1, tab2, tab3, tab4, tab5 = st.tabs([
 
 with tab1:
     st.markdown("### Heart Rate Trends")
-    hr_fig = HealthVisualizations.create_metric_trend_chart(df, 'heart_rate', 'Heart Rate (bpm)')
+    hr_fig = HealthVisualizations.create_metric_trend_chart(chart_df, 'heart_rate', 'Heart Rate (bpm)')
     st.plotly_chart(hr_fig, use_container_width=True)
     
     col1, col2 = st.columns(2)
@@ -187,7 +202,7 @@ with tab2:
         st.metric("Range", f"{df['blood_pressure_systolic'].min()}-{df['blood_pressure_systolic'].max()} mmHg")
         
         sys_fig = HealthVisualizations.create_metric_trend_chart(
-            df, 'blood_pressure_systolic', 'Systolic BP'
+            chart_df, 'blood_pressure_systolic', 'Systolic BP'
         )
         st.plotly_chart(sys_fig, use_container_width=True)
     
@@ -197,7 +212,7 @@ with tab2:
         st.metric("Range", f"{df['blood_pressure_diastolic'].min()}-{df['blood_pressure_diastolic'].max()} mmHg")
         
         dia_fig = HealthVisualizations.create_metric_trend_chart(
-            df, 'blood_pressure_diastolic', 'Diastolic BP'
+            chart_df, 'blood_pressure_diastolic', 'Diastolic BP'
         )
         st.plotly_chart(dia_fig, use_container_width=True)
 
@@ -205,7 +220,7 @@ with tab3:
     st.markdown("### Blood Glucose Monitoring")
     
     glucose_fig = HealthVisualizations.create_metric_trend_chart(
-        df, 'blood_glucose', 'Blood Glucose (mg/dL)'
+        chart_df, 'blood_glucose', 'Blood Glucose (mg/dL)'
     )
     st.plotly_chart(glucose_fig, use_container_width=True)
     
@@ -232,7 +247,7 @@ with tab4:
     
     with col1:
         o2_fig = HealthVisualizations.create_metric_trend_chart(
-            df, 'oxygen_saturation', 'Oxygen Saturation (%)'
+            chart_df, 'oxygen_saturation', 'Oxygen Saturation (%)'
         )
         st.plotly_chart(o2_fig, use_container_width=True)
         
@@ -242,7 +257,7 @@ with tab4:
     
     with col2:
         temp_fig = HealthVisualizations.create_metric_trend_chart(
-            df, 'temperature', 'Body Temperature (°F)'
+            chart_df, 'temperature', 'Body Temperature (°F)'
         )
         st.plotly_chart(temp_fig, use_container_width=True)
         
@@ -266,22 +281,40 @@ with tab5:
 
 st.markdown("---")
 
+# Instant Insights Section
+st.subheader("⚡ Instant Insights")
+
+findings = VitalsAnomalyDetector.analyze(df)
+instant_insights = VitalsAnomalyDetector.get_insights(findings)
+
+if instant_insights:
+    for insight in instant_insights:
+        st.markdown(f"- {insight}")
+else:
+    st.success("No outliers, shifts, trends or sustained out-of-range episodes detected.")
+
+st.markdown("---")
+
 # AI Insights Section
 st.subheader("🤖 AI-Powered Health Insights")
 
+# Prepare metrics summary (fixed size regardless of how many readings)
+metrics_summary = MetricSummarizer.summarize_frame(df, [
+    'heart_rate',
+    'blood_pressure_systolic',
+    'blood_glucose',
+    'oxygen_saturation',
+    'temperature'
+])
+findings_text = VitalsAnomalyDetector.format_findings(findings)
+
 if st.button("🔍 Generate AI Analysis", type="primary"):
     with st.spinner("Analyzing your health trends..."):
-        # Prepare metrics summary
-        metrics_summary = {
-            'heart_rate': df['heart_rate'].tolist(),
-            'blood_pressure_systolic': df['blood_pressure_systolic'].tolist(),
-            'blood_glucose': df['blood_glucose'].tolist(),
-            'oxygen_saturation': df['oxygen_saturation'].tolist(),
-            'temperature': df['temperature'].tolist()
-        }
-        
         # Get AI analysis
-        ai_insights = st.session_state.ai_model.analyze_health_trends(metrics_summary)
+        ai_insights = st.session_state.ai_model.analyze_health_trends(
+            metrics_summary,
+            findings_text
+        )
         
         st.success("✅ Analysis Complete")
         
@@ -294,6 +327,9 @@ if st.button("🔍 Generate AI Analysis", type="primary"):
             """,
             unsafe_allow_html=True
         )
+elif config.SPECULATION_ENABLED:
+    # Users usually ask for this next; pre-generate it while inference is idle
+    st.session_state.ai_model.speculate_health_trends(speculation_session_id(), metrics_summary, findings_text)
 
 st.markdown("---")
 
@@ -371,6 +407,10 @@ with st.sidebar:
     st.markdown("### 📈 Quick Stats")
     st.metric("Total Data Points", len(df))
     st.metric("Time Period", time_period)
+    st.metric("Chart Resolution", chart_granularity.title())
+    
+    render_cache_debug()
+    render_vitals_debug()
     st.metric("Data Quality", "Good ✓")
     
     st.divider()
@@ -379,7 +419,7 @@ with st.sidebar:
         st.switch_page("app.py")
     
     if st.button("🔄 Reset Data", use_container_width=True):
-        st.session_state.health_data = HealthDataHandler.generate_sample_health_data(30)
+        invalidate_patient_data(PATIENT_ID)
         st.rerun()
 delta_color="normal" if status == "Normal" else "inverse"
 
@@ -0,0 +1,128 @@
+import streamlit as st
+import sys
+sys.path.append('..')
+from utils.cohort_analytics import CohortAnalytics
+from utils.speculation import track_page
+from utils.visualizations import HealthVisualizations
+from config import config
+import time
+
+st.set_page_config(
+    page_title="Cohort Analytics - HealthAI",
+    page_icon="👥",
+    layout="wide"
+)
+
+track_page('cohort_analytics')
+
+
+@st.cache_data(show_spinner=False)
+def load_cohort(n_patients: int, days: int):
+    return CohortAnalytics.generate_sample_cohort_data(n_patients, days)
+
+
+@st.cache_data(show_spinner=False)
+def summarize_cohort(n_patients: int, days: int, workers: int):
+    df = load_cohort(n_patients, days)
+    return CohortAnalytics.summarize_cohort(df, workers=workers)
+
+
+# Header
+st.title("👥 Cohort Analytics")
+st.markdown("### Population Health Across All Patients")
+
+st.markdown("---")
+
+# Cohort Selector
+col1, col2, col3 = st.columns([2, 1, 1])
+
+with col1:
+    n_patients = st.select_slider(
+        "Cohort Size (patients):",
+        options=[100, 1000, 5000, 10000, 25000, 50000],
+        value=10000
+    )
+
+with col2:
+    days = st.selectbox("History (days):", [7, 14, 30, 90], index=2)
+
+with col3:
+    top_n = st.number_input("Top-N Deteriorating", min_value=5, max_value=100, value=10)
+
+start = time.perf_counter()
+with st.spinner("Aggregating cohort metrics..."):
+    latest, slopes = summarize_cohort(n_patients, days, config.COHORT_WORKERS)
+    distribution = CohortAnalytics.score_distribution(latest)
+    risk_counts = CohortAnalytics.risk_breakdown(latest)
+    out_of_range = CohortAnalytics.out_of_range_summary(latest)
+    deteriorating = CohortAnalytics.top_deteriorating(latest, slopes, int(top_n))
+elapsed = time.perf_counter() - start
+
+st.markdown("---")
+
+# Key Cohort Metrics
+st.subheader("🎯 Cohort Overview")
+
+metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
+
+with metric_col1:
+    st.metric("Patients", f"{len(latest):,}")
+with metric_col2:
+    st.metric("Average Health Score", f"{latest['health_score'].mean():.1f}/100")
+with metric_col3:
+    st.metric("High Risk Patients", f"{risk_counts['High Risk'] / max(len(latest), 1) * 100:.1f}%")
+with metric_col4:
+    st.metric("Declining Patients", f"{(slopes['score_slope'] < 0).mean() * 100:.1f}%")
+
+st.markdown("---")
+
+# Distributions
+dist_col1, dist_col2 = st.columns(2)
+
+with dist_col1:
+    st.plotly_chart(
+        HealthVisualizations.create_score_distribution_chart(distribution),
+        use_container_width=True
+    )
+
+with dist_col2:
+    st.plotly_chart(
+        HealthVisualizations.create_out_of_range_chart(out_of_range),
+        use_container_width=True
+    )
+
+st.markdown("---")
+
+# Top-N Deteriorating
+st.subheader("📉 Top Deteriorating Patients")
+st.caption("Ranked by the daily slope of health score over the selected history")
+
+st.dataframe(
+    deteriorating.style.format({'score_slope': '{:.2f}'}),
+    use_container_width=True
+)
+
+# Sidebar
+with st.sidebar:
+    st.header("👥 Cohort Info")
+    st.markdown("""
+    Population views across every patient in the cohort.
+
+    **Features:**
+    - Health score distribution
+    - Out-of-range rates per metric
+    - Fastest deteriorating patients
+    """)
+
+    st.divider()
+
+    st.markdown("### 📈 Quick Stats")
+    st.metric("Risk: Low", f"{risk_counts['Low Risk']:,}")
+    st.metric("Risk: Moderate", f"{risk_counts['Moderate Risk']:,}")
+    st.metric("Risk: High", f"{risk_counts['High Risk']:,}")
+    st.caption(f"Computed in {elapsed * 1000:.0f} ms")
+
+    st.divider()
+
+    if st.button("🏠 Back to Home", use_container_width=True):
+        st.switch_page("app.py")
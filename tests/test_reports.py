@@ -0,0 +1,82 @@
+import email
+import email.policy
+import socketserver
+import threading
+
+import pytest
+
+from config import config
+from utils.data_handler import HealthDataHandler
+from utils.reports import ReportRenderer, ReportService, build_treatment_report, report_filename
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept one message per session"""
+
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 localhost")
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == "QUIT":
+                self.reply("221 bye")
+                return
+            if command == "EHLO":
+                self.reply("250 localhost")
+            elif command == "DATA":
+                self.reply("354 end with .")
+                lines = []
+                while (data := self.rfile.readline()) not in (b".\r\n", b""):
+                    lines.append(data[1:] if data.startswith(b"..") else data)
+                self.server.messages.append(b"".join(lines))
+                self.reply("250 queued")
+            else:
+                self.reply("250 ok")
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SMTPHandler)
+    server.daemon_threads = True
+    server.messages = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(config, 'SMTP_HOST', "127.0.0.1")
+    monkeypatch.setattr(config, 'SMTP_PORT', server.server_address[1])
+    monkeypatch.setattr(config, 'SMTP_STARTTLS', False)
+    monkeypatch.setattr(config, 'SMTP_USER', "")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_emailed_report_has_rendered_attachments(smtp_server):
+    result = {'condition': "Hypertension", 'timestamp': "2024-05-01 09:30:00",
+              'plan': "## Medications\n- Amlodipine\n\n## Lifestyle\n- Less salt"}
+    report = build_treatment_report(result, {'age': 52, 'gender': "Female"},
+                                    HealthDataHandler.generate_sample_health_data(30))
+    service = ReportService(ReportRenderer(config.REPORT_TEMPLATE_DIR), workers=1)
+    try:
+        files = service.submit(report).result(timeout=60)
+        assert service.email("patient@example.com", report, files).result(timeout=30) == "patient@example.com"
+        stats = service.stats()
+    finally:
+        service.shutdown()
+
+    assert stats['emailed'] == 1 and stats['failed'] == 0
+    assert len(smtp_server.messages) == 1
+    message = email.message_from_bytes(smtp_server.messages[0], policy=email.policy.default)
+    assert message['To'] == "patient@example.com"
+    assert message['Subject'] == "Treatment Plan: Hypertension"
+
+    attachments = {part.get_filename(): part for part in message.iter_attachments()}
+    assert set(attachments) == {report_filename(report, 'pdf'), report_filename(report, 'html')}
+    pdf = attachments[report_filename(report, 'pdf')]
+    html = attachments[report_filename(report, 'html')]
+    assert pdf.get_content_type() == "application/pdf"
+    assert pdf.get_content() == files['pdf']
+    assert html.get_content_type() == "text/html"
+    assert html.get_content().encode('utf-8') == files['html']
+    assert "Amlodipine" in html.get_content()
@@ -6,6 +6,7 @@ except ImportError:
     openai = None
 
 from config import Config
+from utils.anomaly_detection import VitalsAnomalyDetector
 
 
     
@@ -54,6 +55,17 @@ class GraniteAI:
             insights.append("Blood pressure is normal.")
 
         return "\n".join(insights)
+
+    def analyze_health_series(self, df) -> str:
+        """
+        Analyze full metric series: latest-value thresholds plus
+        outliers, change points, trends and out-of-range episodes.
+        """
+        latest = df.iloc[-1].to_dict() if len(df) else {}
+        insights = [self.analyze_health_metrics(latest)]
+        insights.extend(VitalsAnomalyDetector.get_insights(VitalsAnomalyDetector.analyze(df)))
+        return "\n".join(insights)
+
     def generate_response(self, user_input, context=None):
         # This is likely what you want instead of chat_response
         return "AI reply"
@@ -1,8 +1,19 @@
 import streamlit as st
-from huggingface_hub import InferenceClient
 from config import config
+from utils.backends import create_backend
+from utils.generation_policy import GenerationPolicy, required_sections, section_end, sections_complete
+from utils.inference_scheduler import BACKGROUND, INTERACTIVE, METHOD_PRIORITIES, InferenceScheduler, classify
+from utils.metric_summary import MetricSummarizer
+from utils.model_router import LARGE, SMALL, ModelRouter
+from utils.prompt_templates import PromptRegistry
+from utils.response_cache import ResponseCache
+from utils.speculation import SpeculativeEngine, estimate_tokens
+from utils.structured_output import (RAW_KEY, SYMPTOM_ANALYSIS_FIELDS, IncrementalJSONParser, coerce,
+                                     parse_json_object, schema_instructions, treatment_plan_fields)
 import time
 import traceback
+import numpy as np
+import pandas as pd
 
 
 class GraniteHealthAI:
@@ -11,123 +22,411 @@ class GraniteHealthAI:
     def __init__(self):
         self.client = None
         self.model_name = config.MODEL_NAME or "Qwen/Qwen2.5-7B-Instruct"
+        # Routing is on when a small model is configured; self.client is the large model
+        self.clients = {}
+        self.route_models = {LARGE: self.model_name}
+        self.router = None
+        self.response_cache = ResponseCache(config.RESPONSE_CACHE_SIZE, config.RESPONSE_CACHE_TTL)
+        self.prompts = PromptRegistry.load(config.PROMPT_TEMPLATES_PATH)
+        self.scheduler = InferenceScheduler(config.INFERENCE_CONCURRENCY, config.PRIORITY_AGING_SECONDS)
+        self.speculator = SpeculativeEngine(self.scheduler, self.response_cache, config.SPECULATION_MAX_INFLIGHT)
+        self.generation_policy = GenerationPolicy(quantile=config.ADAPTIVE_QUANTILE,
+                                                  headroom=config.ADAPTIVE_HEADROOM,
+                                                  min_samples=config.ADAPTIVE_MIN_SAMPLES,
+                                                  path=config.GENERATION_LENGTHS_PATH or None)
         self._initialize_client()
 
     def _initialize_client(self):
         try:
-            if not config.HUGGINGFACE_TOKEN:
+            if config.MODEL_BACKEND == "huggingface" and not config.HUGGINGFACE_TOKEN:
                 st.error("❌ Hugging Face Token missing in .env")
                 return
 
-            self.client = InferenceClient(
-                model=self.model_name,
-                token=config.HUGGINGFACE_TOKEN
+            self.client = create_backend(
+                config.MODEL_BACKEND,
+                self.model_name,
+                token=config.HUGGINGFACE_TOKEN,
+                stub_latency_ms=config.STUB_LATENCY_MS,
+                quantization=config.LOCAL_QUANTIZATION,
+                gguf_path=config.LOCAL_GGUF_PATH,
+                threads=config.LOCAL_THREADS,
+                mmap_weights=config.LOCAL_MMAP_WEIGHTS,
+                mmap_keep_dtype=config.LOCAL_MMAP_KEEP_DTYPE,
+                cache_dir=config.MODEL_CACHE_DIR,
+                draft_model_name=config.DRAFT_MODEL_NAME or None,
+                draft_tokens=config.DRAFT_TOKENS
             )
-            st.success(f"✅ Model Ready: {self.model_name}")
+            self.clients[LARGE] = self.client
+            if config.SMALL_MODEL_NAME:
+                small_quantization = config.SMALL_MODEL_QUANTIZATION or config.LOCAL_QUANTIZATION
+                if small_quantization == "gguf" and not config.SMALL_MODEL_GGUF_PATH:
+                    # LOCAL_GGUF_PATH holds the large model's weights
+                    small_quantization = "int8"
+                self.clients[SMALL] = create_backend(
+                    config.SMALL_MODEL_BACKEND or config.MODEL_BACKEND,
+                    config.SMALL_MODEL_NAME,
+                    token=config.HUGGINGFACE_TOKEN,
+                    stub_latency_ms=config.STUB_LATENCY_MS,
+                    quantization=small_quantization,
+                    gguf_path=config.SMALL_MODEL_GGUF_PATH,
+                    threads=config.LOCAL_THREADS,
+                    mmap_weights=config.LOCAL_MMAP_WEIGHTS,
+                    mmap_keep_dtype=config.LOCAL_MMAP_KEEP_DTYPE,
+                    cache_dir=config.MODEL_CACHE_DIR
+                )
+                self.route_models[SMALL] = config.SMALL_MODEL_NAME
+                self.router = ModelRouter.load(config.ROUTING_RULES_PATH)
+            st.success(f"✅ Model Ready: {self.model_name}"
+                       + (f" (small model: {config.SMALL_MODEL_NAME})" if self.router else ""))
 
         except Exception as e:
             st.error(f"🔥 AI Initialization Failed: {str(e)}")
             st.code(traceback.format_exc())
 
-    def generate_response(self, prompt: str, max_tokens: int = 512) -> str:
-        """Chat response using Hugging Face Granite model"""
+    def _request(self, prompt: str, max_tokens: int, version: str = None, route: str = LARGE) -> tuple:
+        """Chat messages for a prompt and their response cache key
+
+        `version` is the prompt template's version and `route` the model that
+        answers; both are part of the key so entries never mix.
+        """
+        system = self.prompts.get('system')
+        messages = [
+            {"role": "system", "content": system.render()},
+            {"role": "user", "content": prompt}
+        ]
+        cache_key = ResponseCache.make_key(
+            self.route_models[route], messages, max_tokens, config.TEMPERATURE, config.TOP_P, system.version, version
+        )
+        return messages, cache_key
+
+    def _plan_route(self, method: str, prompt: str, priority: int) -> tuple:
+        """(route, rule id, may overflow) from the routing rules; the large model without a router"""
+        if self.router is None:
+            return LARGE, None, False
+        return self.router.route(method, estimate_tokens(prompt), priority)
+
+    def _start_route(self, route: str, may_overflow: bool) -> str:
+        return self.router.start(route, may_overflow) if self.router else route
+
+    def _finish_route(self, route: str, rule: str, prompt: str, response: str, started: float, overflowed: bool):
+        if self.router:
+            self.router.finish(route, rule, estimate_tokens(prompt), estimate_tokens(response) if response else 0,
+                               time.perf_counter() - started, overflowed, failed=response is None)
+
+    def _draft_kwargs(self, method: str, client=None) -> dict:
+        """Backend flags enabling speculative decoding for request types in DRAFT_METHODS"""
+        client = client or self.client
+        if method in config.DRAFT_METHODS and getattr(client, 'draft_model', None) is not None:
+            return {'speculative': True}
+        return {}
+
+    def _count_tokens(self, text: str) -> int:
+        count = getattr(self.client, 'count_tokens', None)
+        return count(text) if count else estimate_tokens(text)
+
+    def _generate(self, messages: list, max_tokens: int, method: str = None, version: str = None,
+                  route: str = LARGE) -> str:
+        """Generate with an adaptive max_tokens for `method`, stopping once all ✅ sections are done
+
+        Lengths and latency are tracked per prompt template version when
+        one is given, otherwise per method, and separately for the small model.
+        """
+        client = self.clients.get(route, self.client)
+        kwargs = self._draft_kwargs(method, client)
+        label = version or method
+        if label and route != LARGE:
+            label = f"{label} [{route}]"
+        prompt = messages[-1]["content"]
+        prompt_tokens = self._count_tokens(prompt)
+        limit = max_tokens
+        if config.ADAPTIVE_MAX_TOKENS and label:
+            limit = self.generation_policy.limit(label, prompt_tokens, max_tokens)
+
+        stopped = []
+        sections = required_sections(prompt) if config.SECTION_EARLY_STOP else []
+        if sections:
+            def stop(text: str) -> bool:
+                if sections_complete(text, sections):
+                    stopped.append(True)
+                    return True
+                return False
+            kwargs['stop'] = stop
+
+        started = time.perf_counter()
+        response = client.generate(
+            messages,
+            max_tokens=limit,
+            temperature=float(config.TEMPERATURE),
+            top_p=float(config.TOP_P),
+            **kwargs
+        )
+        if stopped:
+            # Drop the heading the model started after the last section
+            end = section_end(response + "\n", sections)
+            if end is not None:
+                response = response[:end].rstrip()
+        if label:
+            self.generation_policy.record(label, prompt_tokens, max_tokens, limit, self._count_tokens(response),
+                                          time.perf_counter() - started, stopped_early=bool(stopped))
+        return response
+
+    def generate_response(self, prompt: str, max_tokens: int = 512, priority: int = INTERACTIVE,
+                          method: str = None, version: str = None) -> str:
+        """Chat response using Hugging Face Granite model, queued by priority class"""
         try:
             if not self.client:
                 return "❌ Model not initialized. Verify API token/model name."
 
-            messages = [
-                {"role": "system", "content": "You are a professional healthcare assistant."},
-                {"role": "user", "content": prompt}
-            ]
+            route, rule, may_overflow = self._plan_route(method, prompt, priority)
+            messages, cache_key = self._request(prompt, max_tokens, version, route)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                self.speculator.record_hit(cache_key)
+                return cached
 
-            response = self.client.chat_completion(
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=float(config.TEMPERATURE),
-                top_p=float(config.TOP_P),
-            )
+            target = self._start_route(route, may_overflow)
+            if target != route:
+                messages, cache_key = self._request(prompt, max_tokens, version, target)
+            response, started = None, time.perf_counter()
+            try:
+                response = self.scheduler.run(
+                    lambda: self._generate(messages, max_tokens, method, version, target), priority)
+            finally:
+                self._finish_route(target, rule, prompt, response, started, target != route)
 
-            return response.choices[0].message["content"].strip()
+            self.response_cache.put(cache_key, response)
+            return response
 
         except Exception as e:
             st.error(f"⚠️ Error generating response:\n{e}")
             st.code(traceback.format_exc())
             return f"Error generating response: {e}"
 
-    def analyze_symptoms(self, symptoms: list, patient_data: dict = None) -> dict:
-        symptoms_text = ", ".join(symptoms)
-        prompt = f"""
-Analyze symptoms and provide information:
+    def _stream_structured(self, prompt: str, fields: dict, max_tokens: int, priority: int, method: str = None,
+                           version: str = None):
+        """Yield (key, value) for each section as soon as it is complete
+
+        Yields (RAW_KEY, text) instead when the reply holds no usable JSON.
+        """
+        if not self.client:
+            yield RAW_KEY, "❌ Model not initialized. Verify API token/model name."
+            return
+
+        route, rule, may_overflow = self._plan_route(method, prompt, priority)
+        messages, cache_key = self._request(prompt, max_tokens, version, route)
+        started = time.perf_counter()
+        cached = self.response_cache.get(cache_key)
+        target = route
+        if cached is not None:
+            self.speculator.record_hit(cache_key)
+            chunks = [cached]
+        else:
+            target = self._start_route(route, may_overflow)
+            if target != route:
+                messages, cache_key = self._request(prompt, max_tokens, version, target)
+            client = self.clients.get(target, self.client)
+            sampling = dict(max_tokens=max_tokens, temperature=float(config.TEMPERATURE), top_p=float(config.TOP_P))
+            if hasattr(client, 'stream_structured'):
+                # Constrained backends always produce valid JSON for the fields
+                chunks = self.scheduler.stream(
+                    lambda: client.stream_structured(messages, fields, **sampling,
+                                                     **self._draft_kwargs(method, client)), priority)
+            else:
+                chunks = self.scheduler.stream(lambda: client.stream(messages, **sampling), priority)
+
+        parser = IncrementalJSONParser()
+        parts, emitted = [], set()
+        text = None
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                for key, value in parser.feed(chunk):
+                    if key in fields and key not in emitted:
+                        emitted.add(key)
+                        yield key, coerce(value, fields[key])
+            text = "".join(parts)
+        except Exception as e:
+            yield RAW_KEY, f"Error generating response: {e}"
+            return
+        finally:
+            if cached is None:
+                self._finish_route(target, rule, prompt, text, started, target != route)
+
+        if cached is None:
+            self.response_cache.put(cache_key, text)
+            # Wall time includes the consumer's work between sections
+            label = version or method
+            if label and target != LARGE:
+                label = f"{label} [{target}]"
+            if label:
+                self.generation_policy.record(label, self._count_tokens(prompt), max_tokens, max_tokens,
+                                              self._count_tokens(text), time.perf_counter() - started)
+
+        # Recover sections the streaming pass missed, e.g. from a fenced reply
+        salvaged = parse_json_object(text)
+        for key, spec in fields.items():
+            if key not in emitted and key in salvaged:
+                emitted.add(key)
+                yield key, coerce(salvaged[key], spec)
+        if not emitted:
+            yield RAW_KEY, text
+
+    def _render(self, name: str, values: dict, parts: dict = None) -> tuple:
+        """(prompt, template version) from the registry
 
-✅ Likely medical conditions (Top 3-5)
-✅ Severity level (Low/Moderate/High)
-✅ Suggested first-aid and precautions
-✅ When to seek urgent care
+        `parts` maps optional part names to their values, or None to leave
+        the part out. The A/B variant is picked from all of these inputs.
+        """
+        template = self.prompts.select(name, values, parts)
+        for key, part_values in (parts or {}).items():
+            values[key] = template.part(key, **part_values) if part_values is not None else ""
+        return template.render(**values), template.version
 
-Symptoms: {symptoms_text}
-"""
-        if patient_data:
-            prompt += f"\nPatient: Age {patient_data.get('age')}, Gender: {patient_data.get('gender')}"
+    @staticmethod
+    def _patient(patient_data: dict = None):
+        if not patient_data:
+            return None
+        return {'age': patient_data.get('age'), 'gender': patient_data.get('gender')}
+
+    def stream_symptom_analysis(self, symptoms: list, patient_data: dict = None):
+        """Structured analyze_symptoms: yields (section, value) as each completes"""
+        prompt, version = self._render('stream_symptom_analysis',
+                                       {'symptoms': ", ".join(symptoms),
+                                        'schema': schema_instructions(SYMPTOM_ANALYSIS_FIELDS)},
+                                       {'patient': self._patient(patient_data)})
+
+        priority = classify('analyze_symptoms', symptoms, patient_data,
+                            config.RED_FLAG_SYMPTOMS, config.URGENT_SEVERITY)
+        yield from self._stream_structured(prompt, SYMPTOM_ANALYSIS_FIELDS, 700, priority, 'analyze_symptoms',
+                                           version)
+
+    def _structured_plan_prompt(self, condition: str, patient_data: dict = None) -> tuple:
+        return self._render('stream_treatment_plan',
+                            {'condition': condition, 'schema': schema_instructions(treatment_plan_fields())},
+                            {'patient': self._patient(patient_data)})
+
+    def stream_treatment_plan(self, condition: str, patient_data: dict = None):
+        """Structured generate_treatment_plan with Config.TREATMENT_TEMPLATES sections"""
+        prompt, version = self._structured_plan_prompt(condition, patient_data)
+        yield from self._stream_structured(prompt, treatment_plan_fields(), 700, INTERACTIVE,
+                                           'generate_treatment_plan', version)
+
+    def analyze_symptoms(self, symptoms: list, patient_data: dict = None) -> dict:
+        prompt, version = self._render('analyze_symptoms', {'symptoms': ", ".join(symptoms)},
+                                       {'patient': self._patient(patient_data)})
+
+        priority = classify('analyze_symptoms', symptoms, patient_data,
+                            config.RED_FLAG_SYMPTOMS, config.URGENT_SEVERITY)
 
         return {
-            "analysis": self.generate_response(prompt, max_tokens=700),
+            "analysis": self.generate_response(prompt, max_tokens=700, priority=priority,
+                                               method='analyze_symptoms', version=version),
             "symptoms": symptoms,
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
         }
 
-    def generate_treatment_plan(self, condition: str, patient_data: dict = None) -> dict:
-        prompt = f"""
-Provide a medical treatment plan for: {condition}
-
-Include:
-
-✅ Medication suggestions (general OTC, if applicable)
-✅ Diet and lifestyle recommendations
-✅ Follow-up advice
-✅ Warning symptoms to monitor
-"""
-        if patient_data:
-            prompt += f"\nPatient: Age {patient_data.get('age')} Gender: {patient_data.get('gender')}"
+    def _treatment_plan_prompt(self, condition: str, patient_data: dict = None) -> tuple:
+        return self._render('generate_treatment_plan', {'condition': condition}, {'patient': self._patient(patient_data)})
 
+    def generate_treatment_plan(self, condition: str, patient_data: dict = None) -> dict:
+        prompt, version = self._treatment_plan_prompt(condition, patient_data)
         return {
-            "plan": self.generate_response(prompt, max_tokens=700),
+            "plan": self.generate_response(prompt, max_tokens=700, method='generate_treatment_plan',
+                                           version=version),
             "condition": condition,
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
         }
 
     def chat_response(self, user_message: str, chat_history: list = None) -> str:
-        history = ""
-        if chat_history:
-            history = "\n".join(
-                [f"User: {msg['user']}\nAssistant: {msg['assistant']}"
-                 for msg in chat_history[-3:]]
-            )
+        template = self.prompts.select('chat_response', user_message)
+        history = "\n".join(template.part('turn', user=msg['user'], assistant=msg['assistant'])
+                            for msg in (chat_history or [])[-3:])
+        prompt = template.render(history=history, message=user_message)
+        return self.generate_response(prompt, max_tokens=450, method='chat_response', version=template.version)
+
+    def _health_trends_prompt(self, metrics_data: dict, findings: str = None) -> tuple:
+        return self._render('analyze_health_trends', {'metrics': self._format_metrics(metrics_data)},
+                            {'findings': {'findings': findings} if findings else None})
+
+    def analyze_health_trends(self, metrics_data: dict, findings: str = None) -> str:
+        prompt, version = self._health_trends_prompt(metrics_data, findings)
+        return self.generate_response(prompt, max_tokens=550, priority=BACKGROUND,
+                                      method='analyze_health_trends', version=version)
+
+    def _speculate(self, session_id: str, target: str, request: tuple, max_tokens: int,
+                   fields: dict = None, method: str = None) -> bool:
+        """Pre-generate a (prompt, template version) request into the response cache"""
+        if not config.SPECULATION_ENABLED or not self.client:
+            return False
+        prompt, version = request
+        # The route the real request will look up; speculation only runs when idle, so no overflow
+        route = self._plan_route(method, prompt, METHOD_PRIORITIES.get(method))[0]
+        client = self.clients.get(route, self.client)
+        messages, cache_key = self._request(prompt, max_tokens, version, route)
+        if fields and hasattr(client, 'stream_structured'):
+            sampling = dict(max_tokens=max_tokens, temperature=float(config.TEMPERATURE), top_p=float(config.TOP_P))
+            generate = lambda: "".join(client.stream_structured(messages, fields, **sampling,
+                                                                **self._draft_kwargs(method, client)))
+        else:
+            generate = lambda: self._generate(messages, max_tokens, method, version, route)
+        return self.speculator.submit(session_id, target, cache_key, generate)
+
+    def speculate_treatment_plan(self, session_id: str, condition: str, patient_data: dict = None) -> bool:
+        """Pre-generate the treatment plan the Treatment Plans page will request"""
+        if config.STRUCTURED_OUTPUT:
+            return self._speculate(session_id, 'treatment_plans',
+                                   self._structured_plan_prompt(condition, patient_data), 700,
+                                   treatment_plan_fields(), 'generate_treatment_plan')
+        return self._speculate(session_id, 'treatment_plans',
+                               self._treatment_plan_prompt(condition, patient_data), 700,
+                               method='generate_treatment_plan')
+
+    def speculate_health_trends(self, session_id: str, metrics_data: dict, findings: str = None) -> bool:
+        """Pre-generate analyze_health_trends(metrics_data, findings) into the cache"""
+        return self._speculate(session_id, 'health_analytics',
+                               self._health_trends_prompt(metrics_data, findings), 550,
+                               method='analyze_health_trends')
 
-        prompt = f"""
-{history}
+    def prompt_versions(self) -> dict:
+        """Version of every loaded prompt template"""
+        return self.prompts.versions()
 
-User: {user_message}
-"""
-        return self.generate_response(prompt, max_tokens=450)
+    def cancel_speculation(self, session_id: str, keep_target: str = None):
+        self.speculator.cancel(session_id, keep_target)
 
-    def analyze_health_trends(self, metrics_data: dict) -> str:
-        prompt = f"""
-Analyze these health metrics:
-{self._format_metrics(metrics_data)}
+    def speculation_stats(self) -> dict:
+        return self.speculator.stats()
 
-Provide:
+    def model_load_stats(self) -> dict:
+        """Load timings and memory of a local model ({} for remote backends)"""
+        return getattr(self.client, 'load_stats', {})
 
-✅ Positive health trends
-✅ Concerning health risks
-✅ Actionable health improvement suggestions
-"""
-        return self.generate_response(prompt, max_tokens=550)
+    def generation_stats(self) -> dict:
+        """Token counts, tokens saved and latency per prompt template version"""
+        return self.generation_policy.stats()
+
+    def routing_stats(self) -> dict:
+        """Requests, overflows, tokens, cost and latency per model route ({} without a small model)"""
+        return self.router.stats() if self.router else {}
+
+    def speculative_decoding_stats(self) -> dict:
+        """Draft acceptance rate and tokens per target pass ({} without a draft model)"""
+        if getattr(self.client, 'draft_model', None) is None:
+            return {}
+        return self.client.speculative_stats()
+
+    def scheduler_stats(self) -> dict:
+        """Queue depth and wait time per priority class"""
+        return self.scheduler.stats()
 
     def _format_metrics(self, metrics: dict) -> str:
+        """Format metrics as one fixed-size summary line each, whatever the series length"""
         formatted = []
         for key, value in metrics.items():
-            if isinstance(value, list) and value:
-                formatted.append(f"{key}: Avg {sum(value)/len(value):.1f} | Range {min(value)}–{max(value)}")
+            if isinstance(value, dict) and 'n' in value:
+                formatted.append(MetricSummarizer.format_summary(key, value))
+            elif isinstance(value, (list, tuple, np.ndarray, pd.Series)) and len(value):
+                formatted.append(MetricSummarizer.format_summary(key, MetricSummarizer.summarize(value, key)))
             else:
                 formatted.append(f"{key}: {value}")
         return "\n".join(formatted)
@@ -135,4 +434,38 @@ Provide:
 
 @st.cache_resource
 def get_ai_model():
+    if config.SERVICE_URL:
+        from utils.service_client import RemoteHealthAI, get_service_client
+        return RemoteHealthAI(get_service_client())
     return GraniteHealthAI()
+
+
+def render_inference_debug():
+    """Show inference queue depth and waits per priority class when DEBUG_MODE is on"""
+    if not config.DEBUG_MODE or 'ai_model' not in st.session_state:
+        return
+    with st.expander("🐞 Inference Queue"):
+        stats = st.session_state.ai_model.scheduler_stats()
+        st.dataframe(pd.DataFrame.from_dict(stats, orient='index'), use_container_width=True)
+        load = getattr(st.session_state.ai_model, 'model_load_stats', dict)()
+        if load:
+            st.caption(f"Model loaded in {load['load_seconds']:.2f}s ({'shared mmap' if load['mmap'] else 'private'} "
+                       f"weights) • USS {load.get('uss_mb', 0):.0f} MB • RSS {load.get('rss_mb', 0):.0f} MB")
+        generation = st.session_state.ai_model.generation_stats()
+        if generation:
+            st.caption("Generation per prompt template version (tokens, tokens saved, latency in seconds)")
+            st.dataframe(pd.DataFrame.from_dict(generation, orient='index'), use_container_width=True)
+        routes = getattr(st.session_state.ai_model, 'routing_stats', dict)()
+        if routes:
+            st.caption("Model routes (cost in relative units, latency in seconds including queue wait)")
+            st.dataframe(pd.DataFrame.from_dict(routes, orient='index'), use_container_width=True)
+        draft = getattr(st.session_state.ai_model, 'speculative_decoding_stats', dict)()
+        if draft:
+            st.caption(f"Speculative decoding: {draft['acceptance_rate'] * 100:.0f}% of drafts accepted • "
+                       f"{draft['tokens_per_pass']:.2f} tokens per target pass • "
+                       f"{draft['tokens_per_second']:.1f} tok/s")
+        if config.SPECULATION_ENABLED:
+            spec = st.session_state.ai_model.speculation_stats()
+            st.metric("Speculation Hit Rate", f"{spec['hit_rate'] * 100:.0f}%")
+            st.caption(f"{spec['hits']} hits • {spec['completed']} generated • {spec['cancelled']} cancelled • "
+                       f"{spec['wasted_tokens']} of {spec['generated_tokens']} tokens wasted")
@@ -0,0 +1,252 @@
+import pandas as pd
+import numpy as np
+from utils.data_handler import HealthDataHandler
+
+# Bound the number of items kept per finding so output size is independent of series length
+MAX_ITEMS = 5
+
+# CUSUM runs on block means so long, high-rate series look for sustained shifts
+CUSUM_MAX_BLOCKS = 1000
+
+
+class VitalsAnomalyDetector:
+    """Vectorized outlier, change point, trend and episode detection on vital signs"""
+
+    @staticmethod
+    def _as_days(dates) -> np.ndarray:
+        """Convert timestamps to float days since the first reading"""
+        ns = pd.to_datetime(pd.Series(dates)).to_numpy().astype('datetime64[ns]').astype(np.int64)
+        return (ns - ns[0]) / 86_400e9 if len(ns) else ns.astype(float)
+
+    @staticmethod
+    def rolling_zscores(values, window: int = 30) -> np.ndarray:
+        """Z-score of each point against the trailing window before it (NaN until warm)"""
+        x = np.asarray(values, dtype=float)
+        n = len(x)
+        z = np.full(n, np.nan)
+        if n <= window:
+            return z
+
+        centered = x - x.mean()
+        cs = np.concatenate(([0.0], np.cumsum(centered)))
+        cs2 = np.concatenate(([0.0], np.cumsum(centered * centered)))
+
+        # Window [t-window, t) for every t >= window
+        total = cs[window:n] - cs[:n - window]
+        total2 = cs2[window:n] - cs2[:n - window]
+        mean = total / window
+        std = np.sqrt(np.maximum(total2 / window - mean * mean, 0))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z[window:] = np.where(std > 0, (centered[window:] - mean) / std, 0.0)
+        return z
+
+    @staticmethod
+    def cusum_change_points(values, k: float = 0.5, h: float = 6.0, warmup: int = 30,
+                            max_points: int = 20) -> list:
+        """Two-sided CUSUM change point detection
+
+        Noise scale comes from successive differences so level shifts do not
+        inflate it. Each scan is vectorized with a cumulative minimum; after an
+        alarm the reference mean is re-estimated from the next warmup readings.
+        Returns (index, direction) pairs where index is the estimated onset.
+        """
+        x = np.asarray(values, dtype=float)
+        if len(x) < 2 * warmup:
+            return []
+        sigma = np.median(np.abs(np.diff(x))) / (0.6745 * np.sqrt(2))
+        if sigma == 0:
+            sigma = x.std()
+        if sigma == 0:
+            return []
+
+        points = []
+        start = 0
+        while len(x) - start > warmup and len(points) < max_points:
+            z = (x[start:] - x[start:start + warmup].mean()) / sigma
+            best = None
+            for direction, seg in (('up', z - k), ('down', -z - k)):
+                c = np.cumsum(seg)
+                stat = c - np.minimum(np.minimum.accumulate(c), 0)
+                alarms = np.flatnonzero(stat > h)
+                if alarms.size and (best is None or alarms[0] < best[0]):
+                    alarm = alarms[0]
+                    # Shift began right after the last point where the statistic was zero
+                    zeros = np.flatnonzero(stat[:alarm] <= 0)
+                    onset = zeros[-1] + 1 if zeros.size else 0
+                    best = (alarm, onset, direction)
+            if best is None:
+                break
+            alarm, onset, direction = best
+            points.append((start + onset, direction))
+            start += max(alarm + 1, onset + 1)
+        return points
+
+    @staticmethod
+    def block_means(values, max_blocks: int = CUSUM_MAX_BLOCKS) -> tuple:
+        """Average consecutive readings into at most max_blocks blocks; returns (means, block size)"""
+        x = np.asarray(values, dtype=float)
+        size = max(1, -(-len(x) // max_blocks))
+        usable = len(x) - len(x) % size
+        means = x[:usable].reshape(-1, size).mean(axis=1)
+        if usable < len(x):
+            means = np.append(means, x[usable:].mean())
+        return means, size
+
+    @staticmethod
+    def linear_trend(values, days) -> dict:
+        """Least-squares slope per day with a 95% confidence interval"""
+        y = np.asarray(values, dtype=float)
+        t = np.asarray(days, dtype=float)
+        n = len(y)
+        if n < 3 or np.ptp(t) == 0:
+            return {'slope_per_day': 0.0, 'ci_low': 0.0, 'ci_high': 0.0, 'r2': 0.0, 'direction': 'stable'}
+
+        t_mean, y_mean = t.mean(), y.mean()
+        sxx = np.sum((t - t_mean) ** 2)
+        slope = np.sum((t - t_mean) * (y - y_mean)) / sxx
+        intercept = y_mean - slope * t_mean
+        resid = y - (intercept + slope * t)
+        sse = np.sum(resid * resid)
+        sst = np.sum((y - y_mean) ** 2)
+        se = np.sqrt(sse / (n - 2) / sxx)
+        margin = 1.96 * se
+
+        ci_low, ci_high = slope - margin, slope + margin
+        if ci_low > 0:
+            direction = 'rising'
+        elif ci_high < 0:
+            direction = 'falling'
+        else:
+            direction = 'stable'
+
+        return {
+            'slope_per_day': float(slope),
+            'ci_low': float(ci_low),
+            'ci_high': float(ci_high),
+            'r2': float(1 - sse / sst) if sst > 0 else 0.0,
+            'direction': direction
+        }
+
+    @staticmethod
+    def out_of_range_episodes(values, low: float, high: float, min_length: int = 3) -> list:
+        """Runs of at least min_length consecutive readings below low or above high
+
+        Returns (start, end, kind) tuples with inclusive end indices.
+        """
+        x = np.asarray(values, dtype=float)
+        episodes = []
+        for kind, mask in (('low', x < low), ('high', x > high)):
+            edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+            starts = np.flatnonzero(edges == 1)
+            ends = np.flatnonzero(edges == -1) - 1
+            keep = (ends - starts + 1) >= min_length
+            episodes.extend(zip(starts[keep].tolist(), ends[keep].tolist(), [kind] * int(keep.sum())))
+        return sorted(episodes)
+
+    @staticmethod
+    def analyze_metric(df: pd.DataFrame, metric: str, window: int = 30,
+                       z_threshold: float = 3.0, min_episode: int = 3) -> dict:
+        """Run every detector over one metric column and return bounded findings"""
+        values = df[metric].to_numpy(dtype=float)
+        dates = pd.to_datetime(df['date']).reset_index(drop=True)
+        days = VitalsAnomalyDetector._as_days(dates)
+
+        z = VitalsAnomalyDetector.rolling_zscores(values, window)
+        outlier_idx = np.flatnonzero(np.abs(np.nan_to_num(z)) >= z_threshold)
+
+        blocks, block_size = VitalsAnomalyDetector.block_means(values)
+        change_points = [
+            (i * block_size, d) for i, d in VitalsAnomalyDetector.cusum_change_points(blocks)
+        ]
+        trend = VitalsAnomalyDetector.linear_trend(values, days)
+
+        episodes = []
+        r = HealthDataHandler.METRIC_RANGES.get(metric)
+        if r:
+            episodes = VitalsAnomalyDetector.out_of_range_episodes(values, r['low'], r['high'], min_episode)
+        longest = sorted(episodes, key=lambda e: e[1] - e[0], reverse=True)[:MAX_ITEMS]
+
+        def shift(idx):
+            span = window * block_size
+            before = values[max(idx - span, 0):idx]
+            after = values[idx:idx + span]
+            return float(after.mean() - before.mean()) if before.size and after.size else 0.0
+
+        return {
+            'metric': metric,
+            'n': int(len(values)),
+            'trend': trend,
+            'outlier_count': int(outlier_idx.size),
+            'outliers': [
+                {'date': dates[i], 'value': float(values[i]), 'z': float(z[i])}
+                for i in outlier_idx[-MAX_ITEMS:]
+            ],
+            'change_point_count': len(change_points),
+            'change_points': [
+                {'date': dates[i], 'direction': d, 'shift': shift(i)}
+                for i, d in change_points[-MAX_ITEMS:]
+            ],
+            'episode_count': len(episodes),
+            'episodes': [
+                {'start': dates[s], 'end': dates[e], 'kind': kind, 'readings': e - s + 1}
+                for s, e, kind in longest
+            ]
+        }
+
+    @staticmethod
+    def analyze(df: pd.DataFrame, metrics: list = None, **kwargs) -> dict:
+        """Findings for every metric present in the frame"""
+        metrics = metrics or [m for m in HealthDataHandler.METRIC_RANGES if m in df]
+        if df.empty:
+            return {}
+        return {m: VitalsAnomalyDetector.analyze_metric(df, m, **kwargs) for m in metrics}
+
+    @staticmethod
+    def get_insights(findings: dict) -> list:
+        """Short human-readable insights for the UI"""
+        insights = []
+        for metric, f in findings.items():
+            name = metric.replace('_', ' ').title()
+            trend = f['trend']
+            if trend['direction'] != 'stable':
+                insights.append(f"{name} is {trend['direction']} by {abs(trend['slope_per_day']):.2f}/day.")
+            if f['episode_count']:
+                worst = f['episodes'][0]
+                insights.append(
+                    f"{name} had {f['episode_count']} sustained out-of-range episode(s); "
+                    f"longest was {worst['readings']} {worst['kind']} readings from "
+                    f"{worst['start']:%Y-%m-%d}."
+                )
+            if f['change_point_count']:
+                last = f['change_points'][-1]
+                insights.append(
+                    f"{name} shifted {last['direction']} ({last['shift']:+.1f}) around {last['date']:%Y-%m-%d}."
+                )
+            if f['outlier_count']:
+                insights.append(f"{name} has {f['outlier_count']} unusual reading(s) vs. its recent baseline.")
+        return insights
+
+    @staticmethod
+    def format_findings(findings: dict) -> str:
+        """Compact, bounded-size text summary of findings for LLM prompts"""
+        lines = []
+        for metric, f in findings.items():
+            trend = f['trend']
+            parts = [
+                f"trend {trend['direction']} {trend['slope_per_day']:+.3f}/day "
+                f"(95% CI {trend['ci_low']:+.3f}..{trend['ci_high']:+.3f})",
+                f"outliers {f['outlier_count']}",
+                f"change points {f['change_point_count']}"
+            ]
+            if f['change_points']:
+                parts[-1] += " [" + ", ".join(
+                    f"{c['date']:%Y-%m-%d} {c['direction']} {c['shift']:+.1f}" for c in f['change_points'][-3:]
+                ) + "]"
+            parts.append(f"out-of-range episodes {f['episode_count']}")
+            if f['episodes']:
+                parts[-1] += " [" + ", ".join(
+                    f"{e['kind']} x{e['readings']} from {e['start']:%Y-%m-%d}" for e in f['episodes'][:3]
+                ) + "]"
+            lines.append(f"{metric}: " + "; ".join(parts))
+        return "\n".join(lines)
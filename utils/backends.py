@@ -0,0 +1,559 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+
+class HuggingFaceBackend:
+    """Chat completions through the Hugging Face Inference API"""
+
+    name = "huggingface"
+
+    def __init__(self, model_name: str, token: str):
+        from huggingface_hub import InferenceClient
+
+        if not token:
+            raise ValueError("Hugging Face Token missing in .env")
+        self.model_name = model_name
+        self.client = InferenceClient(model=model_name, token=token)
+
+    def generate(self, messages: list, max_tokens: int, temperature: float, top_p: float, stop=None) -> str:
+        if stop is not None:
+            return _stream_until(self.stream(messages, max_tokens, temperature, top_p), stop)
+        response = self.client.chat_completion(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+        )
+        return response.choices[0].message["content"].strip()
+
+    def stream(self, messages: list, max_tokens: int, temperature: float, top_p: float):
+        """Yield the reply in chunks as the API streams it"""
+        for chunk in self.client.chat_completion(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+            stream=True,
+        ):
+            content = chunk.choices[0].delta.content
+            if content:
+                yield content
+
+
+def _stream_until(chunks, stop) -> str:
+    """Join streamed chunks, closing the stream once stop(text) holds at a line end"""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        if "\n" in chunk and stop("".join(parts)):
+            chunks.close()
+            break
+    return "".join(parts).strip()
+
+
+def _release_memory():
+    """Return freed heap pages (e.g. dropped fp32 weights) to the OS"""
+    import ctypes
+    import gc
+
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except OSError:
+        pass  # not glibc
+
+
+class LocalTransformersBackend:
+    """Generation with a locally loaded transformers model
+
+    quantization="int8" replaces every nn.Linear with a dynamically
+    quantized int8 version (weights stored as int8, activations quantized
+    per batch), which cuts weight memory about 4x and speeds up CPU matmuls.
+
+    With a draft model, calls made with speculative=True use speculative
+    decoding: the draft proposes draft_tokens tokens, and the target model
+    checks them all in one forward pass. The output distribution is the
+    target's own; greedy output is identical to plain greedy decoding.
+    """
+
+    name = "local"
+
+    def __init__(self, model_name: str, device: str = "cpu", quantization: str = "none",
+                 mmap_weights: bool = False, cache_dir: str = "data/model_cache",
+                 draft_model_name: str = None, draft_tokens: int = 4, mmap_keep_dtype: bool = False):
+        import torch
+        from utils.model_loader import ModelLoader
+
+        if quantization not in ("none", "int8"):
+            raise ValueError(f"Unknown local quantization: {quantization}")
+        self.model_name = model_name
+        self.device = device
+        self.quantization = quantization
+        # Quantized weights are private copies, so only fp32/bf16 CPU models share mapped pages
+        loader = ModelLoader(cache_dir)
+        self.tokenizer, self.model = loader.load(model_name, mmap_weights and quantization == "none" and device == "cpu",
+                                                 mmap_keep_dtype)
+        self.load_stats = loader.stats
+        self.model.to(device)
+        if quantization == "int8":
+            if device != "cpu":
+                raise ValueError("int8 dynamic quantization is only supported on CPU")
+            fp32_model = self.model
+            self.model = torch.ao.quantization.quantize_dynamic(fp32_model, {torch.nn.Linear}, dtype=torch.qint8)
+            del fp32_model
+            _release_memory()
+        self.model.eval()
+
+        self.draft_model = None
+        self.draft_tokens = draft_tokens
+        self._draft_lock = threading.Lock()
+        self.draft_metrics = {'requests': 0, 'proposed': 0, 'accepted': 0, 'target_passes': 0,
+                              'tokens': 0, 'seconds': 0.0}
+        if draft_model_name:
+            draft_tokenizer, self.draft_model = ModelLoader(cache_dir).load(draft_model_name,
+                                                                            mmap_weights and device == "cpu",
+                                                                            mmap_keep_dtype)
+            if draft_tokenizer.get_vocab() != self.tokenizer.get_vocab():
+                raise ValueError("The draft model must use the same tokenizer as the target model")
+            self.draft_model.to(device)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer(text, add_special_tokens=False).input_ids)
+
+    def _encode(self, messages: list):
+        if getattr(self.tokenizer, "chat_template", None):
+            encoded = self.tokenizer.apply_chat_template(messages, add_generation_prompt=True, return_tensors="pt")
+            # Newer transformers return a BatchEncoding instead of the ids tensor
+            ids = encoded if hasattr(encoded, "shape") else encoded["input_ids"]
+            return ids.to(self.device)
+        text = "\n".join(f"{m['role']}: {m['content']}" for m in messages) + "\nassistant:"
+        return self.tokenizer(text, return_tensors="pt").input_ids.to(self.device)
+
+    @staticmethod
+    def _probs(logits, temperature: float, top_p: float):
+        """Sampling distribution after temperature and top-p; None for greedy"""
+        import torch
+
+        if temperature <= 0:
+            return None
+        probs = torch.softmax(logits.float() / temperature, dim=-1)
+        if top_p < 1.0:
+            sorted_probs, order = probs.sort(descending=True)
+            sorted_probs = sorted_probs * (sorted_probs.cumsum(-1) - sorted_probs < top_p)
+            probs = torch.zeros_like(probs).scatter(-1, order, sorted_probs)
+            probs = probs / probs.sum()
+        return probs
+
+    @staticmethod
+    def _pick(logits, probs) -> int:
+        return int(logits.argmax()) if probs is None else int(probs.multinomial(1))
+
+    @staticmethod
+    def _forward(model, ids, cache):
+        output = model(input_ids=ids, past_key_values=cache, use_cache=True)
+        return output.logits, output.past_key_values
+
+    @staticmethod
+    def _crop(cache, length: int):
+        """Drop cached positions from `length` on (rejected draft tokens)"""
+        if hasattr(cache, "crop"):
+            cache.crop(length - cache.get_seq_length())
+            return cache
+        return tuple((k[..., :length, :], v[..., :length, :]) for k, v in cache)
+
+    def _speculative(self, ids, max_new_tokens: int, temperature: float, top_p: float, stop=None) -> list:
+        """New token ids from draft-and-verify decoding
+
+        Each round the draft model proposes up to draft_tokens tokens and the
+        target scores all of them in one forward pass. Greedy decoding keeps
+        the longest prefix matching the target's argmax. Sampling accepts each
+        token with probability min(1, p/q) and resamples a rejection from
+        max(0, p - q). Either way the target adds one token of its own, so
+        every pass yields between 1 and draft_tokens + 1 tokens. Both KV
+        caches are cropped back past rejected tokens.
+        """
+        import torch
+
+        def tensor(tokens):
+            return torch.tensor([tokens], dtype=ids.dtype, device=ids.device)
+
+        started = time.perf_counter()
+        eos = self.tokenizer.eos_token_id
+        target_cache = draft_cache = None
+        target_len = draft_len = 0  # positions covered by each cache
+        new, proposed, accepted, passes = [], 0, 0, 0
+        done = False
+        with torch.no_grad():
+            while not done and len(new) < max_new_tokens:
+                seq = torch.cat([ids, tensor(new)], dim=1) if new else ids
+                length = seq.shape[1]
+
+                # Leave room for the target's own token within max_new_tokens
+                drafts, draft_probs = [], []
+                draft_input = seq[:, draft_len:]
+                for _ in range(min(self.draft_tokens, max_new_tokens - len(new) - 1)):
+                    logits, draft_cache = self._forward(self.draft_model, draft_input, draft_cache)
+                    draft_len += draft_input.shape[1]
+                    q = self._probs(logits[0, -1], temperature, top_p)
+                    drafts.append(self._pick(logits[0, -1], q))
+                    draft_probs.append(q)
+                    draft_input = tensor(drafts[-1:])
+
+                verify_input = torch.cat([seq[:, target_len:], tensor(drafts)], dim=1) if drafts else seq[:, target_len:]
+                logits, target_cache = self._forward(self.model, verify_input, target_cache)
+                passes += 1
+                # Row i predicts the token after seq + drafts[:i]
+                logits = logits[0, length - target_len - 1:]
+                target_len += verify_input.shape[1]
+
+                n_ok, correction = 0, None
+                for i, token in enumerate(drafts):
+                    p = self._probs(logits[i], temperature, top_p)
+                    if p is None:
+                        if int(logits[i].argmax()) == token:
+                            n_ok += 1
+                            continue
+                        correction = int(logits[i].argmax())
+                    else:
+                        q = draft_probs[i]
+                        if float(torch.rand(())) < min(1.0, float(p[token] / q[token])):
+                            n_ok += 1
+                            continue
+                        residual = (p - q).clamp(min=0)
+                        correction = int((residual if residual.sum() > 0 else p).multinomial(1))
+                    break
+                if correction is None:
+                    # Every draft accepted: the target's next token comes free
+                    correction = self._pick(logits[len(drafts)], self._probs(logits[len(drafts)], temperature, top_p))
+                proposed += len(drafts)
+                accepted += n_ok
+
+                # Caches cover the sequence minus its last token
+                keep = length + n_ok
+                if target_len > keep:
+                    target_cache, target_len = self._crop(target_cache, keep), keep
+                if draft_len > keep:
+                    draft_cache, draft_len = self._crop(draft_cache, keep), keep
+
+                for token in drafts[:n_ok] + [correction]:
+                    if token == eos:
+                        done = True
+                        break
+                    new.append(token)
+                    if len(new) >= max_new_tokens or (stop is not None and stop(new)):
+                        done = True
+                        break
+
+        with self._draft_lock:
+            m = self.draft_metrics
+            m['requests'] += 1
+            m['proposed'] += proposed
+            m['accepted'] += accepted
+            m['target_passes'] += passes
+            m['tokens'] += len(new)
+            m['seconds'] += time.perf_counter() - started
+        return new
+
+    def speculative_stats(self) -> dict:
+        """Draft acceptance and throughput of speculative decoding so far"""
+        with self._draft_lock:
+            m = dict(self.draft_metrics)
+        m['acceptance_rate'] = m['accepted'] / m['proposed'] if m['proposed'] else 0.0
+        m['tokens_per_pass'] = m['tokens'] / m['target_passes'] if m['target_passes'] else 0.0
+        m['tokens_per_second'] = m['tokens'] / m['seconds'] if m['seconds'] else 0.0
+        return m
+
+    def _line_stop(self, stop):
+        """Token-list predicate calling stop(text) whenever a token ends a line"""
+        tokenizer = self.tokenizer
+
+        def check(new: list) -> bool:
+            return "\n" in tokenizer.decode(new[-1:]) and stop(tokenizer.decode(new, skip_special_tokens=True))
+        return check
+
+    def generate(self, messages: list, max_tokens: int, temperature: float, top_p: float,
+                 speculative: bool = False, stop=None) -> str:
+        """Reply text; stop(text) is checked at each line end and ends generation when true"""
+        import torch
+        from transformers import StoppingCriteria, StoppingCriteriaList
+
+        input_ids = self._encode(messages)
+        check = self._line_stop(stop) if stop is not None else None
+        if speculative and self.draft_model is not None:
+            new = self._speculative(input_ids, max_tokens, temperature, top_p, stop=check)
+            return self.tokenizer.decode(new, skip_special_tokens=True).strip()
+
+        criteria = []
+        if check is not None:
+            start = input_ids.shape[1]
+
+            class SectionsDone(StoppingCriteria):
+                def __call__(self, input_ids, scores, **kwargs):
+                    return check(input_ids[0, start:].tolist())
+
+            criteria.append(SectionsDone())
+        with torch.no_grad():
+            output = self.model.generate(
+                input_ids,
+                max_new_tokens=max_tokens,
+                do_sample=temperature > 0,
+                temperature=temperature if temperature > 0 else None,
+                top_p=top_p,
+                pad_token_id=self.tokenizer.pad_token_id or self.tokenizer.eos_token_id,
+                stopping_criteria=StoppingCriteriaList(criteria),
+            )
+        return self.tokenizer.decode(output[0, input_ids.shape[1]:], skip_special_tokens=True).strip()
+
+    def stream(self, messages: list, max_tokens: int, temperature: float, top_p: float):
+        """Yield decoded text as generation proceeds"""
+        import torch
+        from transformers import TextIteratorStreamer
+
+        input_ids = self._encode(messages)
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+        def run():
+            with torch.no_grad():
+                self.model.generate(
+                    input_ids,
+                    max_new_tokens=max_tokens,
+                    do_sample=temperature > 0,
+                    temperature=temperature if temperature > 0 else None,
+                    top_p=top_p,
+                    pad_token_id=self.tokenizer.pad_token_id or self.tokenizer.eos_token_id,
+                    streamer=streamer,
+                )
+
+        threading.Thread(target=run, daemon=True).start()
+        yield from streamer
+
+    def _append(self, ids, text: str):
+        import torch
+
+        extra = self.tokenizer(text, add_special_tokens=False, return_tensors="pt").input_ids.to(self.device)
+        return torch.cat([ids, extra], dim=1)
+
+    def _choose(self, ids, options: list) -> int:
+        """Index of the option the model finds most likely after ids"""
+        import torch
+
+        scores = []
+        with torch.no_grad():
+            for option in options:
+                candidate = self._append(ids, option)
+                n = candidate.shape[1] - ids.shape[1]
+                logits = self.model(candidate).logits[0, -n - 1:-1]
+                log_probs = torch.log_softmax(logits.float(), dim=-1)
+                scores.append(log_probs.gather(1, candidate[0, -n:, None]).sum().item())
+        return max(range(len(options)), key=scores.__getitem__)
+
+    def _string_content(self, ids, max_tokens: int, temperature: float, top_p: float,
+                        speculative: bool = False) -> tuple:
+        """Generate a JSON string body after an opening quote; returns (text, tokens used)"""
+        import torch
+        from transformers import StoppingCriteria, StoppingCriteriaList
+
+        tokenizer = self.tokenizer
+        start = ids.shape[1]
+        closing = re.compile(r'(?<!\\)"|\n')
+
+        if speculative and self.draft_model is not None:
+            new = self._speculative(ids, max_tokens, temperature, top_p,
+                                    stop=lambda new: bool(closing.search(tokenizer.decode(new, skip_special_tokens=True))))
+            text = tokenizer.decode(new, skip_special_tokens=True)
+            return closing.split(text, maxsplit=1)[0].replace('\\"', '"').strip(), len(new)
+
+        class ClosingQuote(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                text = tokenizer.decode(input_ids[0, start:], skip_special_tokens=True)
+                return bool(re.search(r'(?<!\\)"|\n', text))
+
+        with torch.no_grad():
+            output = self.model.generate(
+                ids,
+                max_new_tokens=max_tokens,
+                do_sample=temperature > 0,
+                temperature=temperature if temperature > 0 else None,
+                top_p=top_p,
+                pad_token_id=self.tokenizer.pad_token_id or self.tokenizer.eos_token_id,
+                stopping_criteria=StoppingCriteriaList([ClosingQuote()]),
+            )
+        text = tokenizer.decode(output[0, start:], skip_special_tokens=True)
+        text = re.split(r'(?<!\\)"|\n', text, maxsplit=1)[0].replace('\\"', '"').strip()
+        return text, output.shape[1] - start
+
+    def stream_structured(self, messages: list, fields: dict, max_tokens: int,
+                          temperature: float, top_p: float, item_tokens: int = 80, speculative: bool = False):
+        """Yield a JSON object for `fields` that always parses
+
+        The JSON scaffold (braces, keys, quotes, commas) is written by this
+        method, not sampled. The model only fills in string contents and
+        chooses between the allowed continuations at each structural point
+        (next array item or end of array, enum value), so malformed output
+        and retries are impossible.
+        """
+        ids = self._append(self._encode(messages), "{")
+        budget = max_tokens
+        yield "{"
+        for i, (key, spec) in enumerate(fields.items()):
+            piece = ("" if i == 0 else ", ") + json.dumps(key) + ": "
+            if spec['type'] == 'enum':
+                ids = self._append(ids, piece)
+                options = [json.dumps(c) for c in spec['choices']]
+                choice = options[self._choose(ids, options)]
+                ids = self._append(ids, choice)
+                yield piece + choice
+                continue
+
+            ids = self._append(ids, piece + "[")
+            yield piece + "["
+            for n in range(spec['max_items']):
+                if n and (budget <= 0 or self._choose(ids, [', "', "]"]) == 1):
+                    break
+                opener = ', "' if n else '"'
+                ids = self._append(ids, opener)
+                text, used = self._string_content(ids, min(item_tokens, max(budget, 1)), temperature, top_p,
+                                                  speculative)
+                budget -= used
+                item = json.dumps(text)
+                ids = self._append(ids, item[1:])
+                yield (", " if n else "") + item
+            ids = self._append(ids, "]")
+            yield "]"
+        yield "}"
+
+
+class LlamaCppBackend:
+    """Generation from a quantized GGUF model file with llama.cpp on CPU"""
+
+    name = "gguf"
+
+    def __init__(self, model_path: str, n_ctx: int = 4096, n_threads: int = 0):
+        from llama_cpp import Llama
+
+        if not model_path or not os.path.exists(model_path):
+            raise ValueError(f"GGUF model file not found: {model_path!r} (set LOCAL_GGUF_PATH)")
+        self.model_name = os.path.basename(model_path)
+        self.llm = Llama(model_path=model_path, n_ctx=n_ctx, n_threads=n_threads or None, verbose=False)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.llm.tokenize(text.encode("utf-8"), add_bos=False))
+
+    def generate(self, messages: list, max_tokens: int, temperature: float, top_p: float, stop=None) -> str:
+        if stop is not None:
+            return _stream_until(self.stream(messages, max_tokens, temperature, top_p), stop)
+        response = self.llm.create_chat_completion(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+        )
+        return response["choices"][0]["message"]["content"].strip()
+
+    def stream(self, messages: list, max_tokens: int, temperature: float, top_p: float):
+        for chunk in self.llm.create_chat_completion(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+            stream=True,
+        ):
+            content = chunk["choices"][0]["delta"].get("content")
+            if content:
+                yield content
+
+
+class StubBackend:
+    """Deterministic offline backend for development, tests and benchmarks
+
+    Replies are derived from the prompt (one line per requested section) and
+    take latency_ms to arrive, so throughput measurements are meaningful
+    without network access or model weights.
+    """
+
+    name = "stub"
+
+    def __init__(self, model_name: str = "stub", latency_ms: float = 0.0):
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+
+    def _reply(self, messages: list, max_tokens: int) -> str:
+        prompt = messages[-1]["content"]
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        sections = re.findall(r"✅\s*(.+)", prompt) or ["Response"]
+
+        lines = [f"[{self.model_name} stub {digest}]"]
+        for section in sections:
+            lines.append(f"**{section.strip()}**")
+            lines.append(f"- General guidance about {section.strip().lower()}.")
+        text = "\n".join(lines)
+
+        words = text.split()
+        if len(words) > max_tokens:
+            text = " ".join(words[:max_tokens])
+        return text
+
+    def generate(self, messages: list, max_tokens: int, temperature: float, top_p: float, stop=None) -> str:
+        text = self._reply(messages, max_tokens)
+        if stop is not None:
+            lines = text.split("\n")
+            for n in range(1, len(lines)):
+                if stop("\n".join(lines[:n]) + "\n"):
+                    text = "\n".join(lines[:n])
+                    break
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return text
+
+    def _chunks(self, text: str, size: int = 16):
+        """Yield text in small pieces spread over latency_ms"""
+        pieces = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        for piece in pieces:
+            if self.latency_ms:
+                time.sleep(self.latency_ms / 1000 / len(pieces))
+            yield piece
+
+    def stream(self, messages: list, max_tokens: int, temperature: float, top_p: float):
+        yield from self._chunks(self._reply(messages, max_tokens))
+
+    def stream_structured(self, messages: list, fields: dict, max_tokens: int,
+                          temperature: float, top_p: float):
+        """Deterministic JSON for `fields`, streamed in small chunks"""
+        digest = hashlib.sha256(messages[-1]["content"].encode("utf-8")).hexdigest()[:8]
+        reply = {}
+        for key, spec in fields.items():
+            if spec['type'] == 'enum':
+                reply[key] = spec['choices'][int(digest, 16) % len(spec['choices'])]
+            else:
+                reply[key] = [f"General guidance about {spec['description'].lower()} ({digest}).",
+                              f"[{self.model_name} stub] Follow up with a healthcare provider."]
+        yield from self._chunks(json.dumps(reply, ensure_ascii=False))
+
+
+def create_backend(name: str, model_name: str, token: str = None, stub_latency_ms: float = 0.0,
+                   quantization: str = "none", gguf_path: str = None, threads: int = 0,
+                   mmap_weights: bool = False, cache_dir: str = "data/model_cache",
+                   draft_model_name: str = None, draft_tokens: int = 4, mmap_keep_dtype: bool = False):
+    """Build the inference backend selected by Config.MODEL_BACKEND
+
+    For the local backend, quantization is "none" (fp32), "int8" (torch
+    dynamic quantization) or "gguf" (llama.cpp with the file at gguf_path).
+    """
+    if name == "huggingface":
+        return HuggingFaceBackend(model_name, token)
+    if name == "local":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        if quantization == "gguf":
+            return LlamaCppBackend(gguf_path, n_threads=threads)
+        return LocalTransformersBackend(model_name, quantization=quantization, mmap_weights=mmap_weights,
+                                        cache_dir=cache_dir, draft_model_name=draft_model_name,
+                                        draft_tokens=draft_tokens, mmap_keep_dtype=mmap_keep_dtype)
+    if name == "stub":
+        return StubBackend(model_name, stub_latency_ms)
+    raise ValueError(f"Unknown model backend: {name}")
@@ -0,0 +1,265 @@
+"""Offline batch inference over JSONL intake forms
+
+    python -m utils.batch run intake.jsonl results.jsonl --concurrency 8
+    MODEL_BACKEND=stub python -m utils.batch run intake.jsonl results.jsonl
+
+Each input line is one request:
+
+    {"id": "a1", "task": "analyze_symptoms", "symptoms": ["fever", "cough"], "patient": {"age": 40}}
+    {"id": "p1", "task": "generate_treatment_plan", "condition": "Asthma", "patient": {"age": 12}}
+
+Each output line holds the request id, the result (text, or a dict of
+sections with --structured) and timing. Finished ids in the output file act
+as the checkpoint: rerunning the same command skips them and retries only
+missing or failed requests. Identical requests are generated once and
+their result is reused.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import config
+from utils.plan_library import ERROR_PREFIXES
+from utils.response_cache import ResponseCache
+from utils.speculation import estimate_tokens
+from utils.structured_output import RAW_KEY
+
+TASKS = ('analyze_symptoms', 'generate_treatment_plan')
+
+
+def read_done(path: str, results: ResponseCache = None) -> set:
+    """Ids an earlier run finished without error; their results go into `results`"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line of an interrupted run
+            if 'error' not in record:
+                done.add(record['id'])
+                if results is not None:
+                    results.put(record['key'], record['result'])
+    return done
+
+
+def drop_torn_tail(path: str):
+    """Cut an interrupted run's partial last line so appends start on a fresh line"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def request_key(request: dict, structured: bool) -> str:
+    """Dedup key: everything that determines the result, but not the id"""
+    args = (request.get('symptoms'), request.get('condition'), request.get('patient'))
+    return ResponseCache.make_key(request['task'], args, structured)
+
+
+class BatchRunner:
+    """Runs JSONL requests through a model with bounded concurrency
+
+    At most `concurrency` requests run at once and at most twice that many
+    are read ahead, so memory stays flat however long the input is.
+    Duplicate requests wait on the first copy's result (single flight) and
+    later ones are served from a bounded cache of recent results, instead
+    of calling the model again.
+    """
+
+    def __init__(self, model, concurrency: int = 4, structured: bool = False, sync_every: int = 50,
+                 dedup_entries: int = 10000):
+        self.model = model
+        self.concurrency = max(concurrency, 1)
+        self.structured = structured
+        self.sync_every = sync_every
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._results = ResponseCache(dedup_entries, ttl_seconds=float('inf'))
+        self.completed = 0
+        self.skipped = 0
+        self.deduplicated = 0
+        self.failed = 0
+        self.output_tokens = 0
+        self.started = None
+
+    def _call(self, request: dict):
+        patient = request.get('patient') or {}
+        if request['task'] == 'analyze_symptoms':
+            if self.structured:
+                return dict(self.model.stream_symptom_analysis(request['symptoms'], patient))
+            return self.model.analyze_symptoms(request['symptoms'], patient)['analysis']
+        if self.structured:
+            return dict(self.model.stream_treatment_plan(request['condition'], patient))
+        return self.model.generate_treatment_plan(request['condition'], patient)['plan']
+
+    def _result(self, request: dict, key: str):
+        """(result, deduplicated) computing each distinct request once"""
+        cached = self._results.get(key)
+        if cached is not None:
+            return cached, True
+        with self._lock:
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self._inflight[key] = threading.Event()
+        if not owner:
+            event.wait()
+            cached = self._results.get(key)
+            if cached is not None:
+                return cached, True
+            return self._result(request, key)  # the first copy failed; try ourselves
+
+        try:
+            result = self._call(request)
+            text = result.get(RAW_KEY, "") if isinstance(result, dict) else result
+            if text.startswith(ERROR_PREFIXES):
+                raise RuntimeError(text[:200])
+            self._results.put(key, result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+
+    def _process(self, request: dict, out, write_lock):
+        started = time.perf_counter()
+        key = request_key(request, self.structured)
+        record = {'id': request['id'], 'task': request['task'], 'key': key}
+        try:
+            if request['task'] not in TASKS:
+                raise ValueError(f"Unknown task: {request['task']}")
+            result, deduplicated = self._result(request, key)
+            record.update(result=result, deduplicated=deduplicated)
+            text = result if isinstance(result, str) else json.dumps(result, ensure_ascii=False)
+            with self._lock:
+                self.completed += 1
+                self.deduplicated += deduplicated
+                if not deduplicated:
+                    self.output_tokens += estimate_tokens(text)
+        except Exception as e:
+            record['error'] = str(e)
+            with self._lock:
+                self.failed += 1
+        record['seconds'] = round(time.perf_counter() - started, 4)
+
+        with write_lock:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            if self.sync_every and (self.completed + self.failed) % self.sync_every == 0:
+                os.fsync(out.fileno())
+
+    @staticmethod
+    def read_requests(path: str):
+        """Yield requests, giving id-less lines a line-number id"""
+        with open(path, encoding='utf-8') as f:
+            for n, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    request = {'task': 'invalid'}
+                request.setdefault('id', f"line-{n}")
+                request.setdefault('task', 'invalid')
+                yield request
+
+    def run(self, input_path: str, output_path: str, resume: bool = True, progress_seconds: float = 10,
+            log=print) -> dict:
+        if resume:
+            drop_torn_tail(output_path)
+            done = read_done(output_path, self._results)
+        else:
+            done = set()
+            open(output_path, 'w').close()
+
+        self.started = time.perf_counter()
+        window = threading.BoundedSemaphore(self.concurrency * 2)
+        write_lock = threading.Lock()
+        stop = threading.Event()
+
+        def report_progress():
+            while not stop.wait(progress_seconds):
+                log(self.format_stats())
+
+        threading.Thread(target=report_progress, daemon=True).start()
+
+        def task(request, out):
+            try:
+                self._process(request, out, write_lock)
+            finally:
+                window.release()
+
+        try:
+            with open(output_path, 'a', encoding='utf-8') as out, \
+                    ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as pool:
+                for request in self.read_requests(input_path):
+                    if request['id'] in done:
+                        self.skipped += 1
+                        continue
+                    window.acquire()
+                    pool.submit(task, request, out)
+        finally:
+            stop.set()
+        return self.stats()
+
+    def stats(self) -> dict:
+        with self._lock:
+            elapsed = time.perf_counter() - self.started if self.started else 0.0
+            return {
+                'completed': self.completed,
+                'deduplicated': self.deduplicated,
+                'failed': self.failed,
+                'skipped': self.skipped,
+                'seconds': round(elapsed, 2),
+                'requests_per_second': round(self.completed / elapsed, 2) if elapsed else 0.0,
+                'output_tokens': self.output_tokens,
+                'tokens_per_second': round(self.output_tokens / elapsed, 1) if elapsed else 0.0,
+            }
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (f"{s['completed']} done ({s['deduplicated']} deduplicated), {s['failed']} failed, "
+                f"{s['skipped']} skipped • {s['requests_per_second']} req/s • "
+                f"{s['tokens_per_second']} tok/s (~{s['output_tokens']} tokens)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch symptom analyses and treatment plans from JSONL")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="Process an input file (resumes from the output file)")
+    run.add_argument("input")
+    run.add_argument("output")
+    run.add_argument("--concurrency", type=int, default=config.INFERENCE_CONCURRENCY)
+    run.add_argument("--structured", action="store_true", help="Write JSON sections instead of text")
+    run.add_argument("--fresh", action="store_true", help="Overwrite the output instead of resuming")
+    run.add_argument("--progress", type=float, default=10, help="Seconds between progress lines")
+    run.add_argument("--dedup-entries", type=int, default=10000, help="Recent results kept for deduplication")
+    args = parser.parse_args()
+
+    # The scheduler must allow as many concurrent backend calls as the batch issues
+    config.INFERENCE_CONCURRENCY = max(config.INFERENCE_CONCURRENCY, args.concurrency)
+    from utils.ai_model import GraniteHealthAI
+    model = GraniteHealthAI()
+    if not model.client:
+        sys.exit("Model backend failed to initialize")
+
+    runner = BatchRunner(model, args.concurrency, args.structured, dedup_entries=args.dedup_entries)
+    log = lambda line: print(line, file=sys.stderr, flush=True)
+    stats = runner.run(args.input, args.output, resume=not args.fresh, progress_seconds=args.progress, log=log)
+    log(runner.format_stats())
+    print(json.dumps({**stats, 'response_cache': model.response_cache.stats(),
+                      'generation': model.generation_stats()}, indent=2))
+    if stats['failed']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
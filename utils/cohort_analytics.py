@@ -0,0 +1,145 @@
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from utils.compute_pool import get_compute_pool
+from utils.data_handler import HealthDataHandler
+
+SCORED_METRICS = list(HealthDataHandler.SCORE_RULES)
+
+
+class CohortAnalytics:
+    """Population-level analytics over many patients"""
+
+    @staticmethod
+    def generate_sample_cohort_data(n_patients: int = 1000, days: int = 30, seed: int = None):
+        """Generate sample long-format health metrics for a cohort of patients"""
+        rng = np.random.default_rng(seed)
+        dates = pd.date_range(end=datetime.now(), periods=days, freq='D')
+        rows = n_patients * days
+
+        # Each patient gets a baseline offset and a daily drift so some deteriorate
+        patient_idx = np.repeat(np.arange(n_patients), days)
+        day_idx = np.tile(np.arange(days), n_patients)
+        drift = rng.normal(0, 0.4, n_patients)[patient_idx] * day_idx
+
+        def metric(mean, std, offset_std, sign=1):
+            offset = rng.normal(0, offset_std, n_patients)[patient_idx]
+            return rng.normal(mean, std, rows) + offset + sign * drift
+
+        data = {
+            'patient_id': np.char.add('P', np.char.zfill(patient_idx.astype(str), 6)),
+            'date': np.tile(dates.values, n_patients),
+            'heart_rate': metric(75, 8, 6).astype(int),
+            'blood_pressure_systolic': metric(120, 10, 8).astype(int),
+            'blood_pressure_diastolic': metric(80, 7, 5).astype(int),
+            'blood_glucose': metric(95, 10, 8).astype(int),
+            'temperature': rng.normal(98.6, 0.5, rows).round(1),
+            'oxygen_saturation': np.clip(metric(98, 1.5, 1, sign=-0.1), 80, 100).astype(int),
+            'weight': metric(70, 1, 10, sign=0).round(1)
+        }
+
+        return pd.DataFrame(data)
+
+    @staticmethod
+    def calculate_health_scores(df: pd.DataFrame) -> np.ndarray:
+        """Vectorized HealthDataHandler.calculate_health_score over every row"""
+        score = np.full(len(df), 100, dtype=np.int16)
+        for metric, rule in HealthDataHandler.SCORE_RULES.items():
+            values = df[metric].to_numpy()
+            score -= np.where((values < rule['low']) | (values > rule['high']), rule['penalty'], 0).astype(np.int16)
+
+        return np.maximum(score, 0)
+
+    @staticmethod
+    def get_metric_status_codes(metric_name: str, values) -> np.ndarray:
+        """Vectorized HealthDataHandler.get_metric_status: -1 Low, 0 Normal, 1 High"""
+        r = HealthDataHandler.METRIC_RANGES[metric_name]
+        values = np.asarray(values)
+        return np.where(values < r['low'], -1, np.where(values > r['high'], 1, 0)).astype(np.int8)
+
+    @staticmethod
+    def get_risk_levels(scores) -> np.ndarray:
+        """Vectorized HealthDataHandler.get_risk_level labels"""
+        scores = np.asarray(scores)
+        return np.where(scores >= 80, "Low Risk", np.where(scores >= 60, "Moderate Risk", "High Risk"))
+
+    @staticmethod
+    def _summarize_shard(df: pd.DataFrame) -> tuple:
+        """Reduce one shard of patients to its latest snapshot and per-patient score slopes"""
+        df = df.sort_values(['patient_id', 'date'], kind='stable')
+        scores = CohortAnalytics.calculate_health_scores(df)
+
+        latest = df.assign(health_score=scores).drop_duplicates('patient_id', keep='last')
+
+        # Least-squares slope of health score vs. day, computed from group sums
+        t = (df['date'] - df['date'].min()).dt.total_seconds().to_numpy() / 86400.0
+        parts = pd.DataFrame({
+            'patient_id': df['patient_id'].to_numpy(),
+            'n': 1.0,
+            't': t,
+            's': scores.astype(float),
+            'tt': t * t,
+            'ts': t * scores
+        })
+        sums = parts.groupby('patient_id', sort=False).sum()
+        denom = sums['n'] * sums['tt'] - sums['t'] ** 2
+        slope = (sums['n'] * sums['ts'] - sums['t'] * sums['s']) / denom.where(denom != 0)
+
+        slopes = pd.DataFrame({'patient_id': sums.index, 'score_slope': slope.fillna(0.0).to_numpy()})
+        return latest, slopes
+
+    @staticmethod
+    def _shard(df: pd.DataFrame, shards: int) -> list:
+        """Split a cohort into patient-aligned shards"""
+        codes = pd.util.hash_pandas_object(df['patient_id'], index=False).to_numpy() % shards
+        return [df[codes == i] for i in range(shards)]
+
+    @staticmethod
+    def summarize_cohort(df: pd.DataFrame, workers: int = 0) -> tuple:
+        """Latest snapshot and score slopes per patient, optionally sharded over the compute pool"""
+        if workers and workers > 1:
+            results = get_compute_pool().map(CohortAnalytics._summarize_shard,
+                                             CohortAnalytics._shard(df, workers))
+        else:
+            results = [CohortAnalytics._summarize_shard(df)]
+
+        latest = pd.concat([r[0] for r in results], ignore_index=True)
+        slopes = pd.concat([r[1] for r in results], ignore_index=True)
+        return latest, slopes
+
+    @staticmethod
+    def score_distribution(latest: pd.DataFrame, bin_width: int = 5) -> pd.DataFrame:
+        """Histogram of latest health scores across patients"""
+        edges = np.arange(0, 100 + bin_width, bin_width)
+        counts, _ = np.histogram(latest['health_score'], bins=np.append(edges, 100 + bin_width))
+        return pd.DataFrame({'score': edges, 'patients': counts[:len(edges)]})
+
+    @staticmethod
+    def risk_breakdown(latest: pd.DataFrame) -> pd.Series:
+        """Patient counts per risk level"""
+        levels = CohortAnalytics.get_risk_levels(latest['health_score'])
+        counts = pd.Series(levels).value_counts()
+        return counts.reindex(["Low Risk", "Moderate Risk", "High Risk"], fill_value=0)
+
+    @staticmethod
+    def out_of_range_summary(latest: pd.DataFrame) -> pd.DataFrame:
+        """Percentage of patients whose latest reading is low/high per metric"""
+        rows = []
+        n = max(len(latest), 1)
+        for metric in HealthDataHandler.METRIC_RANGES:
+            if metric not in latest:
+                continue
+            codes = CohortAnalytics.get_metric_status_codes(metric, latest[metric])
+            low = np.count_nonzero(codes < 0) / n * 100
+            high = np.count_nonzero(codes > 0) / n * 100
+            rows.append({'metric': metric, 'pct_low': low, 'pct_high': high, 'pct_out_of_range': low + high})
+        return pd.DataFrame(rows)
+
+    @staticmethod
+    def top_deteriorating(latest: pd.DataFrame, slopes: pd.DataFrame, n: int = 10) -> pd.DataFrame:
+        """Patients whose health score is falling fastest"""
+        merged = latest.merge(slopes, on='patient_id')
+        worst = merged.nsmallest(n, 'score_slope')
+        columns = ['patient_id', 'health_score', 'score_slope'] + \
+            [m for m in HealthDataHandler.METRIC_RANGES if m in worst]
+        return worst[columns].reset_index(drop=True)
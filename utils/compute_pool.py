@@ -0,0 +1,187 @@
+import atexit
+import multiprocessing
+import threading
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from config import config
+
+
+class SharedArray:
+    """NumPy array copied once into shared memory for worker processes
+
+    Workers attach by name instead of unpickling a copy of the data.
+    """
+
+    def __init__(self, array: np.ndarray):
+        array = np.ascontiguousarray(array)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=self.shm.buf)
+        view[...] = array
+        self.handle = (self.shm.name, array.shape, array.dtype.str)
+
+    def release(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach_array(handle: tuple):
+    """Open a SharedArray handle inside a worker; returns (array view, shm)"""
+    name, shape, dtype = handle
+    shm = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf), shm
+
+
+def _run_task(fn, handles: list, kwargs: dict):
+    """Worker entry point: attach inputs, run fn, report wall-clock timing"""
+    started = time.time()
+    attached = [attach_array(h) for h in handles]
+    try:
+        result = fn(*[a for a, _ in attached], **kwargs)
+    finally:
+        for _, shm in attached:
+            shm.close()
+    return result, started, time.time()
+
+
+# ---- CPU-bound tasks (module level so workers can import them) ---------
+
+def correlation_task(values: np.ndarray, columns: list) -> pd.DataFrame:
+    """Pairwise Pearson correlation, same semantics as DataFrame.corr()"""
+    return pd.DataFrame(values, columns=columns).corr()
+
+
+def histogram_task(values: np.ndarray, bins: int = 20) -> tuple:
+    counts, edges = np.histogram(values[~np.isnan(values)], bins=bins)
+    return counts, edges
+
+
+class ComputePool:
+    """Managed process pool for CPU-bound analytics and figure building
+
+    Array arguments travel through shared memory. At most max_pending tasks
+    are in flight; when the pool is saturated for longer than submit_timeout
+    the task runs inline instead of queueing without bound. Small inputs
+    always run inline because dispatch would cost more than it saves.
+    """
+
+    def __init__(self, workers: int, max_pending: int = None, min_elements: int = 100_000,
+                 submit_timeout: float = 0.05):
+        self.workers = workers
+        self.min_elements = min_elements
+        self.submit_timeout = submit_timeout
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_pending or max(workers * 2, 1))
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn avoids forking a multi-threaded Streamlit server
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _record(self, name: str, mode: str, wait: float, run: float):
+        with self._lock:
+            s = self._stats.setdefault(name, {'tasks': 0, 'pool': 0, 'inline': 0, 'rejected': 0,
+                                              'wait_seconds': 0.0, 'run_seconds': 0.0, 'max_run_seconds': 0.0})
+            s['tasks'] += 1
+            s[mode] += 1
+            s['wait_seconds'] += wait
+            s['run_seconds'] += run
+            s['max_run_seconds'] = max(s['max_run_seconds'], run)
+
+    def run(self, fn, *arrays, **kwargs):
+        """Run fn(*arrays, **kwargs) in the pool when worthwhile, else inline"""
+        name = fn.__name__
+        size = sum(np.asarray(a).size for a in arrays)
+
+        if self.workers <= 0 or size < self.min_elements:
+            return self._run_inline(fn, name, 'inline', arrays, kwargs)
+        if not self._slots.acquire(timeout=self.submit_timeout):
+            return self._run_inline(fn, name, 'rejected', arrays, kwargs)
+
+        shared = []
+        try:
+            shared = [SharedArray(np.asarray(a)) for a in arrays]
+            submitted = time.time()
+            future = self._get_executor().submit(_run_task, fn, [s.handle for s in shared], kwargs)
+            result, started, finished = future.result()
+            self._record(name, 'pool', started - submitted, finished - started)
+            return result
+        finally:
+            for s in shared:
+                s.release()
+            self._slots.release()
+
+    def map(self, fn, items: list) -> list:
+        """Run fn over picklable items in parallel (e.g. per-patient shards)
+
+        Shards share the max_pending slots with run(), so at most that many
+        pickled payloads are queued at once; the rest wait for a slot.
+        """
+        if self.workers <= 0 or len(items) < 2:
+            return [self._run_inline(fn, fn.__name__, 'inline', (item,), {}) for item in items]
+        started = time.time()
+        executor = self._get_executor()
+        futures = []
+        wait = 0.0
+        try:
+            for item in items:
+                waited = time.time()
+                self._slots.acquire()
+                wait += time.time() - waited
+                try:
+                    future = executor.submit(fn, item)
+                except BaseException:
+                    self._slots.release()
+                    raise
+                future.add_done_callback(lambda _: self._slots.release())
+                futures.append(future)
+            results = [f.result() for f in futures]
+        except BaseException:
+            for f in futures:
+                f.cancel()
+            raise
+        self._record(fn.__name__, 'pool', wait, time.time() - started - wait)
+        return results
+
+    def _run_inline(self, fn, name: str, mode: str, arrays, kwargs):
+        started = time.time()
+        result = fn(*arrays, **kwargs)
+        self._record(name, mode, 0.0, time.time() - started)
+        return result
+
+    def stats(self) -> dict:
+        """Per-task counts and timing"""
+        with self._lock:
+            return {name: dict(s) for name, s in self._stats.items()}
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_compute_pool() -> ComputePool:
+    """Process-wide compute pool sized by Config.COMPUTE_WORKERS"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ComputePool(
+                config.COMPUTE_WORKERS,
+                max_pending=config.COMPUTE_MAX_PENDING or None,
+                min_elements=config.COMPUTE_MIN_ELEMENTS
+            )
+            atexit.register(_pool.shutdown)
+        return _pool
@@ -0,0 +1,239 @@
+import streamlit as st
+import pandas as pd
+import sys
+import threading
+from collections import OrderedDict
+from config import config
+from utils.compute_pool import get_compute_pool
+from utils.data_handler import HealthDataHandler
+from utils.rollups import RollupStore
+from utils.vitals_buffer import get_vitals_buffer
+
+
+class PatientDataCache:
+    """Process-wide, size-bounded LRU cache of patient datasets
+
+    Entries are keyed by (patient_id, version, kind) and shared by every
+    session, so cached values must be treated as read-only. Invalidating a
+    patient bumps its version, which makes all of its entries unreachable.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def sizeof(value) -> int:
+        """Approximate resident size of a cached value in bytes"""
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(deep=True).sum())
+        if hasattr(value, 'memory_usage'):
+            return int(value.memory_usage())
+        return sys.getsizeof(value)
+
+    def version(self, patient_id: str) -> int:
+        """Current data version of a patient"""
+        with self._lock:
+            return self._versions.get(patient_id, 0)
+
+    def get(self, patient_id: str, loader, kind: str = 'vitals', version: int = None):
+        """Return the cached value, calling loader() once on a miss
+
+        version overrides the local version, e.g. with the one reported by
+        the shared service in multi-worker mode.
+        """
+        with self._lock:
+            if version is not None and version > self._versions.get(patient_id, 0):
+                self._versions[patient_id] = version
+            key = (patient_id, self._versions.get(patient_id, 0), kind)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        # Concurrent sessions asking for the same entry wait for one load
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    return self._entries[key][0]
+            value = loader()
+            size = self.sizeof(value)
+            with self._lock:
+                self._loading.pop(key, None)
+                # Drop the result if the patient was invalidated while loading
+                if key[1] == self._versions.get(patient_id, 0) and size <= self.max_bytes:
+                    self._entries[key] = (value, size)
+                    self.bytes_used += size
+                    self._evict()
+            return value
+
+    def _evict(self):
+        while self.bytes_used > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.bytes_used -= size
+            self.evictions += 1
+
+    def invalidate(self, patient_id: str):
+        """Bump a patient's version after new data is ingested"""
+        with self._lock:
+            self._versions[patient_id] = self._versions.get(patient_id, 0) + 1
+            for key in [k for k in self._entries if k[0] == patient_id]:
+                self.bytes_used -= self._entries.pop(key)[1]
+
+    def advance(self, patient_id: str, update):
+        """Bump a patient's version, carrying entries forward instead of dropping them
+
+        update(entries) gets the patient's current entries as {kind: value}
+        and returns the values to keep for the new version. It runs outside
+        the lock and must not modify the values it is given. If the patient
+        is invalidated meanwhile, nothing is carried over.
+        """
+        with self._lock:
+            version = self._versions.get(patient_id, 0)
+            entries = {k[2]: value for k, (value, _) in self._entries.items() if k[:2] == (patient_id, version)}
+        carried = update(entries) if entries else {}
+        with self._lock:
+            if self._versions.get(patient_id, 0) != version:
+                carried = {}
+            version = self._versions[patient_id] = self._versions.get(patient_id, 0) + 1
+            for key in [k for k in self._entries if k[0] == patient_id]:
+                self.bytes_used -= self._entries.pop(key)[1]
+            for kind, value in carried.items():
+                size = self.sizeof(value)
+                if size <= self.max_bytes:
+                    self._entries[(patient_id, version, kind)] = (value, size)
+                    self.bytes_used += size
+            self._evict()
+
+    def stats(self) -> dict:
+        """Memory accounting and hit/miss counters"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes_used': self.bytes_used,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'by_entry': [
+                    {'patient_id': k[0], 'version': k[1], 'kind': k[2], 'bytes': size}
+                    for k, (_, size) in self._entries.items()
+                ]
+            }
+
+
+@st.cache_resource
+def get_data_cache():
+    return PatientDataCache(config.DATA_CACHE_MAX_MB * 1024 * 1024)
+
+
+def merge_readings(df: pd.DataFrame, readings: pd.DataFrame) -> pd.DataFrame:
+    """Health dataset with wearable readings added as rows, in time order
+
+    A reading only has the metrics its device measures, so every other
+    metric carries its last known value forward.
+    """
+    if readings.empty:
+        return df
+    readings = readings.rename(columns={'timestamp': 'date'})
+    merged = pd.concat([df, readings], ignore_index=True).sort_values('date', kind='stable')
+    return merged.ffill().reset_index(drop=True)
+
+
+def load_health_data(patient_id: str, vitals) -> pd.DataFrame:
+    """Sample history merged with the patient's flushed wearable readings"""
+    df = HealthDataHandler.generate_sample_health_data(config.SAMPLE_HISTORY_DAYS)
+    return merge_readings(df, vitals.readings(patient_id, buffered=False))
+
+
+def apply_flushed_readings(cache: PatientDataCache, frames: dict):
+    """VitalsBuffer on_flush hook: fold newly flushed readings into each patient's cached data
+
+    When the readings come after the cached dataset's last row, they are
+    appended to it and merged into its rollups, so neither is rebuilt from
+    a full rescan. Otherwise the patient's entries are dropped and reload.
+    """
+    for patient_id, readings in frames.items():
+        def update(entries, patient_id=patient_id, readings=readings):
+            df = entries.get('vitals')
+            if df is None or readings.empty or readings['timestamp'].iloc[0] < df['date'].iloc[-1]:
+                return {}
+            rows = merge_readings(df.tail(1), readings).iloc[1:]
+            carried = {'vitals': pd.concat([df, rows], ignore_index=True)}
+            if 'rollups' in entries:
+                rollups = entries['rollups'].copy()
+                rollups.ingest(rows, patient_id)
+                carried['rollups'] = rollups
+            return carried
+        cache.advance(patient_id, update)
+
+
+def get_patient_health_data(patient_id: str = None) -> pd.DataFrame:
+    """Shared read-only health dataset for a patient"""
+    patient_id = patient_id or config.DEFAULT_PATIENT_ID
+
+    if config.SERVICE_URL:
+        # The service owns the data; keep a local copy per service-side version
+        from utils.service_client import fetch_health_data, get_service_client
+        client = get_service_client()
+        version = client.call('/v1/data/version', {'patient_id': patient_id})
+        return get_data_cache().get(
+            patient_id,
+            lambda: fetch_health_data(client, patient_id)[1],
+            version=version
+        )
+
+    return get_data_cache().get(patient_id, lambda: load_health_data(patient_id, get_vitals_buffer()))
+
+
+def invalidate_patient_data(patient_id: str = None):
+    """Drop cached data for a patient after new data is ingested"""
+    patient_id = patient_id or config.DEFAULT_PATIENT_ID
+    if config.SERVICE_URL:
+        from utils.service_client import get_service_client
+        get_service_client().call('/v1/data/invalidate', {'patient_id': patient_id})
+    get_data_cache().invalidate(patient_id)
+
+
+def get_patient_rollups(patient_id: str = None) -> RollupStore:
+    """Shared rollups built from the cached dataset of the same version"""
+    patient_id = patient_id or config.DEFAULT_PATIENT_ID
+
+    def build():
+        rollups = RollupStore()
+        rollups.ingest(get_patient_health_data(patient_id), patient_id)
+        return rollups
+
+    return get_data_cache().get(patient_id, build, kind='rollups')
+
+
+def render_cache_debug():
+    """Show cache memory accounting and compute pool timing in the sidebar when DEBUG_MODE is on"""
+    if not config.DEBUG_MODE:
+        return
+    stats = get_data_cache().stats()
+    with st.expander("🐞 Data Cache"):
+        st.metric("Memory Used", f"{stats['bytes_used'] / 1024 / 1024:.1f} / "
+                                 f"{stats['max_bytes'] / 1024 / 1024:.0f} MB")
+        st.metric("Hit Rate", f"{stats['hit_rate'] * 100:.0f}%")
+        st.caption(f"{stats['entries']} entries • {stats['hits']} hits • "
+                   f"{stats['misses']} misses • {stats['evictions']} evictions")
+        if stats['by_entry']:
+            st.dataframe(pd.DataFrame(stats['by_entry']), use_container_width=True, hide_index=True)
+
+    pool_stats = get_compute_pool().stats()
+    if pool_stats:
+        with st.expander("🐞 Compute Pool"):
+            st.caption(f"{get_compute_pool().workers} worker processes")
+            st.dataframe(pd.DataFrame.from_dict(pool_stats, orient='index'), use_container_width=True)
@@ -2,10 +2,36 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import json
+import os
 
 class HealthDataHandler:
     """Handle patient health data and metrics"""
     
+    # Normal reference ranges used by get_metric_status and cohort analytics
+    METRIC_RANGES = {
+        'heart_rate': {'low': 60, 'high': 100, 'unit': 'bpm'},
+        'blood_pressure_systolic': {'low': 90, 'high': 120, 'unit': 'mmHg'},
+        'blood_pressure_diastolic': {'low': 60, 'high': 80, 'unit': 'mmHg'},
+        'blood_glucose': {'low': 70, 'high': 100, 'unit': 'mg/dL'},
+        'temperature': {'low': 97.0, 'high': 99.5, 'unit': '°F'},
+        'oxygen_saturation': {'low': 95, 'high': 100, 'unit': '%'},
+    }
+    
+    # Columns of one wearable/device reading (utils/vitals_buffer.py)
+    READING_METRICS = list(METRIC_RANGES) + ['weight']
+    
+    # Health score: points lost when a metric is outside its normal range,
+    # and the value assumed when it is missing. Used by calculate_health_score
+    # and the vectorized cohort scores. Systolic pressure is only penalized
+    # above 130 (stage 1 hypertension), not at the 120 "normal" bound, and
+    # oxygen saturation only when low.
+    SCORE_RULES = {
+        'heart_rate': dict(METRIC_RANGES['heart_rate'], penalty=10, default=75),
+        'blood_pressure_systolic': dict(METRIC_RANGES['blood_pressure_systolic'], high=130, penalty=15, default=120),
+        'blood_glucose': dict(METRIC_RANGES['blood_glucose'], penalty=10, default=95),
+        'oxygen_saturation': dict(METRIC_RANGES['oxygen_saturation'], high=float('inf'), penalty=20, default=98),
+    }
+    
     @staticmethod
     def generate_sample_health_data(days: int = 30):
         """Generate sample health metrics for demonstration"""
@@ -28,40 +54,17 @@ class HealthDataHandler:
     def calculate_health_score(metrics: dict) -> int:
         """Calculate overall health score from metrics"""
         score = 100
-        
-        # Heart rate check (60-100 normal)
-        hr = metrics.get('heart_rate', 75)
-        if hr < 60 or hr > 100:
-            score -= 10
-        
-        # Blood pressure check
-        bp_sys = metrics.get('blood_pressure_systolic', 120)
-        if bp_sys > 130 or bp_sys < 90:
-            score -= 15
-        
-        # Blood glucose check (70-100 normal)
-        glucose = metrics.get('blood_glucose', 95)
-        if glucose > 100 or glucose < 70:
-            score -= 10
-        
-        # Oxygen saturation check (>95 normal)
-        o2 = metrics.get('oxygen_saturation', 98)
-        if o2 < 95:
-            score -= 20
+        for metric, rule in HealthDataHandler.SCORE_RULES.items():
+            value = metrics.get(metric, rule['default'])
+            if value < rule['low'] or value > rule['high']:
+                score -= rule['penalty']
         
         return max(score, 0)
     
     @staticmethod
     def get_metric_status(metric_name: str, value: float) -> tuple:
         """Get status and color for a metric"""
-        ranges = {
-            'heart_rate': {'low': 60, 'high': 100, 'unit': 'bpm'},
-            'blood_pressure_systolic': {'low': 90, 'high': 120, 'unit': 'mmHg'},
-            'blood_pressure_diastolic': {'low': 60, 'high': 80, 'unit': 'mmHg'},
-            'blood_glucose': {'low': 70, 'high': 100, 'unit': 'mg/dL'},
-            'temperature': {'low': 97.0, 'high': 99.5, 'unit': '°F'},
-            'oxygen_saturation': {'low': 95, 'high': 100, 'unit': '%'},
-        }
+        ranges = HealthDataHandler.METRIC_RANGES
         
         if metric_name not in ranges:
             return "Unknown", "gray", ranges.get(metric_name, {}).get('unit', '')
@@ -78,10 +81,17 @@ class HealthDataHandler:
     
     @staticmethod
     def save_patient_data(patient_data: dict, filename: str = "data/patient_profile.json"):
-        """Save patient data to JSON file"""
+        """Save patient data to JSON file
+
+        Writes a temporary file and renames it over the old one, so a crash
+        mid-write never leaves a truncated profile. For more than one patient
+        use utils.profile_store.
+        """
         try:
-            with open(filename, 'w') as f:
+            tmp = f"{filename}.{os.getpid()}.tmp"
+            with open(tmp, 'w') as f:
                 json.dump(patient_data, f, indent=4)
+            os.replace(tmp, filename)
             return True
         except Exception as e:
             print(f"Error saving data: {e}")
@@ -0,0 +1,215 @@
+import streamlit as st
+import hashlib
+import json
+import os
+import threading
+import uuid
+import weakref
+import pandas as pd
+from config import config
+from utils.reports import data_fingerprint
+
+# format: (file extension, MIME type)
+EXPORT_FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'ndjson': ('ndjson', 'application/x-ndjson'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+
+class DataExporter:
+    """Chunked export of patient datasets to CSV, NDJSON or Parquet files
+
+    Rows are encoded and written one chunk at a time, so memory stays bounded
+    by chunk_rows whatever the size of the export. Finished files are kept in
+    `directory` and keyed by patient, a content fingerprint of the data and
+    the export options, so a repeated export of unchanged data is a file
+    lookup and changed data (even under the same in-memory cache version,
+    or after a restart) never matches an old file.
+    """
+
+    def __init__(self, directory: str, chunk_rows: int = 50_000, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def available_formats() -> list:
+        """Formats whose writer dependencies are installed"""
+        formats = ['csv', 'ndjson']
+        try:
+            import pyarrow.parquet  # noqa: F401
+            formats.append('parquet')
+        except ImportError:
+            pass
+        return formats
+
+    @staticmethod
+    def row_bounds(df: pd.DataFrame, start=None, end=None) -> tuple:
+        """Row range [lo, hi) with start <= date <= end (whole days), without a full mask"""
+        dates = df['date']
+        lo = 0 if start is None else int(dates.searchsorted(pd.Timestamp(start).floor('D'), side='left'))
+        hi = len(df) if end is None else int(
+            dates.searchsorted(pd.Timestamp(end).floor('D') + pd.Timedelta(days=1), side='left'))
+        return lo, max(hi, lo)
+
+    @staticmethod
+    def iter_chunks(df: pd.DataFrame, start=None, end=None, columns: list = None, chunk_rows: int = 50_000):
+        """Yield bounded slices of the selected rows and columns"""
+        if not df['date'].is_monotonic_increasing:
+            df = df.sort_values('date', kind='stable')
+        lo, hi = DataExporter.row_bounds(df, start, end)
+        columns = columns or list(df.columns)
+        for offset in range(lo, hi, chunk_rows):
+            yield df.iloc[offset:min(offset + chunk_rows, hi)][columns]
+
+    def path_for(self, patient_id: str, fingerprint: str, fmt: str, start=None, end=None,
+                 columns: list = None) -> str:
+        """Cache path for an export; changes whenever the data or options do"""
+        options = json.dumps([str(start), str(end), columns], default=str)
+        digest = hashlib.sha256(options.encode("utf-8")).hexdigest()[:12]
+        ext = EXPORT_FORMATS[fmt][0]
+        safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in patient_id)
+        return os.path.join(self.directory, f"{safe_id}_{fingerprint[:16]}_{digest}.{ext}")
+
+    def export(self, patient_id: str, fingerprint: str, df: pd.DataFrame, fmt: str,
+               start=None, end=None, columns: list = None) -> str:
+        """Path of the finished export file, writing it only on a cache miss"""
+        if fmt not in self.available_formats():
+            raise ValueError(f"Export format not available: {fmt}")
+        path = self.path_for(patient_id, fingerprint, fmt, start, end, columns)
+        if os.path.exists(path):
+            with self._lock:
+                self.hits += 1
+            return path
+
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        chunks = self.iter_chunks(df, start, end, columns, self.chunk_rows)
+        try:
+            getattr(self, f"_write_{fmt}")(chunks, tmp, columns or list(df.columns), df)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        with self._lock:
+            self.misses += 1
+        self.prune()
+        return path
+
+    @staticmethod
+    def _write_csv(chunks, path: str, columns: list, df: pd.DataFrame):
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            header = True
+            for chunk in chunks:
+                chunk.to_csv(f, index=False, header=header)
+                header = False
+            if header:
+                f.write(",".join(columns) + "\n")
+
+    @staticmethod
+    def _write_ndjson(chunks, path: str, columns: list, df: pd.DataFrame):
+        with open(path, 'w', encoding='utf-8') as f:
+            for chunk in chunks:
+                lines = chunk.to_json(orient='records', lines=True, date_format='iso')
+                # pandas >= 2.2 already ends the output with a newline
+                f.write(lines if lines.endswith("\n") else lines + "\n")
+
+    @staticmethod
+    def _write_parquet(chunks, path: str, columns: list, df: pd.DataFrame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.Schema.from_pandas(df[columns].iloc[:0], preserve_index=False)
+        with pq.ParquetWriter(path, schema) as writer:
+            for chunk in chunks:
+                # One row group per chunk
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+    def prune(self):
+        """Delete the oldest exports beyond max_bytes"""
+        with self._lock:
+            try:
+                files = [os.path.join(self.directory, f) for f in os.listdir(self.directory)
+                         if not f.endswith('.tmp')]
+            except FileNotFoundError:
+                return
+            files.sort(key=os.path.getmtime, reverse=True)
+            total = 0
+            for path in files:
+                total += os.path.getsize(path)
+                if total > self.max_bytes:
+                    os.remove(path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """data_fingerprint of a shared read-only frame, computed once per frame object"""
+    with _fingerprints_lock:
+        entry = _fingerprints.get(id(df))
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+    fingerprint = data_fingerprint(df)
+    with _fingerprints_lock:
+        key = id(df)
+        _fingerprints[key] = (weakref.ref(df, lambda _: _fingerprints.pop(key, None)), fingerprint)
+    return fingerprint
+
+
+@st.cache_resource
+def get_exporter():
+    return DataExporter(config.EXPORT_DIR, config.EXPORT_CHUNK_ROWS, config.EXPORT_CACHE_MAX_MB * 1024 * 1024)
+
+
+def render_export_panel(patient_id: str, df: pd.DataFrame):
+    """Export options plus a download for the matching cached file
+
+    The file is only read into the download button after a Prepare click
+    for the current options, and only until it has been downloaded, so
+    reruns of the page never load a large export.
+    """
+    exporter = get_exporter()
+    fingerprint = frame_fingerprint(df)
+    with st.expander("📥 Export Data"):
+        fmt = st.selectbox("Format", exporter.available_formats(), format_func=str.upper, key="export_format")
+        columns = st.multiselect("Columns", list(df.columns), default=list(df.columns), key="export_columns")
+        first, last = df['date'].min().date(), df['date'].max().date()
+        date_range = st.date_input("Date Range", value=(first, last), min_value=first, max_value=last,
+                                   key="export_range")
+        start, end = (date_range[0], date_range[-1]) if date_range else (first, last)
+        columns = [c for c in df.columns if c in columns]  # keep dataset order
+
+        if not columns:
+            st.caption("Select at least one column.")
+            return
+
+        path = exporter.path_for(patient_id, fingerprint, fmt, start, end, columns)
+        if st.session_state.get('export_download'):
+            # The file was just downloaded
+            st.session_state.pop('export_ready', None)
+        if st.session_state.get('export_ready') != path:
+            if not st.button("Prepare Export", use_container_width=True, key="export_prepare"):
+                return
+            with st.spinner("Writing export..."):
+                path = exporter.export(patient_id, fingerprint, df, fmt, start, end, columns)
+            st.session_state.export_ready = path
+
+        with open(path, 'rb') as f:
+            st.download_button(
+                label=f"Download {fmt.upper()} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)",
+                data=f,
+                file_name=f"health_data_{start}_{end}.{EXPORT_FORMATS[fmt][0]}",
+                mime=EXPORT_FORMATS[fmt][1],
+                use_container_width=True,
+                key="export_download"
+            )
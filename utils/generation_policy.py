@@ -0,0 +1,203 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import defaultdict, deque
+
+SECTION_PATTERN = re.compile(r"✅\s*(.+)")
+HEADING_PATTERN = re.compile(r"^\s*(?:#+\s*(.{2,80})|(?:\*\*|__|✅\s*)(.{2,80})|([^-*•\s].{1,78}):\s*)$")
+STOPWORDS = {"and", "the", "for", "with", "when", "what", "your", "from", "that", "this", "suggested",
+             "general", "applicable", "health", "medical", "level", "care", "advice", "suggestions",
+             "recommendations", "information", "patient", "plan"}
+
+
+def required_sections(prompt: str) -> list:
+    """Section titles a prompt asks for (its ✅ lines, without any ": description")"""
+    return [s.split(":")[0].strip() for s in SECTION_PATTERN.findall(prompt)]
+
+
+def _keywords(title: str) -> set:
+    words = re.findall(r"[a-z]{4,}", re.sub(r"\(.*?\)", "", title.lower()))
+    return {w for w in words if w not in STOPWORDS} or set(words)
+
+
+def _heading(line: str):
+    """(markup, words) for a heading line, or None
+
+    markup is the heading's style ("##", "**", "✅" or ":"), so a sub-heading
+    in another style is not mistaken for the next section.
+    """
+    match = HEADING_PATTERN.match(line)
+    if not match:
+        return None
+    stripped = line.strip()
+    if match.group(1) is not None:
+        markup = stripped[:len(stripped) - len(stripped.lstrip("#"))]
+    elif match.group(2) is not None:
+        markup = "✅" if stripped.startswith("✅") else stripped[:2]
+    else:
+        markup = ":"
+    words = set(re.findall(r"[a-z]{4,}", "".join(g for g in match.groups() if g).lower()))
+    return markup, words
+
+
+def section_end(text: str, sections: list):
+    """Offset where the reply moves past its last requested section, or None
+
+    A heading is a short line marked up as one (#, **, ✅) or ending in a
+    colon that shares a keyword with the section title; sections must appear
+    in the order asked, so a stray keyword cannot end a reply. The last
+    section stays open until it has a body (a bullet or a line of prose) and
+    is followed by a complete heading in the same style as the section
+    headings that matches none of the requested sections: the start of
+    something that was not asked for, such as a sign-off or a disclaimer.
+    Without one, the section runs to the end of the stream.
+    """
+    if not sections:
+        return None
+    remaining = [_keywords(s) for s in sections]
+    requested = set().union(*remaining)
+    lines = text.split("\n")
+    last = style = None
+    for i, line in enumerate(lines):
+        heading = _heading(line)
+        if heading and remaining[0] & heading[1]:
+            remaining.pop(0)
+            last, style = i, heading[0]
+            if not remaining:
+                break
+    if remaining:
+        return None
+
+    offset = sum(len(line) + 1 for line in lines[:last + 1])
+    has_body = False
+    for line in lines[last + 1:-1]:  # the final line may still be streaming
+        heading = _heading(line)
+        if heading and has_body and heading[0] == style and not heading[1] & requested:
+            return offset
+        if line.strip() and not heading:
+            has_body = True
+        offset += len(line) + 1
+    return None
+
+
+def sections_complete(text: str, sections: list) -> bool:
+    """Whether every section has a heading and the last one has finished (see section_end)"""
+    return section_end(text, sections) is not None
+
+
+class GenerationPolicy:
+    """Chooses max_tokens from the output lengths seen per request type
+
+    Observations are kept per (request type, input size bucket), where the
+    bucket is the power of two of the prompt's token count. Once a bucket
+    has min_samples outputs, the limit is its `quantile` length times
+    `headroom`, never above the caller's default. An output that reached a
+    reduced limit was cut short, so it is recorded at the default length to
+    push the quantile back up.
+
+    Stats per request type report the tokens removed from the limit and by
+    early stopping, and mean latency of requests at the default limit and
+    with an adaptive one.
+    """
+
+    def __init__(self, window: int = 500, quantile: float = 0.95, headroom: float = 1.15,
+                 min_samples: int = 20, floor: int = 64, path: str = None, save_every: int = 25):
+        self.window = window
+        self.quantile = quantile
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.floor = floor
+        self.path = path
+        self.save_every = save_every
+        self._lengths = defaultdict(lambda: deque(maxlen=self.window))
+        self._stats = defaultdict(lambda: {
+            'requests': 0, 'adaptive': 0, 'truncated': 0, 'early_stops': 0, 'prompt_tokens': 0, 'output_tokens': 0,
+            'limit_tokens_saved': 0, 'early_stop_tokens_saved': 0,
+            'default_seconds': 0.0, 'default_requests': 0, 'adaptive_seconds': 0.0,
+        })
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        if path:
+            self.load(path)
+
+    @staticmethod
+    def bucket(prompt_tokens: int) -> int:
+        return max(int(prompt_tokens), 1).bit_length()
+
+    def _key(self, method: str, prompt_tokens: int) -> str:
+        return f"{method}/{self.bucket(prompt_tokens)}"
+
+    def limit(self, method: str, prompt_tokens: int, default: int) -> int:
+        """max_tokens for a request: `default` until the bucket has enough history"""
+        with self._lock:
+            lengths = self._lengths.get(self._key(method, prompt_tokens))
+            if not lengths or len(lengths) < self.min_samples:
+                return default
+            ordered = sorted(lengths)
+        observed = ordered[min(int(math.ceil(self.quantile * len(ordered))) - 1, len(ordered) - 1)]
+        return int(min(default, max(self.floor, math.ceil(observed * self.headroom))))
+
+    def record(self, method: str, prompt_tokens: int, default: int, limit: int, output_tokens: int,
+               seconds: float, stopped_early: bool = False):
+        truncated = not stopped_early and output_tokens >= limit * 0.95
+        with self._lock:
+            self._lengths[self._key(method, prompt_tokens)].append(
+                default if truncated and limit < default else output_tokens)
+            s = self._stats[method]
+            s['requests'] += 1
+            s['prompt_tokens'] += prompt_tokens
+            s['output_tokens'] += output_tokens
+            s['truncated'] += truncated
+            s['limit_tokens_saved'] += default - limit
+            if stopped_early:
+                s['early_stops'] += 1
+                s['early_stop_tokens_saved'] += max(limit - output_tokens, 0)
+            if limit < default:
+                s['adaptive'] += 1
+                s['adaptive_seconds'] += seconds
+            else:
+                s['default_requests'] += 1
+                s['default_seconds'] += seconds
+            self._unsaved += 1
+            save = self.path and self._unsaved >= self.save_every
+        if save:
+            self.save(self.path)
+
+    def stats(self) -> dict:
+        """Per request type counts, tokens saved and mean latency with/without adaptive limits"""
+        with self._lock:
+            stats = {method: dict(s) for method, s in self._stats.items()}
+        for s in stats.values():
+            default_seconds = s.pop('default_seconds')
+            adaptive_seconds = s.pop('adaptive_seconds')
+            default_requests = s.pop('default_requests')
+            s['default_latency'] = default_seconds / default_requests if default_requests else None
+            s['adaptive_latency'] = adaptive_seconds / s['adaptive'] if s['adaptive'] else None
+            s['latency_delta'] = (s['adaptive_latency'] - s['default_latency']
+                                  if s['default_latency'] is not None and s['adaptive_latency'] is not None
+                                  else None)
+            s['tokens_saved'] = s['limit_tokens_saved'] + s['early_stop_tokens_saved']
+        return stats
+
+    def load(self, path: str):
+        """Restore length history written by save(); a missing or broken file starts empty"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        with self._lock:
+            for key, lengths in data.get('lengths', {}).items():
+                self._lengths[key].extend(int(n) for n in lengths)
+
+    def save(self, path: str):
+        with self._lock:
+            data = {'lengths': {key: list(lengths) for key, lengths in self._lengths.items()}}
+            self._unsaved = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
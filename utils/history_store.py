@@ -0,0 +1,448 @@
+import streamlit as st
+import sqlite3
+import json
+import os
+import re
+import queue
+import threading
+import time
+from config import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    symptoms TEXT NOT NULL,
+    analysis TEXT NOT NULL,
+    severity INTEGER,
+    duration TEXT,
+    age INTEGER,
+    gender TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_patient ON predictions(patient_id, id);
+CREATE INDEX IF NOT EXISTS idx_predictions_created ON predictions(created_at);
+CREATE INDEX IF NOT EXISTS idx_predictions_age ON predictions(age);
+
+CREATE TABLE IF NOT EXISTS treatment_plans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    condition TEXT NOT NULL,
+    plan TEXT NOT NULL,
+    severity TEXT,
+    age INTEGER,
+    patient_info TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_plans_patient ON treatment_plans(patient_id, id);
+CREATE INDEX IF NOT EXISTS idx_plans_created ON treatment_plans(created_at);
+CREATE INDEX IF NOT EXISTS idx_plans_condition_nocase ON treatment_plans(condition COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_plans_age ON treatment_plans(age);
+
+CREATE TABLE IF NOT EXISTS chats (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    user_message TEXT NOT NULL,
+    assistant_message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chats_patient ON chats(patient_id, id);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS predictions_fts USING fts5(
+    symptoms, analysis, content='predictions', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS predictions_fts_ai AFTER INSERT ON predictions BEGIN
+    INSERT INTO predictions_fts(rowid, symptoms, analysis) VALUES (new.id, new.symptoms, new.analysis);
+END;
+CREATE TRIGGER IF NOT EXISTS predictions_fts_ad AFTER DELETE ON predictions BEGIN
+    INSERT INTO predictions_fts(predictions_fts, rowid, symptoms, analysis)
+    VALUES ('delete', old.id, old.symptoms, old.analysis);
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS treatment_plans_fts USING fts5(
+    condition, plan, content='treatment_plans', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS treatment_plans_fts_ai AFTER INSERT ON treatment_plans BEGIN
+    INSERT INTO treatment_plans_fts(rowid, condition, plan) VALUES (new.id, new.condition, new.plan);
+END;
+CREATE TRIGGER IF NOT EXISTS treatment_plans_fts_ad AFTER DELETE ON treatment_plans BEGIN
+    INSERT INTO treatment_plans_fts(treatment_plans_fts, rowid, condition, plan)
+    VALUES ('delete', old.id, old.condition, old.plan);
+END;
+"""
+
+INSERTS = {
+    'predictions': "INSERT INTO predictions (patient_id, created_at, symptoms, analysis, severity, "
+                   "duration, age, gender) VALUES (:patient_id, :created_at, :symptoms, :analysis, "
+                   ":severity, :duration, :age, :gender)",
+    'treatment_plans': "INSERT INTO treatment_plans (patient_id, created_at, condition, plan, severity, "
+                       "age, patient_info) VALUES (:patient_id, :created_at, :condition, :plan, "
+                       ":severity, :age, :patient_info)",
+    'chats': "INSERT INTO chats (patient_id, created_at, user_message, assistant_message) "
+             "VALUES (:patient_id, :created_at, :user_message, :assistant_message)",
+}
+
+# Searchable tables: (title column, text column, bm25 column weights)
+SEARCH_COLUMNS = {
+    'predictions': ('symptoms', 'analysis', '2.0, 1.0'),
+    'treatment_plans': ('condition', 'plan', '3.0, 1.0'),
+}
+
+
+class HistoryStore:
+    """Durable SQLite store for predictions, treatment plans and chats
+
+    Writes are queued and committed in batches by a background thread so the
+    Streamlit render path never waits on disk. A batch that fails (e.g. the
+    database is locked) is retried with backoff; after max_retries its rows
+    are written one by one, and only rows that still fail are dropped and
+    counted in stats(). Reads use keyset pagination
+    over (patient_id, id) indexes and include rows still waiting in the queue.
+    """
+
+    def __init__(self, path: str, batch_size: int = 64, flush_interval: float = 0.2,
+                 max_retries: int = 3, retry_delay: float = 0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._stats = {'written': 0, 'retried_batches': 0, 'failed_rows': 0, 'last_error': None}
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._pending = []
+        self._pending_lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        try:
+            conn.executescript(FTS_SCHEMA)
+            self.fts_enabled = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search falls back to LIKE scans
+            self.fts_enabled = False
+        conn.commit()
+
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Per-thread connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---- writes -------------------------------------------------------
+
+    def _enqueue(self, table: str, row: dict):
+        row.setdefault('created_at', time.strftime("%Y-%m-%d %H:%M:%S"))
+        with self._pending_lock:
+            self._pending.append((table, row))
+        self._queue.put((table, row))
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                self._write_batch(conn, batch)
+            finally:
+                with self._pending_lock:
+                    done = {id(item[1]) for item in batch}
+                    self._pending = [p for p in self._pending if id(p[1]) not in done]
+                for _ in batch:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _execute(conn: sqlite3.Connection, table: str, row: dict):
+        if table == '_clear':
+            conn.execute(f"DELETE FROM {row['table']} WHERE patient_id = ?", (row['patient_id'],))
+        else:
+            conn.execute(INSERTS[table], row)
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: list):
+        """Commit a batch, retrying on errors; the rows stay readable as pending meanwhile"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with conn:
+                    for table, row in batch:
+                        self._execute(conn, table, row)
+                with self._pending_lock:
+                    self._stats['written'] += len(batch)
+                return
+            except sqlite3.Error as e:
+                with self._pending_lock:
+                    self._stats['retried_batches'] += attempt < self.max_retries
+                    self._stats['last_error'] = str(e)
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_delay * 2 ** attempt)
+
+        # Still failing: isolate the rows that cannot be written
+        for table, row in batch:
+            try:
+                with conn:
+                    self._execute(conn, table, row)
+                written, failed = 1, 0
+            except sqlite3.Error as e:
+                print(f"Error writing history row to {table}: {e}")
+                written, failed = 0, 1
+            with self._pending_lock:
+                self._stats['written'] += written
+                self._stats['failed_rows'] += failed
+
+    def stats(self) -> dict:
+        """Rows written, batches retried, rows dropped after retries and the last error"""
+        with self._pending_lock:
+            return dict(self._stats, pending=len(self._pending))
+
+    def flush(self):
+        """Block until every queued write is committed"""
+        self._queue.join()
+
+    def add_prediction(self, patient_id: str, symptoms: list, analysis: str,
+                       timestamp: str = None, patient_info: dict = None):
+        info = patient_info or {}
+        self._enqueue('predictions', {
+            'patient_id': patient_id,
+            'created_at': timestamp or time.strftime("%Y-%m-%d %H:%M:%S"),
+            'symptoms': json.dumps(symptoms),
+            'analysis': analysis,
+            'severity': info.get('severity'),
+            'duration': info.get('duration'),
+            'age': info.get('age'),
+            'gender': info.get('gender'),
+        })
+
+    def add_treatment_plan(self, patient_id: str, condition: str, plan: str,
+                           timestamp: str = None, patient_info: dict = None):
+        info = patient_info or {}
+        self._enqueue('treatment_plans', {
+            'patient_id': patient_id,
+            'created_at': timestamp or time.strftime("%Y-%m-%d %H:%M:%S"),
+            'condition': condition,
+            'plan': plan,
+            'severity': info.get('severity'),
+            'age': info.get('age'),
+            'patient_info': json.dumps(info, default=str),
+        })
+
+    def add_chat(self, patient_id: str, user_message: str, assistant_message: str):
+        self._enqueue('chats', {
+            'patient_id': patient_id,
+            'user_message': user_message,
+            'assistant_message': assistant_message,
+        })
+
+    def clear(self, table: str, patient_id: str):
+        """Delete a patient's rows from one history table"""
+        if table not in INSERTS:
+            raise ValueError(f"Unknown history table: {table}")
+        self._enqueue('_clear', {'table': table, 'patient_id': patient_id})
+
+    # ---- reads --------------------------------------------------------
+
+    @staticmethod
+    def _decode(table: str, row: dict) -> dict:
+        record = dict(row)
+        record['timestamp'] = record.get('created_at')
+        if table == 'predictions':
+            record['symptoms'] = json.loads(record['symptoms'])
+        elif table == 'treatment_plans':
+            record['patient_info'] = json.loads(record.get('patient_info') or '{}')
+        elif table == 'chats':
+            record['user'] = record['user_message']
+            record['assistant'] = record['assistant_message']
+        return record
+
+    def _recent(self, table: str, patient_id: str, limit: int, before_id: int = None) -> list:
+        """Newest-first page of rows; O(log n + limit) via the (patient_id, id) index"""
+        records = []
+        if before_id is None:
+            # Rows still in the write queue belong at the top of the first page
+            with self._pending_lock:
+                pending = [dict(r) for t, r in self._pending if t == table and r['patient_id'] == patient_id]
+            records = [self._decode(table, r) for r in reversed(pending)][:limit]
+
+        sql = f"SELECT * FROM {table} WHERE patient_id = ?"
+        params = [patient_id]
+        if before_id is not None:
+            sql += " AND id < ?"
+            params.append(before_id)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit - len(records))
+
+        if params[-1] > 0:
+            rows = self._connect().execute(sql, params).fetchall()
+            records.extend(self._decode(table, r) for r in rows)
+        return records
+
+    def recent_predictions(self, patient_id: str, limit: int = 5, before_id: int = None) -> list:
+        return self._recent('predictions', patient_id, limit, before_id)
+
+    def recent_treatment_plans(self, patient_id: str, limit: int = 5, before_id: int = None) -> list:
+        return self._recent('treatment_plans', patient_id, limit, before_id)
+
+    def recent_chats(self, patient_id: str, limit: int = 10) -> list:
+        """Last chat exchanges in chronological order"""
+        return list(reversed(self._recent('chats', patient_id, limit)))
+
+    @staticmethod
+    def build_fts_query(text: str) -> str:
+        """Turn user search text into a safe FTS5 query
+
+        "quoted text" stays a phrase, word* stays a prefix match and every
+        other word is quoted so punctuation cannot break the query syntax.
+        All parts must match.
+        """
+        parts = []
+        for i, chunk in enumerate(text.split('"')):
+            if i % 2:
+                if chunk.strip():
+                    parts.append('"' + chunk.strip().replace('"', '') + '"')
+                continue
+            for word in re.findall(r"[\w'-]+\*?", chunk):
+                prefix = word.endswith('*')
+                word = word.rstrip('*').replace("'", "''")
+                parts.append(f'"{word}"' + ('*' if prefix else ''))
+        return " ".join(parts)
+
+    def search(self, table: str, query: str, patient_id: str = None, condition: str = None,
+               start_date: str = None, end_date: str = None, age_band: str = None,
+               limit: int = 20) -> list:
+        """Ranked full-text search over stored analyses or plans
+
+        query supports "phrases" and prefix* terms; condition, date range
+        (YYYY-MM-DD, inclusive) and age band (a key of Config.AGE_BANDS) filter
+        the hits. Each result carries a BM25 'score' (lower is better) and a
+        highlighted 'snippet'.
+        """
+        if table not in SEARCH_COLUMNS:
+            raise ValueError(f"Search not supported for: {table}")
+        title_col, text_col, weights = SEARCH_COLUMNS[table]
+        fts_query = self.build_fts_query(query or "")
+
+        # For predictions the condition is matched as a phrase in the analysis text
+        text_condition = None
+        if condition and table == 'predictions':
+            text_condition, condition = condition, None
+            if self.fts_enabled:
+                phrase = self.build_fts_query(f'"{text_condition}"')
+                fts_query = f"{fts_query} {{{text_col}}} : {phrase}".strip()
+
+        params = []
+        if self.fts_enabled and fts_query:
+            sql = (f"SELECT t.*, bm25({table}_fts, {weights}) AS score, "
+                   f"snippet({table}_fts, 1, '**', '**', '…', 16) AS snippet "
+                   f"FROM {table}_fts JOIN {table} t ON t.id = {table}_fts.rowid "
+                   f"WHERE {table}_fts MATCH ?")
+            params.append(fts_query)
+        else:
+            sql = f"SELECT t.*, 0.0 AS score, substr(t.{text_col}, 1, 160) AS snippet FROM {table} t WHERE 1 = 1"
+            for term in re.findall(r"[\w'-]+", query or ""):
+                sql += f" AND (t.{text_col} LIKE ? OR t.{title_col} LIKE ?)"
+                params.extend([f"%{term}%", f"%{term}%"])
+            if text_condition:
+                sql += f" AND t.{text_col} LIKE ?"
+                params.append(f"%{text_condition}%")
+
+        if patient_id:
+            sql += " AND t.patient_id = ?"
+            params.append(patient_id)
+        if condition:
+            sql += " AND t.condition = ? COLLATE NOCASE"
+            params.append(condition)
+        if start_date:
+            sql += " AND t.created_at >= ?"
+            params.append(str(start_date))
+        if end_date:
+            sql += " AND t.created_at <= ?"
+            params.append(f"{end_date} 23:59:59")
+        if age_band:
+            low, high = config.AGE_BANDS[age_band]
+            sql += " AND t.age BETWEEN ? AND ?"
+            params.extend([low, high])
+
+        sql += " ORDER BY score, t.id DESC LIMIT ?" if self.fts_enabled and fts_query else " ORDER BY t.id DESC LIMIT ?"
+        params.append(limit)
+
+        try:
+            rows = self._connect().execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"Error searching history: {e}")
+            return []
+        return [self._decode(table, r) for r in rows]
+
+
+@st.cache_resource
+def get_history_store():
+    if config.SERVICE_URL:
+        from utils.service_client import RemoteHistoryStore, get_service_client
+        return RemoteHistoryStore(get_service_client())
+    return HistoryStore(config.HISTORY_DB_PATH)
+
+
+def render_history_search(table: str, patient_id: str = None):
+    """Search box with filters over stored analyses or plans"""
+    store = get_history_store()
+    is_plans = table == 'treatment_plans'
+    text_key = 'plan' if is_plans else 'analysis'
+
+    with st.expander("🔎 Search " + ("Treatment Plans" if is_plans else "Past Analyses")):
+        query = st.text_input(
+            "Search text",
+            key=f"{table}_search_query",
+            placeholder='e.g., metformin, "High severity", ibupro*',
+            help='Use "quotes" for phrases and * for prefix matches'
+        )
+
+        filter_col1, filter_col2, filter_col3 = st.columns(3)
+        with filter_col1:
+            condition = st.text_input("Condition", key=f"{table}_search_condition")
+        with filter_col2:
+            age_band = st.selectbox("Age Band", ["Any"] + list(config.AGE_BANDS), key=f"{table}_search_age")
+        with filter_col3:
+            date_range = st.date_input("Date Range", value=(), key=f"{table}_search_dates")
+
+        if not query and not condition:
+            return
+
+        start_date = date_range[0] if len(date_range) > 0 else None
+        end_date = date_range[1] if len(date_range) > 1 else start_date
+
+        started = time.perf_counter()
+        results = store.search(
+            table,
+            query,
+            patient_id=patient_id,
+            condition=condition or None,
+            start_date=start_date,
+            end_date=end_date,
+            age_band=None if age_band == "Any" else age_band
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        st.caption(f"{len(results)} result(s) in {elapsed_ms:.1f} ms")
+        for record in results:
+            title = record['condition'] if is_plans else ", ".join(s.title() for s in record['symptoms'])
+            st.markdown(f"**{title}** — {record['timestamp']}")
+            st.markdown(record['snippet'] or record[text_key][:160])
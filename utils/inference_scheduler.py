@@ -0,0 +1,164 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from itertools import count
+
+# Priority classes, lowest value served first
+URGENT = 0
+INTERACTIVE = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {URGENT: "urgent", INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Default class per model method; analyze_symptoms may be raised to URGENT
+METHOD_PRIORITIES = {
+    'analyze_symptoms': INTERACTIVE,
+    'generate_treatment_plan': INTERACTIVE,
+    'chat_response': INTERACTIVE,
+    'analyze_health_trends': BACKGROUND,
+}
+
+
+def classify(method: str, symptoms: list = None, patient_data: dict = None,
+             red_flags: list = (), urgent_severity: int = 8) -> int:
+    """Priority class of a model call from its method and triage inputs"""
+    priority = METHOD_PRIORITIES.get(method, INTERACTIVE)
+    if method == 'analyze_symptoms':
+        flags = {s.lower() for s in red_flags}
+        patient_data = patient_data or {}
+        severity = patient_data.get('severity') or 0
+        if any(s.lower() in flags for s in symptoms or []) or severity >= urgent_severity:
+            return URGENT
+        # Set by the rule-based triage fast path on the Disease Prediction page
+        if patient_data.get('triage_level'):
+            return URGENT
+    return priority
+
+
+class _Job:
+    __slots__ = ('fn', 'priority', 'seq', 'enqueued', 'future')
+
+    def __init__(self, fn, priority: int, seq: int):
+        self.fn = fn
+        self.priority = priority
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.future = Future()
+
+
+class InferenceScheduler:
+    """Priority queue in front of the inference backend
+
+    At most `concurrency` backend calls run at once. Queued work is served by
+    priority class, so an urgent request jumps ahead of every queued
+    interactive or background request; calls already running are not
+    interrupted. A queued job is promoted one class per `aging_seconds` of
+    waiting so background work cannot starve.
+    """
+
+    def __init__(self, concurrency: int = 4, aging_seconds: float = 30.0):
+        self.concurrency = max(concurrency, 1)
+        self.aging_seconds = aging_seconds
+        self._queue = []
+        self._seq = count()
+        self._cond = threading.Condition()
+        self._stats = {p: {'queued': 0, 'running': 0, 'completed': 0, 'failed': 0, 'cancelled': 0,
+                           'wait_seconds': 0.0, 'max_wait_seconds': 0.0, 'run_seconds': 0.0}
+                       for p in PRIORITY_NAMES}
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"inference-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, fn, priority: int = INTERACTIVE) -> Future:
+        """Queue fn() and return a Future with its result"""
+        job = _Job(fn, priority, next(self._seq))
+        with self._cond:
+            self._queue.append(job)
+            self._stats[priority]['queued'] += 1
+            self._cond.notify()
+        return job.future
+
+    def run(self, fn, priority: int = INTERACTIVE):
+        """Queue fn() and wait for its result"""
+        return self.submit(fn, priority).result()
+
+    def stream(self, make_iter, priority: int = INTERACTIVE):
+        """Queue a streaming call and yield its items as the worker produces them"""
+        items = queue.Queue()
+        done = object()
+
+        def run():
+            try:
+                for item in make_iter():
+                    items.put(item)
+            finally:
+                items.put(done)
+
+        future = self.submit(run, priority)
+        while True:
+            item = items.get()
+            if item is done:
+                break
+            yield item
+        future.result()  # re-raise a backend error
+
+    def idle_slots(self) -> int:
+        """Backend slots free right now, after everything already queued"""
+        with self._cond:
+            running = sum(s['running'] for s in self._stats.values())
+            return max(self.concurrency - running - len(self._queue), 0)
+
+    def _effective_priority(self, job: _Job, now: float) -> tuple:
+        boost = int((now - job.enqueued) / self.aging_seconds) if self.aging_seconds else 0
+        return max(job.priority - boost, URGENT), job.seq
+
+    def _next_job(self) -> _Job:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            now = time.monotonic()
+            job = min(self._queue, key=lambda j: self._effective_priority(j, now))
+            self._queue.remove(job)
+            wait = now - job.enqueued
+            s = self._stats[job.priority]
+            s['queued'] -= 1
+            s['running'] += 1
+            s['wait_seconds'] += wait
+            s['max_wait_seconds'] = max(s['max_wait_seconds'], wait)
+            return job
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if not job.future.set_running_or_notify_cancel():
+                with self._cond:
+                    self._stats[job.priority]['running'] -= 1
+                    self._stats[job.priority]['cancelled'] += 1
+                continue
+            started = time.monotonic()
+            try:
+                job.future.set_result(job.fn())
+                outcome = 'completed'
+            except BaseException as e:
+                job.future.set_exception(e)
+                outcome = 'failed'
+            with self._cond:
+                s = self._stats[job.priority]
+                s['running'] -= 1
+                s[outcome] += 1
+                s['run_seconds'] += time.monotonic() - started
+
+    def stats(self) -> dict:
+        """Queue depth and wait time per priority class"""
+        with self._cond:
+            result = {}
+            for p, s in self._stats.items():
+                done = s['completed'] + s['failed'] + s['cancelled'] + s['running']
+                result[PRIORITY_NAMES[p]] = {
+                    **s,
+                    'avg_wait_seconds': s['wait_seconds'] / done if done else 0.0,
+                }
+            return result
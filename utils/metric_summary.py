@@ -0,0 +1,81 @@
+import pandas as pd
+import numpy as np
+from utils.data_handler import HealthDataHandler
+
+QUANTILES = (5, 25, 50, 75, 95)
+
+
+class MetricSummarizer:
+    """Fixed-size statistical summaries of metric series for prompts and display"""
+
+    @staticmethod
+    def summarize(values, metric: str = None, days=None) -> dict:
+        """Summarize one series directly on its NumPy array
+
+        days, if given, are reading times in days and make the slope per day;
+        otherwise the slope is per reading.
+        """
+        x = np.asarray(values, dtype=float)
+        valid = ~np.isnan(x)
+        t = np.arange(x.size, dtype=float) if days is None else np.asarray(days, dtype=float)
+        x, t = x[valid], t[valid]
+        n = int(x.size)
+        if n == 0:
+            return {'n': 0}
+
+        mean = float(x.mean())
+        std = float(x.std(ddof=1)) if n > 1 else 0.0
+        q = np.percentile(x, QUANTILES)
+
+        summary = {
+            'n': n,
+            'mean': mean,
+            'std': std,
+            'cv': std / mean if mean else 0.0,
+            'min': float(x.min()),
+            'max': float(x.max()),
+            'quantiles': {f"p{p}": float(v) for p, v in zip(QUANTILES, q)}
+        }
+
+        if n > 1 and np.ptp(t) > 0:
+            tc = t - t.mean()
+            summary['slope'] = float(np.dot(tc, x - mean) / np.dot(tc, tc))
+            summary['slope_unit'] = 'day' if days is not None else 'reading'
+
+        r = HealthDataHandler.METRIC_RANGES.get(metric)
+        if r:
+            summary['pct_low'] = float(np.count_nonzero(x < r['low']) / n * 100)
+            summary['pct_high'] = float(np.count_nonzero(x > r['high']) / n * 100)
+            summary['unit'] = r['unit']
+
+        return summary
+
+    @staticmethod
+    def summarize_frame(df: pd.DataFrame, metrics: list = None) -> dict:
+        """Summaries for each metric column, with slopes per day from the date column"""
+        metrics = metrics or [m for m in HealthDataHandler.METRIC_RANGES if m in df]
+        days = None
+        if 'date' in df and len(df):
+            ns = pd.to_datetime(df['date']).to_numpy().astype('datetime64[ns]').astype(np.int64)
+            days = (ns - ns[0]) / 86_400e9
+        return {m: MetricSummarizer.summarize(df[m].to_numpy(), m, days) for m in metrics}
+
+    @staticmethod
+    def format_summary(metric: str, summary: dict) -> str:
+        """One bounded-length line describing a summary"""
+        if not summary.get('n'):
+            return f"{metric}: no readings"
+
+        q = summary['quantiles']
+        unit = f" {summary['unit']}" if summary.get('unit') else ""
+        parts = [
+            f"n={summary['n']}",
+            f"mean {summary['mean']:.1f}{unit} (sd {summary['std']:.1f}, cv {summary['cv'] * 100:.1f}%)",
+            f"p5/p25/median/p75/p95 {q['p5']:.1f}/{q['p25']:.1f}/{q['p50']:.1f}/{q['p75']:.1f}/{q['p95']:.1f}",
+            f"range {summary['min']:.1f}–{summary['max']:.1f}"
+        ]
+        if 'slope' in summary:
+            parts.append(f"slope {summary['slope']:+.3f}/{summary['slope_unit']}")
+        if 'pct_low' in summary:
+            parts.append(f"below range {summary['pct_low']:.1f}%, above range {summary['pct_high']:.1f}%")
+        return f"{metric}: " + " | ".join(parts)
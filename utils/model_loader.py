@@ -0,0 +1,224 @@
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import time
+
+# safetensors dtype codes -> torch dtype names
+SAFETENSORS_DTYPES = {
+    'F64': 'float64', 'F32': 'float32', 'F16': 'float16', 'BF16': 'bfloat16',
+    'I64': 'int64', 'I32': 'int32', 'I16': 'int16', 'I8': 'int8', 'U8': 'uint8', 'BOOL': 'bool',
+}
+
+TOKENIZER_FILES = ("tokenizer.json", "tokenizer_config.json", "tokenizer.model", "vocab.json", "merges.txt",
+                   "special_tokens_map.json", "added_tokens.json", "chat_template.jinja")
+
+
+def memory_usage() -> dict:
+    """RSS, PSS and USS (private pages) of this process in MB, from /proc"""
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[1].isdigit():
+                    usage[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    except FileNotFoundError:
+        return {}
+    return {
+        'rss_mb': usage.get('Rss', 0.0),
+        'pss_mb': usage.get('Pss', 0.0),
+        'uss_mb': usage.get('Private_Clean', 0.0) + usage.get('Private_Dirty', 0.0),
+        'shared_mb': usage.get('Shared_Clean', 0.0) + usage.get('Shared_Dirty', 0.0),
+    }
+
+
+def mmap_safetensors(path: str) -> dict:
+    """Tensors of a .safetensors file backed directly by a file mapping
+
+    The mapping is copy-on-write, so pages come from the OS page cache and
+    are shared by every process that maps the same file, until written to
+    (inference never writes weights).
+    """
+    import torch
+
+    with open(path, 'rb') as f:
+        header_size = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(header_size))
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    base = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        if name == '__metadata__':
+            continue
+        dtype = getattr(torch, SAFETENSORS_DTYPES[info['dtype']])
+        start, end = info['data_offsets']
+        count = (end - start) // torch.empty((), dtype=dtype).element_size()
+        if count == 0:
+            tensors[name] = torch.empty(info['shape'], dtype=dtype)
+            continue
+        tensors[name] = torch.frombuffer(mapped, dtype=dtype, count=count, offset=base + start).view(info['shape'])
+    return tensors
+
+
+class ModelLoader:
+    """Loads local models so that worker processes share one copy of the weights
+
+    Weights are memory-mapped from safetensors files instead of read into
+    private memory, and the tokenizer and config are pickled to cache_dir
+    after the first load. A second process therefore maps pages that are
+    already in the page cache and unpickles the tokenizer, so its cold start
+    costs little more than the imports. Timings for each step are kept in
+    `stats`.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.stats = {}
+
+    def _timed(self, step: str, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        self.stats[f"{step}_seconds"] = round(time.perf_counter() - started, 4)
+        return result
+
+    @staticmethod
+    def resolve(model_name: str) -> str:
+        """Local directory with the model files (downloaded into the HF cache once)"""
+        if os.path.isdir(model_name):
+            return model_name
+        from huggingface_hub import snapshot_download
+
+        patterns = ["*.json", "*.safetensors", "*.model", "*.txt", "*.jinja"]
+        try:
+            return snapshot_download(model_name, allow_patterns=patterns, local_files_only=True)
+        except Exception:
+            return snapshot_download(model_name, allow_patterns=patterns)
+
+    def _cached(self, kind: str, path: str, files: tuple, build):
+        """Unpickle a cached object, or build and cache it; keyed by source file mtimes"""
+        import transformers
+
+        stamp = [transformers.__version__, os.path.abspath(path)]
+        for name in files:
+            full = os.path.join(path, name)
+            if os.path.exists(full):
+                stamp.append((name, os.stat(full).st_mtime_ns, os.path.getsize(full)))
+        key = hashlib.sha256(json.dumps(stamp).encode("utf-8")).hexdigest()[:16]
+        cache_path = os.path.join(self.cache_dir, f"{kind}-{key}.pkl")
+
+        try:
+            with open(cache_path, 'rb') as f:
+                self.stats[f"{kind}_cached"] = True
+                return pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            pass
+
+        obj = build()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache_path)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            pass  # not picklable in this transformers version; load from source each time
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.stats[f"{kind}_cached"] = False
+        return obj
+
+    def load_tokenizer(self, path: str):
+        from transformers import AutoTokenizer
+
+        return self._timed('tokenizer', self._cached, 'tokenizer', path, TOKENIZER_FILES,
+                           lambda: AutoTokenizer.from_pretrained(path))
+
+    def load_config(self, path: str):
+        from transformers import AutoConfig
+
+        return self._timed('config', self._cached, 'config', path, ("config.json",),
+                           lambda: AutoConfig.from_pretrained(path))
+
+    @staticmethod
+    def weight_files(path: str) -> list:
+        index = os.path.join(path, "model.safetensors.index.json")
+        if os.path.exists(index):
+            with open(index, encoding='utf-8') as f:
+                shards = sorted(set(json.load(f)['weight_map'].values()))
+            return [os.path.join(path, shard) for shard in shards]
+        single = os.path.join(path, "model.safetensors")
+        return [single] if os.path.exists(single) else []
+
+    @staticmethod
+    def checkpoint_dtypes(files: list) -> set:
+        """Floating-point dtypes stored in safetensors files, read from their headers only"""
+        dtypes = set()
+        for file in files:
+            with open(file, 'rb') as f:
+                header_size = int.from_bytes(f.read(8), 'little')
+                header = json.loads(f.read(header_size))
+            dtypes.update(SAFETENSORS_DTYPES[info['dtype']] for name, info in header.items()
+                          if name != '__metadata__' and info['dtype'] in ('F64', 'F32', 'F16', 'BF16'))
+        return dtypes
+
+    def _build_mmap_model(self, path: str, config):
+        from accelerate import init_empty_weights
+        from transformers import AutoModelForCausalLM
+
+        state_dict = {}
+        for file in self.weight_files(path):
+            state_dict.update(mmap_safetensors(file))
+
+        # Parameters start on the meta device (no allocation, no random init);
+        # buffers such as rotary frequencies are computed on CPU as usual
+        with init_empty_weights(include_buffers=False):
+            model = AutoModelForCausalLM.from_config(config)
+        model.load_state_dict(state_dict, strict=False, assign=True)
+        model.tie_weights()
+        missing = [name for name, p in model.named_parameters() if p.is_meta]
+        if missing:
+            raise ValueError(f"Weights missing from safetensors files: {missing[:5]}")
+        return model
+
+    def load(self, model_name: str, mmap_weights: bool = True, keep_dtype: bool = False) -> tuple:
+        """(tokenizer, model) ready for CPU inference
+
+        Mapped weights keep the dtype they are stored in, while the regular
+        path loads float32. So by default a checkpoint is only mapped when it
+        is stored in float32, and a bf16/fp16 one (Granite ships bf16) is
+        loaded as float32 like before. keep_dtype=True maps it anyway, which
+        shares the pages between processes but runs the model in bf16/fp16:
+        outputs differ slightly and bf16 matmuls are slower on CPUs without
+        native bf16 support. `stats` records the dtype used.
+        """
+        started = time.perf_counter()
+        self._timed('import', __import__, 'transformers')
+        path = self._timed('resolve', self.resolve, model_name)
+        tokenizer = self.load_tokenizer(path)
+
+        files = self.weight_files(path) if mmap_weights else []
+        dtypes = self.checkpoint_dtypes(files) if files else set()
+        if files and not keep_dtype and dtypes - {'float32'}:
+            self.stats['mmap_skipped'] = f"checkpoint is {'/'.join(sorted(dtypes))}, not float32"
+            files = []
+
+        if files:
+            config = self.load_config(path)
+            model = self._timed('weights', self._build_mmap_model, path, config)
+            self.stats['mmap'] = True
+        else:
+            import torch
+            from transformers import AutoModelForCausalLM
+
+            model = self._timed('weights', lambda: AutoModelForCausalLM.from_pretrained(path, torch_dtype=torch.float32))
+            self.stats['mmap'] = False
+        model.eval()
+        self.stats['dtype'] = str(next(model.parameters()).dtype).replace('torch.', '')
+
+        self.stats['load_seconds'] = round(time.perf_counter() - started, 4)
+        self.stats.update(memory_usage())
+        return tokenizer, model
@@ -0,0 +1,119 @@
+import json
+import threading
+from collections import defaultdict, deque
+from utils.inference_scheduler import PRIORITY_NAMES
+
+LARGE = "large"
+SMALL = "small"
+
+
+class ModelRouter:
+    """Sends each model call to the small or the large model by rule
+
+    Rules are checked in order and the first match picks the route. A rule
+    may restrict methods, priority classes and the prompt size in tokens;
+    the fields it leaves out match anything. Requests for the overflow
+    source route go to the overflow target instead while the source already
+    has max_inflight calls queued or running, unless the matching rule sets
+    "overflow": false.
+
+    Per route it counts requests, overflows, tokens, cost and end-to-end
+    latency (queue wait included).
+    """
+
+    def __init__(self, rules: list, default_route: str = LARGE, routes: dict = None, overflow: dict = None,
+                 version: int = 1, latency_window: int = 1000):
+        self.version = version
+        self.default_route = default_route
+        self.routes = routes or {LARGE: {}, SMALL: {}}
+        self.overflow = overflow or {}
+        self.rules = [self._compile(r) for r in rules]
+        for route in [default_route] + [r['route'] for r in self.rules] + \
+                [self.overflow[k] for k in ('from', 'to') if k in self.overflow]:
+            if route not in self.routes:
+                raise ValueError(f"Unknown route: {route}")
+        self._lock = threading.Lock()
+        self._inflight = defaultdict(int)
+        self._latencies = defaultdict(lambda: deque(maxlen=latency_window))
+        self._stats = defaultdict(lambda: {'requests': 0, 'overflowed': 0, 'failed': 0, 'prompt_tokens': 0,
+                                           'output_tokens': 0, 'cost': 0.0, 'seconds': 0.0})
+        self._rule_hits = defaultdict(int)
+
+    @classmethod
+    def load(cls, path: str) -> 'ModelRouter':
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['rules'], data.get('default_route', LARGE), data.get('routes'), data.get('overflow'),
+                   data.get('version', 1))
+
+    @staticmethod
+    def _compile(rule: dict) -> dict:
+        priorities = {name: p for p, name in PRIORITY_NAMES.items()}
+        unknown = set(rule.get('priorities', [])) - set(priorities)
+        if unknown:
+            raise ValueError(f"Rule {rule['id']}: unknown priority class(es) {sorted(unknown)}")
+        return {
+            'id': rule['id'],
+            'route': rule['route'],
+            'methods': frozenset(rule['methods']) if 'methods' in rule else None,
+            'priorities': frozenset(priorities[p] for p in rule['priorities']) if 'priorities' in rule else None,
+            'min_prompt_tokens': rule.get('min_prompt_tokens', 0),
+            'max_prompt_tokens': rule.get('max_prompt_tokens', float('inf')),
+            'overflow': rule.get('overflow', True),
+        }
+
+    def route(self, method: str, prompt_tokens: int, priority: int = None) -> tuple:
+        """(route, matching rule id or None, whether the request may overflow)"""
+        for rule in self.rules:
+            if rule['methods'] is not None and method not in rule['methods']:
+                continue
+            if rule['priorities'] is not None and priority not in rule['priorities']:
+                continue
+            if not rule['min_prompt_tokens'] <= prompt_tokens <= rule['max_prompt_tokens']:
+                continue
+            return rule['route'], rule['id'], rule['overflow']
+        return self.default_route, None, True
+
+    def start(self, route: str, may_overflow: bool = True) -> str:
+        """Route the call actually takes, counted as in flight until finish()"""
+        with self._lock:
+            if (may_overflow and route == self.overflow.get('from')
+                    and self._inflight[route] >= self.overflow.get('max_inflight', float('inf'))):
+                route = self.overflow['to']
+            self._inflight[route] += 1
+        return route
+
+    def finish(self, route: str, rule_id: str, prompt_tokens: int, output_tokens: int, seconds: float,
+               overflowed: bool = False, failed: bool = False):
+        cost = (prompt_tokens + output_tokens) / 1000 * self.routes[route].get('cost_per_1k_tokens', 0.0)
+        with self._lock:
+            self._inflight[route] -= 1
+            s = self._stats[route]
+            s['requests'] += 1
+            s['overflowed'] += overflowed
+            s['failed'] += failed
+            s['prompt_tokens'] += prompt_tokens
+            s['output_tokens'] += output_tokens
+            s['cost'] += cost
+            s['seconds'] += seconds
+            self._latencies[route].append(seconds)
+            self._rule_hits[rule_id or 'default'] += 1
+
+    def stats(self) -> dict:
+        """Per route requests, overflows, tokens, cost and latency (mean, p50, p95)"""
+        with self._lock:
+            stats = {route: dict(s) for route, s in self._stats.items()}
+            latencies = {route: sorted(values) for route, values in self._latencies.items()}
+            inflight = dict(self._inflight)
+        for route, s in stats.items():
+            ordered = latencies.get(route) or [0.0]
+            s['inflight'] = inflight.get(route, 0)
+            s['avg_seconds'] = s.pop('seconds') / s['requests'] if s['requests'] else 0.0
+            s['p50_seconds'] = ordered[len(ordered) // 2]
+            s['p95_seconds'] = ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+            s['cost_per_request'] = s['cost'] / s['requests'] if s['requests'] else 0.0
+        return stats
+
+    def rule_hits(self) -> dict:
+        with self._lock:
+            return dict(self._rule_hits)
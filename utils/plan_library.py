@@ -0,0 +1,257 @@
+"""Pre-generated treatment plan library
+
+Build (or resume) a library version offline with:
+
+    python -m utils.plan_library build --workers 4
+    python -m utils.plan_library info
+
+Each build writes data/plan_library/v<N>/ (plans.jsonl + manifest.json) and
+then points data/plan_library/CURRENT at it, so readers never see a
+half-built version.
+"""
+import streamlit as st
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import config
+from utils.inference_scheduler import BACKGROUND
+from utils.prompt_templates import load_registry
+
+GENDERS = ["Male", "Female", "Other"]
+
+# Responses GraniteHealthAI.generate_response returns instead of raising
+ERROR_PREFIXES = ("Error generating response", "❌")
+
+
+def age_band(age: int) -> str:
+    """Config.AGE_BANDS key containing an age"""
+    for band, (low, high) in config.AGE_BANDS.items():
+        if low <= age <= high:
+            return band
+    return list(config.AGE_BANDS)[-1]
+
+
+def plan_key(condition: str, band: str, gender: str, severity: str) -> str:
+    return "|".join([condition.lower(), band, gender, severity])
+
+
+def library_prompt(condition: str, band: str, gender: str, severity: str) -> tuple:
+    """(prompt, template version) for one library plan"""
+    template = load_registry(config.PROMPT_TEMPLATES_PATH).select('plan_library', condition, band, gender, severity)
+    sections = "\n".join(template.part('section', name=name.replace('_', ' ').title(), description=desc)
+                         for name, desc in config.TREATMENT_TEMPLATES.items())
+    prompt = template.render(condition=condition, band=band, gender=gender, severity=severity, sections=sections)
+    return prompt, template.version
+
+
+def templates_hash() -> str:
+    """Fingerprint of the plan sections a library was generated with"""
+    raw = json.dumps(config.TREATMENT_TEMPLATES, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+
+
+class PlanLibrary:
+    """In-memory index over one library version with nearest-match lookup
+
+    A request matches on condition; among that condition's plans the one
+    with the closest age band, then severity, then gender is served.
+    """
+
+    def __init__(self, manifest: dict = None, plans: list = None):
+        self.manifest = manifest or {}
+        self.version = self.manifest.get('version')
+        self._exact = {}
+        self._by_condition = {}
+        bands = list(config.AGE_BANDS)
+        severities = config.SYMPTOM_SEVERITY_LEVELS
+        for p in plans or []:
+            self._exact[plan_key(p['condition'], p['age_band'], p['gender'], p['severity'])] = p
+            self._by_condition.setdefault(p['condition'].lower(), []).append(
+                (bands.index(p['age_band']), severities.index(p['severity']), p['gender'], p)
+            )
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    @classmethod
+    def load(cls, root: str) -> 'PlanLibrary':
+        """Current library version, or an empty library if none is built"""
+        try:
+            with open(os.path.join(root, 'CURRENT'), encoding='utf-8') as f:
+                version_dir = os.path.join(root, f.read().strip())
+            with open(os.path.join(version_dir, 'manifest.json'), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        return cls(manifest, list(read_plans(os.path.join(version_dir, 'plans.jsonl')).values()))
+
+    def lookup(self, condition: str, age: int, gender: str, severity: str):
+        """Closest pre-generated plan for the patient, or None"""
+        band = age_band(age)
+        gender = gender if gender in GENDERS else "Other"
+        exact = self._exact.get(plan_key(condition, band, gender, severity))
+        if exact is not None:
+            return exact
+        candidates = self._by_condition.get(condition.lower())
+        if not candidates:
+            return None
+        band_idx = list(config.AGE_BANDS).index(band)
+        sev_idx = config.SYMPTOM_SEVERITY_LEVELS.index(severity) if severity in config.SYMPTOM_SEVERITY_LEVELS else 1
+        return min(candidates, key=lambda c: (abs(c[0] - band_idx), abs(c[1] - sev_idx), c[2] != gender))[3]
+
+
+def read_plans(path: str) -> dict:
+    """Plans of a (possibly partial) plans.jsonl keyed by plan_key"""
+    plans = {}
+    if not os.path.exists(path):
+        return plans
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                p = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line of an interrupted build
+            plans[plan_key(p['condition'], p['age_band'], p['gender'], p['severity'])] = p
+    return plans
+
+
+def _version_dirs(root: str) -> list:
+    if not os.path.isdir(root):
+        return []
+    return sorted((d for d in os.listdir(root) if d.startswith('v') and d[1:].isdigit()),
+                  key=lambda d: int(d[1:]))
+
+
+def build_library(model, root: str, conditions: list = None, workers: int = 4,
+                  resume: bool = True, log=print) -> str:
+    """Generate every condition x age band x gender x severity plan into a new version
+
+    With resume, an unfinished version (no manifest yet) is completed instead
+    of starting over. Returns the version directory name.
+    """
+    conditions = conditions or config.TREATMENT_CONDITIONS
+    versions = _version_dirs(root)
+    unfinished = [v for v in versions if not os.path.exists(os.path.join(root, v, 'manifest.json'))]
+    if resume and unfinished:
+        version = unfinished[-1]
+    else:
+        version = f"v{int(versions[-1][1:]) + 1 if versions else 1}"
+    version_dir = os.path.join(root, version)
+    os.makedirs(version_dir, exist_ok=True)
+    plans_path = os.path.join(version_dir, 'plans.jsonl')
+
+    done = read_plans(plans_path)
+    todo = [
+        (condition, band, gender, severity)
+        for condition in conditions
+        for band in config.AGE_BANDS
+        for gender in GENDERS
+        for severity in config.SYMPTOM_SEVERITY_LEVELS
+        if plan_key(condition, band, gender, severity) not in done
+    ]
+    log(f"{version}: {len(done)} plans present, {len(todo)} to generate")
+
+    write_lock = threading.Lock()
+    failures = []
+
+    def generate(item):
+        condition, band, gender, severity = item
+        started = time.perf_counter()
+        prompt, prompt_version = library_prompt(*item)
+        plan = model.generate_response(prompt, max_tokens=700, priority=BACKGROUND, method='plan_library',
+                                       version=prompt_version)
+        if plan.startswith(ERROR_PREFIXES):
+            failures.append(item)
+            return
+        record = {
+            'condition': condition, 'age_band': band, 'gender': gender, 'severity': severity,
+            'plan': plan, 'generated_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+        with write_lock, open(plans_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        list(pool.map(generate, todo))
+
+    if failures:
+        raise RuntimeError(f"{len(failures)} plans failed; rerun to resume {version}")
+
+    manifest = {
+        'version': version,
+        'model': getattr(model, 'model_name', None),
+        'created_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'conditions': conditions,
+        'age_bands': list(config.AGE_BANDS),
+        'genders': GENDERS,
+        'severities': config.SYMPTOM_SEVERITY_LEVELS,
+        'templates_hash': templates_hash(),
+        'prompt_version': load_registry(config.PROMPT_TEMPLATES_PATH).get('plan_library').version,
+        'plans': len(read_plans(plans_path)),
+    }
+    _write_atomic(os.path.join(version_dir, 'manifest.json'), json.dumps(manifest, indent=2))
+    _write_atomic(os.path.join(root, 'CURRENT'), version)
+    return version
+
+
+def _write_atomic(path: str, text: str):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def personalize_plan(model, plan: dict, condition: str, patient_data: dict) -> str:
+    """Short delta on top of a library plan for patient-specific details
+
+    Returns "" when there is nothing to personalize or the model failed,
+    so the library plan is served unchanged.
+    """
+    details = {k: patient_data.get(k) for k in ('conditions', 'medications', 'allergies', 'goals', 'notes')}
+    details = {k: v for k, v in details.items() if v and str(v).strip() not in ('', 'None')}
+    if not details:
+        return ""
+    template = load_registry(config.PROMPT_TEMPLATES_PATH).select('personalize_plan', condition, plan['plan'], details)
+    prompt = template.render(
+        condition=condition, band=plan['age_band'], gender=plan['gender'], severity=plan['severity'],
+        plan=plan['plan'],
+        details="\n".join(template.part('detail', name=k.title(), value=v) for k, v in details.items()),
+    )
+    response = model.generate_response(prompt, max_tokens=config.PLAN_PERSONALIZE_MAX_TOKENS,
+                                       method='personalize_plan', version=template.version)
+    return "" if response.startswith(ERROR_PREFIXES) else response
+
+
+@st.cache_resource
+def get_plan_library():
+    return PlanLibrary.load(config.PLAN_LIBRARY_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect the treatment plan library")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Generate a new library version (resumes an unfinished one)")
+    build.add_argument("--workers", type=int, default=4)
+    build.add_argument("--fresh", action="store_true", help="Start a new version instead of resuming")
+    build.add_argument("--condition", action="append", help="Limit to these conditions (repeatable)")
+    sub.add_parser("info", help="Show the current library version")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        library = PlanLibrary.load(config.PLAN_LIBRARY_DIR)
+        print(json.dumps({**library.manifest, 'loaded_plans': len(library)}, indent=2))
+        return
+
+    from utils.ai_model import GraniteHealthAI
+    started = time.perf_counter()
+    version = build_library(GraniteHealthAI(), config.PLAN_LIBRARY_DIR, args.condition,
+                            args.workers, resume=not args.fresh)
+    print(f"Built {version} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""Per-patient profile store
+
+Profiles live in one SQLite table keyed by patient id, with indexes on the
+name and on each listed condition. Import profiles in bulk with:
+
+    python -m utils.profile_store import profiles.jsonl
+    python -m utils.profile_store import profiles.csv --batch-size 5000
+"""
+import streamlit as st
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    patient_id TEXT PRIMARY KEY,
+    name TEXT,
+    name_key TEXT,
+    age INTEGER,
+    gender TEXT,
+    conditions TEXT,
+    medications TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_profiles_name ON profiles(name_key);
+
+CREATE TABLE IF NOT EXISTS profile_conditions (
+    condition TEXT NOT NULL,
+    patient_id TEXT NOT NULL,
+    PRIMARY KEY (condition, patient_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_profile_conditions_patient ON profile_conditions(patient_id);
+"""
+
+UPSERT = ("INSERT OR REPLACE INTO profiles (patient_id, name, name_key, age, gender, conditions, medications, "
+          "updated_at) VALUES (:patient_id, :name, :name_key, :age, :gender, :conditions, :medications, :updated_at)")
+
+# Every profile has exactly these keys, whichever page created it
+DEFAULT_PROFILE = {
+    'name': '',
+    'age': 30,
+    'gender': 'Not specified',
+    'conditions': 'None',
+    'medications': 'None',
+}
+
+NO_CONDITIONS = {'', 'none', 'n/a', 'na', 'no'}
+
+
+def normalize_profile(data: dict) -> dict:
+    """Profile with the standard keys; conditions and medications as text"""
+    profile = dict(DEFAULT_PROFILE)
+    for key in profile:
+        value = data.get(key)
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ", ".join(str(v) for v in value)
+        profile[key] = value
+    try:
+        profile['age'] = int(profile['age'])
+    except (TypeError, ValueError):
+        profile['age'] = DEFAULT_PROFILE['age']
+    profile['name'] = str(profile['name']).strip()
+    return profile
+
+
+def condition_keys(conditions: str) -> list:
+    """Lower-cased condition names from free text ("Diabetes, Hypertension")"""
+    keys = {c.strip().lower() for c in re.split(r"[,;\n]", conditions or "")}
+    return sorted(keys - NO_CONDITIONS)
+
+
+class ProfileStore:
+    """SQLite store of patient profiles with an in-memory read-through cache
+
+    get() serves recently read profiles from an LRU cache and falls back to
+    a primary key lookup. put() replaces a profile and its condition index
+    rows in one transaction, so readers never see half an update. Lookups by
+    name prefix and by condition go through their own indexes.
+    """
+
+    def __init__(self, path: str, cache_size: int = 4096):
+        self.path = path
+        self.cache_size = cache_size
+        self._local = threading.local()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Per-thread connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---- cache --------------------------------------------------------
+
+    def _cached(self, patient_id: str):
+        with self._cache_lock:
+            profile = self._cache.get(patient_id)
+            if profile is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(patient_id)
+            self.hits += 1
+            return profile
+
+    def _remember(self, patient_id: str, profile: dict):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[patient_id] = profile
+            self._cache.move_to_end(patient_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _forget(self, patient_ids):
+        with self._cache_lock:
+            for patient_id in patient_ids:
+                self._cache.pop(patient_id, None)
+
+    # ---- writes -------------------------------------------------------
+
+    @staticmethod
+    def _row(patient_id: str, profile: dict, updated_at: str) -> dict:
+        return dict(profile, patient_id=patient_id, name_key=profile['name'].lower() or None, updated_at=updated_at)
+
+    def put(self, patient_id: str, data: dict) -> dict:
+        """Create or replace a profile; returns it with the standard keys"""
+        profile = normalize_profile(data)
+        conn = self._connect()
+        with conn:
+            conn.execute(UPSERT, self._row(patient_id, profile, time.strftime("%Y-%m-%d %H:%M:%S")))
+            conn.execute("DELETE FROM profile_conditions WHERE patient_id = ?", (patient_id,))
+            conn.executemany("INSERT INTO profile_conditions (condition, patient_id) VALUES (?, ?)",
+                             [(c, patient_id) for c in condition_keys(profile['conditions'])])
+        self._remember(patient_id, profile)
+        return dict(profile)
+
+    def delete(self, patient_id: str):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM profiles WHERE patient_id = ?", (patient_id,))
+            conn.execute("DELETE FROM profile_conditions WHERE patient_id = ?", (patient_id,))
+        self._forget([patient_id])
+
+    def bulk_import(self, records, batch_size: int = 5000) -> int:
+        """Upsert profiles from an iterable of dicts with a 'patient_id' key
+
+        Each batch is one transaction. Returns the number of profiles written.
+        """
+        conn = self._connect()
+        updated_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        written = 0
+        batch = []
+
+        def write(batch):
+            # A patient listed twice in one batch keeps only its last record
+            batch = list({row['patient_id']: (row, keys) for row, keys in batch}.values())
+            ids = [(row['patient_id'],) for row, _ in batch]
+            with conn:
+                conn.executemany("DELETE FROM profile_conditions WHERE patient_id = ?", ids)
+                conn.executemany(UPSERT, [row for row, _ in batch])
+                conn.executemany("INSERT OR IGNORE INTO profile_conditions (condition, patient_id) VALUES (?, ?)",
+                                 [(c, row['patient_id']) for row, keys in batch for c in keys])
+            self._forget(pid for (pid,) in ids)
+            return len(batch)
+
+        for record in records:
+            patient_id = str(record.get('patient_id') or '').strip()
+            if not patient_id:
+                raise ValueError(f"Profile without patient_id: {record}")
+            profile = normalize_profile(record)
+            batch.append((self._row(patient_id, profile, updated_at), condition_keys(profile['conditions'])))
+            if len(batch) >= batch_size:
+                written += write(batch)
+                batch = []
+        if batch:
+            written += write(batch)
+        return written
+
+    # ---- reads --------------------------------------------------------
+
+    @staticmethod
+    def _decode(row) -> dict:
+        return {key: row[key] for key in DEFAULT_PROFILE}
+
+    def get(self, patient_id: str) -> dict:
+        """Profile for a patient, or None"""
+        profile = self._cached(patient_id)
+        if profile is None:
+            row = self._connect().execute("SELECT * FROM profiles WHERE patient_id = ?", (patient_id,)).fetchone()
+            if row is None:
+                return None
+            profile = self._decode(row)
+            self._remember(patient_id, profile)
+        return dict(profile)
+
+    def find_by_name(self, name: str, limit: int = 20) -> list:
+        """Profiles whose name starts with `name` (case-insensitive), by name"""
+        prefix = name.strip().lower()
+        if not prefix:
+            return []
+        rows = self._connect().execute(
+            "SELECT * FROM profiles WHERE name_key >= ? AND name_key < ? ORDER BY name_key LIMIT ?",
+            (prefix, prefix + "\uffff", limit)
+        ).fetchall()
+        return [dict(self._decode(r), patient_id=r['patient_id']) for r in rows]
+
+    def find_by_condition(self, condition: str, limit: int = 100) -> list:
+        """Patient ids listing a condition (case-insensitive exact match)"""
+        rows = self._connect().execute(
+            "SELECT patient_id FROM profile_conditions WHERE condition = ? ORDER BY patient_id LIMIT ?",
+            (condition.strip().lower(), limit)
+        ).fetchall()
+        return [r['patient_id'] for r in rows]
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._cache_lock:
+            total = self.hits + self.misses
+            return {
+                'cached': len(self._cache),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+def read_profiles(path: str):
+    """Profiles from a .csv, .jsonl or .json (list of objects) file"""
+    with open(path, encoding='utf-8', newline='') as f:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(f)
+        elif path.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(f)
+
+
+@st.cache_resource
+def get_profile_store():
+    if config.SERVICE_URL:
+        from utils.service_client import RemoteProfileStore, get_service_client
+        return RemoteProfileStore(get_service_client())
+    return ProfileStore(config.PROFILE_DB_PATH, config.PROFILE_CACHE_SIZE)
+
+
+def load_patient_profile(patient_id: str) -> dict:
+    """The session's patient profile, loaded from the store once per session"""
+    if st.session_state.get('patient_data_id') != patient_id:
+        profile = get_profile_store().get(patient_id)
+        st.session_state.patient_data = normalize_profile(profile or {})
+        st.session_state.patient_data_id = patient_id
+        st.session_state.patient_data_saved = dict(st.session_state.patient_data)
+    return st.session_state.patient_data
+
+
+def save_patient_profile(patient_id: str):
+    """Write the session's profile back to the store if a widget changed it"""
+    profile = normalize_profile(st.session_state.patient_data)
+    if profile != st.session_state.get('patient_data_saved'):
+        st.session_state.patient_data = get_profile_store().put(patient_id, profile)
+        st.session_state.patient_data_saved = dict(st.session_state.patient_data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    importer = sub.add_parser("import", help="Upsert profiles from a file")
+    importer.add_argument("path", help=".csv, .jsonl or .json file with a patient_id column/key")
+    importer.add_argument("--batch-size", type=int, default=5000)
+    importer.add_argument("--db", default=config.PROFILE_DB_PATH)
+    args = parser.parse_args()
+
+    store = ProfileStore(args.db)
+    started = time.perf_counter()
+    written = store.bulk_import(read_profiles(args.path), args.batch_size)
+    print(f"Imported {written} profiles in {time.perf_counter() - started:.2f}s ({store.count()} in {args.db})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import functools
+import hashlib
+import json
+import string
+
+DEFAULT_VARIANT = "default"
+
+
+class PromptTemplate:
+    """One compiled prompt with optional parts, identified by a content hash
+
+    `version` is "<name>@<variant>:<hash of the template text>", so editing a
+    template gives it a new version even when its name stays the same.
+    """
+
+    def __init__(self, name: str, variant: str, spec: dict):
+        self.name = name
+        self.variant = variant
+        self.template = string.Template("\n".join(spec['template']))
+        self.parts = {key: string.Template("\n".join(lines)) for key, lines in spec.get('parts', {}).items()}
+        digest = hashlib.sha256(json.dumps(spec, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        self.version = f"{name}@{variant}:{digest[:8]}"
+
+    def render(self, **values) -> str:
+        return self.template.substitute(values)
+
+    def part(self, key: str, **values) -> str:
+        return self.parts[key].substitute(values)
+
+
+class PromptRegistry:
+    """Prompt templates loaded once from a JSON file, with A/B variants
+
+    Templates are keyed "name" (the default variant) or "name@variant".
+    `experiments` maps a template name to variant weights, for example
+    {"analyze_symptoms": {"default": 0.5, "concise": 0.5}}. A request's
+    variant is picked from a hash of its inputs, so the same inputs always
+    get the same variant (and the same response cache entry).
+    """
+
+    def __init__(self, templates: dict, experiments: dict = None):
+        self._templates = {}
+        for key, spec in templates.items():
+            name, _, variant = key.partition("@")
+            self._templates[(name, variant or DEFAULT_VARIANT)] = PromptTemplate(name, variant or DEFAULT_VARIANT, spec)
+        self._experiments = {}
+        for name, weights in (experiments or {}).items():
+            missing = [v for v in weights if (name, v) not in self._templates]
+            if missing:
+                raise ValueError(f"Experiment {name}: unknown variant(s) {missing}")
+            total = sum(weights.values())
+            self._experiments[name] = [(v, w / total) for v, w in sorted(weights.items()) if w > 0]
+
+    @classmethod
+    def load(cls, path: str) -> 'PromptRegistry':
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['templates'], data.get('experiments'))
+
+    def get(self, name: str, variant: str = DEFAULT_VARIANT) -> PromptTemplate:
+        return self._templates[(name, variant)]
+
+    def select(self, name: str, *inputs) -> PromptTemplate:
+        """Template variant for a request, stable for the same inputs"""
+        arms = self._experiments.get(name)
+        if not arms:
+            return self._templates[(name, DEFAULT_VARIANT)]
+        raw = json.dumps(inputs, sort_keys=True, default=str, ensure_ascii=False)
+        point = int(hashlib.sha256(raw.encode("utf-8")).hexdigest()[:8], 16) / 0x100000000
+        for variant, share in arms:
+            point -= share
+            if point < 0:
+                return self._templates[(name, variant)]
+        return self._templates[(name, arms[-1][0])]
+
+    def versions(self) -> dict:
+        """Version of every loaded template, keyed name@variant"""
+        return {f"{name}@{variant}": t.version for (name, variant), t in self._templates.items()}
+
+
+@functools.lru_cache(maxsize=None)
+def load_registry(path: str) -> PromptRegistry:
+    """Registry of a templates file, loaded once per process (for code without a model instance)"""
+    return PromptRegistry.load(path)
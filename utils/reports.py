@@ -0,0 +1,412 @@
+import streamlit as st
+import base64
+import hashlib
+import html
+import os
+import re
+import smtplib
+import string
+import textwrap
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from io import BytesIO
+import pandas as pd
+from config import config
+from utils.response_cache import ResponseCache
+from utils.visualizations import HealthVisualizations
+
+REPORT_METRICS = {
+    'heart_rate': 'Heart Rate (bpm)',
+    'blood_pressure_systolic': 'Systolic BP (mmHg)',
+    'blood_glucose': 'Blood Glucose (mg/dL)',
+    'oxygen_saturation': 'Oxygen Saturation (%)',
+}
+
+REPORT_FORMATS = {
+    'pdf': ('pdf', 'application/pdf'),
+    'html': ('html', 'text/html'),
+}
+
+DISCLAIMER = ("This report is AI-generated for informational and educational purposes only. "
+              "It is not a diagnosis or prescription and does not replace professional medical advice.")
+
+# matplotlib figures are not safe to draw concurrently from several threads
+_MPL_LOCK = threading.Lock()
+
+# Emoji and dingbats have no glyphs in the PDF font
+_NO_GLYPH = re.compile('[\U0001F000-\U0001FFFF\u2600-\u27BF\uFE0F\u200D]')
+
+
+def data_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of a frame; equal data gives equal fingerprints"""
+    digest = hashlib.sha256(",".join(map(str, df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def _inline_html(text: str) -> str:
+    return re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", html.escape(text))
+
+
+def markdown_to_html(text: str) -> str:
+    """HTML for the small markdown subset model replies use (bold, bullets, headings)"""
+    out, in_list = [], False
+    for line in text.splitlines():
+        stripped = line.strip()
+        bullet = re.match(r"^(?:[-*•]|\d+\.)\s+(.*)", stripped)
+        if in_list and not bullet:
+            out.append("</ul>")
+            in_list = False
+        if not stripped:
+            continue
+        if bullet:
+            if not in_list:
+                out.append("<ul>")
+                in_list = True
+            out.append(f"<li>{_inline_html(bullet.group(1))}</li>")
+        elif stripped.startswith("#"):
+            out.append(f"<h3>{_inline_html(stripped.lstrip('#').strip())}</h3>")
+        else:
+            out.append(f"<p>{_inline_html(stripped)}</p>")
+    if in_list:
+        out.append("</ul>")
+    return "\n".join(out)
+
+
+class TemplateCache:
+    """Parsed report templates, re-read only when the file changes"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._templates = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.compiles = 0
+
+    def get(self, name: str) -> string.Template:
+        path = os.path.join(self.directory, name)
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            entry = self._templates.get(name)
+            if entry is not None and entry[0] == mtime:
+                self.hits += 1
+                return entry[1]
+        with open(path, encoding='utf-8') as f:
+            template = string.Template(f.read())
+        # string.Template.is_valid() needs Python 3.11
+        if any(m.group('invalid') is not None for m in template.pattern.finditer(template.template)):
+            raise ValueError(f"Invalid report template: {path}")
+        with self._lock:
+            self._templates[name] = (mtime, template)
+            self.compiles += 1
+        return template
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'templates': len(self._templates), 'hits': self.hits, 'compiles': self.compiles}
+
+
+class ReportRenderer:
+    """Renders a report dict to HTML and/or PDF bytes
+
+    A report has a title, subtitle, meta rows, a markdown body and an
+    optional `trends` frame. The trend chart is a PNG cached by data
+    fingerprint, so reports over the same readings reuse one image.
+    """
+
+    def __init__(self, template_dir: str, chart_cache_size: int = 64):
+        self.templates = TemplateCache(template_dir)
+        self.charts = ResponseCache(chart_cache_size, ttl_seconds=float('inf'))
+
+    def chart(self, report: dict):
+        """Trend chart PNG for the report, or None without trend data"""
+        trends = report.get('trends')
+        if trends is None or trends.empty:
+            return None
+        metrics = {m: t for m, t in REPORT_METRICS.items() if m in trends}
+        key = ResponseCache.make_key('trend-chart', data_fingerprint(trends[['date', *metrics]]), metrics)
+        png = self.charts.get(key)
+        if png is None:
+            with _MPL_LOCK:
+                png = HealthVisualizations.render_static_trends(trends, metrics)
+            self.charts.put(key, png)
+        return png
+
+    def render_html(self, report: dict, chart: bytes = None) -> bytes:
+        meta_rows = "\n".join(
+            f"<tr><td>{html.escape(str(label))}</td><td>{html.escape(str(value))}</td></tr>"
+            for label, value in report['meta']
+        )
+        charts = ""
+        if chart:
+            encoded = base64.b64encode(chart).decode("ascii")
+            charts = f'<h3>Recent Vitals</h3>\n<img alt="Recent vitals" src="data:image/png;base64,{encoded}">'
+        page = self.templates.get("report.html").substitute(
+            title=html.escape(report['title']),
+            subtitle=html.escape(report['subtitle']),
+            generated_at=html.escape(report['created_at']),
+            meta_rows=meta_rows,
+            body=markdown_to_html(report['body']),
+            charts=charts,
+            disclaimer=html.escape(DISCLAIMER),
+        )
+        return page.encode("utf-8")
+
+    @staticmethod
+    def _pdf_lines(report: dict) -> list:
+        """(text, size, weight, color) lines, wrapped to the page width"""
+        lines = [(report['title'], 18, 'bold', '#0077b6'),
+                 (f"{report['subtitle']} · Generated {report['created_at']}", 9, 'normal', '#666666'),
+                 ("", 9, 'normal', 'black')]
+        for label, value in report['meta']:
+            for part in textwrap.wrap(f"{label}: {value}", 95) or [""]:
+                lines.append((part, 9, 'normal', '#333333'))
+        lines.append(("", 10, 'normal', 'black'))
+        for raw in report['body'].splitlines():
+            text = raw.strip()
+            bold = text.startswith("#") or (text.startswith("**") and text.endswith("**"))
+            text = text.lstrip("#").replace("**", "").strip()
+            for part in textwrap.wrap(text, 90, subsequent_indent="   " if text[:1] in "-*•" else "") or [""]:
+                lines.append((part, 10, 'bold' if bold else 'normal', 'black'))
+        lines.append(("", 10, 'normal', 'black'))
+        for part in textwrap.wrap(DISCLAIMER, 105):
+            lines.append((part, 8, 'normal', '#b00020'))
+        return [(_NO_GLYPH.sub("", text), *style) for text, *style in lines]
+
+    def render_pdf(self, report: dict, chart: bytes = None) -> bytes:
+        from matplotlib.backends.backend_pdf import PdfPages
+        from matplotlib.figure import Figure
+        from matplotlib.image import imread
+
+        width, height, margin = 8.27, 11.69, 0.75  # A4, inches
+        buffer = BytesIO()
+        with _MPL_LOCK, PdfPages(buffer, metadata={'Title': report['title'], 'Creator': 'HealthAI'}) as pdf:
+            fig, y = None, 0.0
+            for text, size, weight, color in self._pdf_lines(report):
+                step = size * 1.45 / 72
+                if fig is None or y - step < margin:
+                    if fig is not None:
+                        pdf.savefig(fig)
+                    fig, y = Figure(figsize=(width, height)), height - margin
+                y -= step
+                if text:
+                    fig.text(margin / width, y / height, text, fontsize=size, fontweight=weight,
+                             color=color, parse_math=False)
+            pdf.savefig(fig)
+
+            if chart:
+                fig = Figure(figsize=(width, height))
+                fig.text(margin / width, 1 - margin / height, "Recent Vitals", fontsize=14,
+                         fontweight='bold', color='#0077b6')
+                image = imread(BytesIO(chart), format='png')
+                aspect = image.shape[0] / image.shape[1]
+                box_w = (width - 2 * margin) / width
+                box_h = min(box_w * width * aspect / height, 1 - 2.5 * margin / height)
+                ax = fig.add_axes([margin / width, 1 - 1.3 * margin / height - box_h, box_w, box_h])
+                ax.imshow(image)
+                ax.axis('off')
+                pdf.savefig(fig)
+        return buffer.getvalue()
+
+    def render(self, report: dict, formats=('pdf', 'html')) -> dict:
+        """{format: bytes} for each requested format"""
+        chart = self.chart(report)
+        return {fmt: getattr(self, f"render_{fmt}")(report, chart) for fmt in formats}
+
+
+def send_email(to: str, subject: str, body: str, attachments: dict):
+    """Send a message with {filename: bytes} attachments via Config.SMTP_*"""
+    message = EmailMessage()
+    message['From'] = config.SMTP_FROM
+    message['To'] = to
+    message['Subject'] = subject
+    message.set_content(body)
+    for filename, data in attachments.items():
+        ext = os.path.splitext(filename)[1].lstrip('.')
+        maintype, subtype = REPORT_FORMATS[ext][1].split('/')
+        message.add_attachment(data, maintype=maintype, subtype=subtype, filename=filename)
+
+    with smtplib.SMTP(config.SMTP_HOST, config.SMTP_PORT, timeout=config.SMTP_TIMEOUT) as smtp:
+        if config.SMTP_STARTTLS:
+            smtp.starttls()
+        if config.SMTP_USER:
+            smtp.login(config.SMTP_USER, config.SMTP_PASSWORD)
+        smtp.send_message(message)
+
+
+def report_filename(report: dict, fmt: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "_", report['title'].lower()).strip("_")
+    return f"{slug}_{report['created_at'][:10]}.{REPORT_FORMATS[fmt][0]}"
+
+
+class ReportService:
+    """Background report rendering and email delivery
+
+    submit() and email() return futures immediately, so pages never wait
+    on matplotlib or SMTP; they poll the future on later reruns.
+    """
+
+    def __init__(self, renderer: ReportRenderer, workers: int = 2):
+        self.renderer = renderer
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="report")
+        self._lock = threading.Lock()
+        self.rendered = 0
+        self.emailed = 0
+        self.failed = 0
+        self.render_seconds = 0.0
+
+    def _render(self, report: dict, formats) -> dict:
+        started = time.perf_counter()
+        try:
+            files = self.renderer.render(report, formats)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        with self._lock:
+            self.rendered += 1
+            self.render_seconds += time.perf_counter() - started
+        return files
+
+    def _email(self, to: str, report: dict, files: dict):
+        try:
+            send_email(
+                to,
+                report['title'],
+                f"{report['title']}\n{report['subtitle']}\n\nYour report is attached.\n\n{DISCLAIMER}",
+                {report_filename(report, fmt): data for fmt, data in files.items()},
+            )
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        with self._lock:
+            self.emailed += 1
+        return to
+
+    def submit(self, report: dict, formats=('pdf', 'html')):
+        """Future of {format: bytes}"""
+        return self._executor.submit(self._render, report, formats)
+
+    def email(self, to: str, report: dict, files: dict):
+        """Future of the recipient once the message is accepted by the SMTP server"""
+        return self._executor.submit(self._email, to, report, files)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                'rendered': self.rendered,
+                'emailed': self.emailed,
+                'failed': self.failed,
+                'avg_render_seconds': self.render_seconds / self.rendered if self.rendered else 0.0,
+            }
+        stats['chart_cache'] = self.renderer.charts.stats()
+        stats['templates'] = self.renderer.templates.stats()
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+@st.cache_resource
+def get_report_service():
+    return ReportService(ReportRenderer(config.REPORT_TEMPLATE_DIR, config.REPORT_CHART_CACHE_SIZE),
+                         config.REPORT_WORKERS)
+
+
+def _recent_trends(trends: pd.DataFrame):
+    if trends is None:
+        return None
+    return trends.tail(config.REPORT_TREND_DAYS)[['date', *[m for m in REPORT_METRICS if m in trends]]]
+
+
+def build_treatment_report(result: dict, patient_info: dict, trends: pd.DataFrame = None) -> dict:
+    meta = [('Condition', result['condition']), ('Severity', patient_info.get('severity')),
+            ('Age', patient_info.get('age')), ('Gender', patient_info.get('gender')),
+            ('BMI', patient_info.get('bmi')), ('Existing Conditions', patient_info.get('conditions')),
+            ('Medications', patient_info.get('medications')), ('Allergies', patient_info.get('allergies')),
+            ('Goals', patient_info.get('goals'))]
+    return {
+        'kind': 'treatment_plan',
+        'title': f"Treatment Plan: {result['condition']}",
+        'subtitle': "HealthAI personalized treatment plan",
+        'created_at': result['timestamp'],
+        'meta': [(label, value) for label, value in meta if value not in (None, '', 'None')],
+        'body': result['plan'],
+        'trends': _recent_trends(trends),
+    }
+
+
+def build_symptom_report(symptoms: list, result: dict, patient_info: dict, trends: pd.DataFrame = None) -> dict:
+    meta = [('Symptoms', ", ".join(s.title() for s in symptoms)),
+            ('Severity', f"{patient_info.get('severity')}/10"), ('Duration', patient_info.get('duration')),
+            ('Age', patient_info.get('age')), ('Gender', patient_info.get('gender')),
+            ('Existing Conditions', patient_info.get('conditions')),
+            ('Triage', (patient_info.get('triage_level') or '').title())]
+    return {
+        'kind': 'symptom_analysis',
+        'title': "Symptom Analysis",
+        'subtitle': "HealthAI symptom analysis",
+        'created_at': result['timestamp'],
+        'meta': [(label, value) for label, value in meta if value not in (None, '', 'None')],
+        'body': result['analysis'],
+        'trends': _recent_trends(trends),
+    }
+
+
+def start_report(state_key: str, report: dict):
+    """Queue report rendering and remember the job in the session"""
+    st.session_state[state_key] = {'report': report, 'future': get_report_service().submit(report)}
+
+
+def render_report_actions(state_key: str):
+    """Download and email controls for the session's latest report"""
+    job = st.session_state.get(state_key)
+    if not job:
+        return
+    st.markdown("---")
+    st.markdown("### 📄 Report")
+
+    future = job['future']
+    if not future.done():
+        st.info("⏳ Your report is being prepared in the background.")
+        st.button("🔄 Check Report", key=f"{state_key}_check")
+        return
+    try:
+        files = future.result()
+    except Exception as e:
+        st.error(f"❌ Report generation failed: {e}")
+        return
+
+    report = job['report']
+    columns = st.columns(len(files) + 1)
+    for col, (fmt, data) in zip(columns, files.items()):
+        with col:
+            st.download_button(
+                label=f"📥 Download {fmt.upper()}",
+                data=data,
+                file_name=report_filename(report, fmt),
+                mime=REPORT_FORMATS[fmt][1],
+                use_container_width=True,
+                key=f"{state_key}_download_{fmt}"
+            )
+
+    with columns[-1]:
+        with st.form(f"{state_key}_email_form", clear_on_submit=False, border=False):
+            to = st.text_input("Email", placeholder="you@example.com", label_visibility="collapsed")
+            if st.form_submit_button("📧 Email Report", use_container_width=True):
+                if re.fullmatch(r"[^@\s]+@[^@\s]+\.[^@\s]+", to.strip()):
+                    job['email'] = get_report_service().email(to.strip(), report, files)
+                else:
+                    st.warning("Enter a valid email address.")
+
+    email = job.get('email')
+    if email is not None:
+        if not email.done():
+            st.caption("📧 Sending...")
+        elif email.exception() is not None:
+            st.error(f"❌ Email failed: {email.exception()}")
+        else:
+            st.caption(f"✅ Sent to {email.result()}")
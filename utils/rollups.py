@@ -0,0 +1,181 @@
+import pandas as pd
+import numpy as np
+import threading
+from utils.data_handler import HealthDataHandler
+
+# Resolutions from finest to coarsest with their approximate bucket width in days
+GRANULARITY_DAYS = {
+    'day': 1,
+    'week': 7,
+    'month': 30,
+}
+
+STAT_COLUMNS = ['count', 'sum', 'sumsq', 'min', 'max', 'low', 'high']
+STAT_AGGREGATIONS = {'count': 'sum', 'sum': 'sum', 'sumsq': 'sum', 'min': 'min',
+                     'max': 'max', 'low': 'sum', 'high': 'sum'}
+
+
+class RollupStore:
+    """Materialized per-patient day/week/month rollups of health metrics
+
+    Buckets keep additive sufficient statistics (count, sum, sum of squares,
+    min, max, out-of-range counts) so new readings merge into existing buckets
+    without rescanning raw rows. Each patient has its own table per
+    granularity, indexed by bucket start, so a batch only touches that
+    patient's buckets. ingest() replaces tables rather than modifying them,
+    so a copy() can take new readings while the original is still being read.
+    """
+
+    def __init__(self, metrics: list = None):
+        self.metrics = metrics or list(HealthDataHandler.METRIC_RANGES)
+        self._tables = {g: {} for g in GRANULARITY_DAYS}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def bucket_start(dates: pd.Series, granularity: str) -> pd.Series:
+        """Start timestamp of the bucket each date falls into"""
+        dates = pd.to_datetime(dates)
+        if granularity == 'day':
+            return dates.dt.floor('D')
+        if granularity == 'week':
+            day = dates.dt.floor('D')
+            return day - pd.to_timedelta(day.dt.weekday, unit='D')
+        if granularity == 'month':
+            return dates.dt.to_period('M').dt.start_time
+        raise ValueError(f"Unknown granularity: {granularity}")
+
+    def _partial_rollup(self, df: pd.DataFrame, granularity: str) -> pd.DataFrame:
+        """Aggregate raw rows into sufficient statistics per bucket"""
+        keys = pd.Index(self.bucket_start(df['date'], granularity).to_numpy(), name='bucket')
+        parts = {}
+        for metric in self.metrics:
+            if metric not in df:
+                continue
+            values = df[metric].to_numpy(dtype=float)
+            r = HealthDataHandler.METRIC_RANGES.get(metric)
+            parts[(metric, 'count')] = np.ones(len(values))
+            parts[(metric, 'sum')] = values
+            parts[(metric, 'sumsq')] = values * values
+            parts[(metric, 'min')] = values
+            parts[(metric, 'max')] = values
+            parts[(metric, 'low')] = (values < r['low']).astype(float) if r else 0.0
+            parts[(metric, 'high')] = (values > r['high']).astype(float) if r else 0.0
+
+        frame = pd.DataFrame(parts, index=keys)
+        return frame.groupby(level=0).agg(self._aggregations(frame.columns))
+
+    @staticmethod
+    def _aggregations(columns) -> dict:
+        return {col: STAT_AGGREGATIONS[col[1]] for col in columns}
+
+    def ingest(self, df: pd.DataFrame, patient_id: str):
+        """Merge newly ingested raw readings for a patient into every rollup"""
+        if df.empty:
+            return
+        with self._lock:
+            for granularity in GRANULARITY_DAYS:
+                partial = self._partial_rollup(df, granularity)
+                tables = self._tables[granularity]
+                table = tables.get(patient_id)
+                if table is None:
+                    tables[patient_id] = partial
+                    continue
+
+                # Only buckets touched by this batch are re-aggregated
+                overlap = partial.index.intersection(table.index)
+                fresh = partial.drop(overlap)
+                if len(overlap):
+                    merged = pd.concat([table.loc[overlap], partial.loc[overlap]])
+                    merged = merged.groupby(level=0).agg(self._aggregations(merged.columns))
+                    table = table.copy()
+                    table.loc[overlap, merged.columns] = merged
+                if len(fresh):
+                    # New readings usually start at or after the last bucket: append without re-sorting
+                    in_order = fresh.index[0] > table.index[-1]
+                    table = pd.concat([table, fresh])
+                    if not in_order:
+                        table = table.sort_index()
+                tables[patient_id] = table
+
+    def copy(self) -> 'RollupStore':
+        """Store sharing this one's current tables"""
+        other = RollupStore(self.metrics)
+        with self._lock:
+            other._tables = {g: dict(tables) for g, tables in self._tables.items()}
+        return other
+
+    def drop_patient(self, patient_id: str):
+        """Remove all rollup buckets for a patient"""
+        with self._lock:
+            for tables in self._tables.values():
+                tables.pop(patient_id, None)
+
+    def query(self, patient_id: str, granularity: str, start=None, end=None) -> pd.DataFrame:
+        """Rollup rows for a patient as a chart-ready frame
+
+        The frame has a 'date' column and the bucket mean under each metric
+        name, so existing chart helpers can plot it directly, plus
+        <metric>_min/_max/_std/_count/_low/_high columns.
+        """
+        rows = self._tables[granularity].get(patient_id)
+        if rows is None:
+            return pd.DataFrame(columns=['date'] + self.metrics)
+
+        if start is not None:
+            rows = rows[rows.index >= self.bucket_start(pd.Series([start]), granularity).iloc[0]]
+        if end is not None:
+            rows = rows[rows.index <= pd.Timestamp(end)]
+
+        out = {'date': rows.index.to_numpy()}
+        for metric in self.metrics:
+            if (metric, 'count') not in rows:
+                continue
+            count = rows[(metric, 'count')].to_numpy()
+            total = rows[(metric, 'sum')].to_numpy()
+            var = (rows[(metric, 'sumsq')].to_numpy() - total * total / count) / np.maximum(count - 1, 1)
+            out[metric] = total / count
+            out[f"{metric}_min"] = rows[(metric, 'min')].to_numpy()
+            out[f"{metric}_max"] = rows[(metric, 'max')].to_numpy()
+            out[f"{metric}_std"] = np.sqrt(np.maximum(var, 0))
+            out[f"{metric}_count"] = count.astype(int)
+            out[f"{metric}_low"] = rows[(metric, 'low')].to_numpy().astype(int)
+            out[f"{metric}_high"] = rows[(metric, 'high')].to_numpy().astype(int)
+
+        return pd.DataFrame(out)
+
+    @staticmethod
+    def choose_granularity(start, end, max_points: int, raw_points: int = None) -> str:
+        """Finest resolution whose point count over [start, end] fits the budget
+
+        Returns 'raw' when the raw rows already fit, otherwise the first rollup
+        (day, week, month) that does, falling back to month.
+        """
+        if raw_points is not None and raw_points <= max_points:
+            return 'raw'
+        span_days = max((pd.Timestamp(end) - pd.Timestamp(start)).total_seconds() / 86400, 1)
+        for granularity, width in GRANULARITY_DAYS.items():
+            if span_days / width <= max_points:
+                return granularity
+        return 'month'
+
+    def chart_frame(self, raw_df: pd.DataFrame, patient_id: str, start, end, max_points: int) -> tuple:
+        """Data to chart for a range: raw rows if they fit, else the chosen rollup
+
+        raw_df must be sorted by date; the range is located by binary search
+        and its rows are only sliced out when they are charted.
+        """
+        dates = raw_df['date']
+        first = dates.searchsorted(pd.Timestamp(start), side='left')
+        last = dates.searchsorted(pd.Timestamp(end), side='right')
+        granularity = self.choose_granularity(start, end, max_points, raw_points=last - first)
+        if granularity == 'raw':
+            return raw_df.iloc[first:last].reset_index(drop=True), granularity
+        return self.query(patient_id, granularity, start, end), granularity
+
+    def memory_usage(self) -> int:
+        """Bytes held by all rollup tables"""
+        return sum(int(t.memory_usage(deep=True).sum()) for tables in self._tables.values() for t in tables.values())
+
+    def row_counts(self) -> dict:
+        """Number of materialized buckets per granularity"""
+        return {g: sum(len(t) for t in tables.values()) for g, tables in self._tables.items()}
@@ -0,0 +1,217 @@
+"""Shared HealthAI service for multi-worker deployments
+
+Runs inference, the response cache, history storage and the patient data
+cache in one process so several Streamlit front ends can act as thin
+clients (see utils/service_client.py). Start it with:
+
+    python -m utils.service --port 8765
+    python -m utils.service --socket /tmp/healthai.sock
+"""
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import config
+from utils.ai_model import GraniteHealthAI
+from utils.data_cache import PatientDataCache, apply_flushed_readings, load_health_data
+from utils.history_store import HistoryStore
+from utils.profile_store import ProfileStore
+from utils.vitals_buffer import VitalsBuffer
+
+# Only these methods are callable remotely
+MODEL_METHODS = {
+    'generate_response', 'analyze_symptoms', 'generate_treatment_plan',
+    'chat_response', 'analyze_health_trends',
+    'speculate_treatment_plan', 'speculate_health_trends', 'cancel_speculation',
+    'stream_symptom_analysis', 'stream_treatment_plan',
+}
+HISTORY_METHODS = {
+    'add_prediction', 'add_treatment_plan', 'add_chat', 'clear', 'flush',
+    'recent_predictions', 'recent_treatment_plans', 'recent_chats', 'search', 'stats',
+}
+PROFILE_METHODS = {'get', 'put', 'delete', 'bulk_import', 'find_by_name', 'find_by_condition', 'count', 'stats'}
+READING_METHODS = {'add', 'add_many', 'flush', 'stats'}
+
+
+class HealthAIService:
+    """Dispatches client calls to the shared model, history store and data cache"""
+
+    def __init__(self, workers: int = None):
+        self.model = GraniteHealthAI()
+        self.history = HistoryStore(config.HISTORY_DB_PATH)
+        self.profiles = ProfileStore(config.PROFILE_DB_PATH, config.PROFILE_CACHE_SIZE)
+        self.data_cache = PatientDataCache(config.DATA_CACHE_MAX_MB * 1024 * 1024)
+        self.readings = VitalsBuffer(config.READINGS_DB_PATH, config.READINGS_LOG_DIR, config.READINGS_FLUSH_SIZE,
+                                     config.READINGS_FLUSH_INTERVAL, config.READINGS_LOG_SYNC,
+                                     on_flush=lambda frames: apply_flushed_readings(self.data_cache, frames))
+        self._slots = threading.BoundedSemaphore(workers or config.SERVICE_WORKERS)
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.busy_seconds = 0.0
+
+    def handle(self, path: str, payload: dict):
+        """Route one request; raises KeyError/ValueError for bad input"""
+        started = time.perf_counter()
+        if path == '/v1/model':
+            # Model calls are bounded and ordered by the model's priority scheduler
+            result = self._dispatch(path, payload)
+        else:
+            with self._slots:
+                result = self._dispatch(path, payload)
+        with self._stats_lock:
+            self.requests += 1
+            self.busy_seconds += time.perf_counter() - started
+        return result
+
+    def _dispatch(self, path: str, payload: dict):
+        if path == '/v1/model':
+            method = payload['method']
+            if method not in MODEL_METHODS:
+                raise ValueError(f"Method not allowed: {method}")
+            result = getattr(self.model, method)(*payload.get('args', []), **payload.get('kwargs', {}))
+            # Streaming methods are returned whole over this JSON transport
+            return list(result) if isinstance(result, types.GeneratorType) else result
+
+        if path == '/v1/history':
+            method = payload['method']
+            if method not in HISTORY_METHODS:
+                raise ValueError(f"Method not allowed: {method}")
+            return getattr(self.history, method)(*payload.get('args', []), **payload.get('kwargs', {}))
+
+        if path == '/v1/profiles':
+            method = payload['method']
+            if method not in PROFILE_METHODS:
+                raise ValueError(f"Method not allowed: {method}")
+            return getattr(self.profiles, method)(*payload.get('args', []), **payload.get('kwargs', {}))
+
+        if path == '/v1/readings':
+            method = payload['method']
+            if method not in READING_METHODS:
+                raise ValueError(f"Method not allowed: {method}")
+            return getattr(self.readings, method)(*payload.get('args', []), **payload.get('kwargs', {}))
+
+        if path == '/v1/data/version':
+            return self.data_cache.version(payload['patient_id'])
+
+        if path == '/v1/data/invalidate':
+            self.data_cache.invalidate(payload['patient_id'])
+            return self.data_cache.version(payload['patient_id'])
+
+        if path == '/v1/data/health':
+            df = self.data_cache.get(
+                payload['patient_id'],
+                lambda: load_health_data(payload['patient_id'], self.readings)
+            )
+            return {
+                'version': self.data_cache.version(payload['patient_id']),
+                'frame': json.loads(df.to_json(orient='split', date_format='iso', index=False))
+            }
+
+        if path == '/v1/stats':
+            return self.stats()
+
+        raise KeyError(path)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                'requests': self.requests,
+                'busy_seconds': self.busy_seconds,
+                'response_cache': self.model.response_cache.stats(),
+                'scheduler': self.model.scheduler_stats(),
+                'speculation': self.model.speculation_stats(),
+                'generation': self.model.generation_stats(),
+                'routing': self.model.routing_stats(),
+                'history': self.history.stats(),
+                'profiles': self.profiles.stats(),
+                'readings': self.readings.stats(),
+                'data_cache': {k: v for k, v in self.data_cache.stats().items() if k != 'by_entry'},
+            }
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """JSON-over-HTTP handler; keeps connections alive between calls"""
+
+    protocol_version = "HTTP/1.1"
+    service = None
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            body, status = {'result': self.service.handle(self.path, payload)}, 200
+        except KeyError as e:
+            body, status = {'error': f"Not found: {e}"}, 404
+        except (ValueError, TypeError) as e:
+            body, status = {'error': str(e)}, 400
+        except Exception as e:
+            body, status = {'error': f"{type(e).__name__}: {e}"}, 500
+
+        data = json.dumps(body, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if config.DEBUG_MODE:
+            super().log_message(format, *args)
+
+
+class UnixHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer listening on a Unix domain socket"""
+
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        self.socket.bind(self.server_address)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+    def get_request(self):
+        request, _ = self.socket.accept()
+        return request, ("unix", 0)
+
+
+def create_server(service: HealthAIService, host: str = "127.0.0.1", port: int = 8765,
+                  socket_path: str = None):
+    """HTTP server bound to a TCP port or a Unix socket"""
+    handler = type('BoundServiceRequestHandler', (ServiceRequestHandler,), {'service': service})
+    if socket_path:
+        server = UnixHTTPServer(socket_path, handler)
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the shared HealthAI service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", help="Listen on a Unix domain socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=config.SERVICE_WORKERS)
+    args = parser.parse_args()
+
+    service = HealthAIService(args.workers)
+    server = create_server(service, args.host, args.port, args.socket)
+    where = f"unix://{args.socket}" if args.socket else f"http://{args.host}:{args.port}"
+    print(f"HealthAI service listening on {where} ({args.workers} workers, backend: {config.MODEL_BACKEND})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.readings.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import streamlit as st
+import http.client
+import io
+import json
+import socket
+import threading
+import pandas as pd
+from urllib.parse import urlparse
+from config import config
+
+# Calls that are safe to send twice. Anything else (history/profile writes,
+# wearable readings, cache invalidation) is not retried after a dropped
+# connection, since the first attempt may already have been applied.
+IDEMPOTENT_PATHS = {'/v1/data/version', '/v1/data/health', '/v1/stats'}
+IDEMPOTENT_METHODS = {
+    '/v1/model': {
+        'generate_response', 'analyze_symptoms', 'generate_treatment_plan', 'chat_response',
+        'analyze_health_trends', 'stream_symptom_analysis', 'stream_treatment_plan',
+    },
+    '/v1/history': {'recent_predictions', 'recent_treatment_plans', 'recent_chats', 'search', 'stats'},
+    '/v1/profiles': {'get', 'find_by_name', 'find_by_condition', 'count', 'stats'},
+    '/v1/readings': {'stats'},
+}
+
+
+def is_idempotent(path: str, payload: dict = None) -> bool:
+    if path in IDEMPOTENT_PATHS:
+        return True
+    return (payload or {}).get('method') in IDEMPOTENT_METHODS.get(path, ())
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix domain socket"""
+
+    def __init__(self, socket_path: str, timeout: float = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ServiceClient:
+    """Keep-alive JSON client for the shared HealthAI service
+
+    SERVICE_URL is either http://host:port or unix:///path/to.sock.
+    Each thread gets its own persistent connection.
+    """
+
+    def __init__(self, url: str, timeout: float = 300):
+        self.url = urlparse(url)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self.url.scheme == 'unix':
+                conn = UnixHTTPConnection(self.url.path, timeout=self.timeout)
+            else:
+                conn = http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def call(self, path: str, payload: dict = None):
+        body = json.dumps(payload or {}, default=str)
+        attempts = 2 if is_idempotent(path, payload) else 1
+        for attempt in range(attempts):
+            conn = self._connection()
+            try:
+                conn.request('POST', path, body=body, headers={'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                data = json.loads(response.read())
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # Stale keep-alive connection: reconnect, and resend only if
+                # the call is safe to repeat
+                conn.close()
+                self._local.conn = None
+                if attempt == attempts - 1:
+                    raise
+        if 'error' in data:
+            raise RuntimeError(f"HealthAI service error: {data['error']}")
+        return data['result']
+
+
+class RemoteHealthAI:
+    """Thin client with the same interface as GraniteHealthAI"""
+
+    def __init__(self, client: ServiceClient):
+        self.client = client
+
+    def _call(self, method: str, *args, **kwargs):
+        return self.client.call('/v1/model', {'method': method, 'args': args, 'kwargs': kwargs})
+
+    def generate_response(self, prompt: str, max_tokens: int = 512, priority: int = 1,
+                          method: str = None, version: str = None) -> str:
+        return self._call('generate_response', prompt, max_tokens=max_tokens, priority=priority,
+                          method=method, version=version)
+
+    def analyze_symptoms(self, symptoms: list, patient_data: dict = None) -> dict:
+        return self._call('analyze_symptoms', symptoms, patient_data)
+
+    def generate_treatment_plan(self, condition: str, patient_data: dict = None) -> dict:
+        return self._call('generate_treatment_plan', condition, patient_data)
+
+    def chat_response(self, user_message: str, chat_history: list = None) -> str:
+        return self._call('chat_response', user_message, chat_history)
+
+    def analyze_health_trends(self, metrics_data: dict, findings: str = None) -> str:
+        return self._call('analyze_health_trends', metrics_data, findings)
+
+    def stream_symptom_analysis(self, symptoms: list, patient_data: dict = None):
+        for key, value in self._call('stream_symptom_analysis', symptoms, patient_data):
+            yield key, value
+
+    def stream_treatment_plan(self, condition: str, patient_data: dict = None):
+        for key, value in self._call('stream_treatment_plan', condition, patient_data):
+            yield key, value
+
+    def speculate_treatment_plan(self, session_id: str, condition: str, patient_data: dict = None) -> bool:
+        return self._call('speculate_treatment_plan', session_id, condition, patient_data)
+
+    def speculate_health_trends(self, session_id: str, metrics_data: dict, findings: str = None) -> bool:
+        return self._call('speculate_health_trends', session_id, metrics_data, findings)
+
+    def cancel_speculation(self, session_id: str, keep_target: str = None):
+        return self._call('cancel_speculation', session_id, keep_target)
+
+    def scheduler_stats(self) -> dict:
+        return self.client.call('/v1/stats')['scheduler']
+
+    def speculation_stats(self) -> dict:
+        return self.client.call('/v1/stats')['speculation']
+
+    def generation_stats(self) -> dict:
+        return self.client.call('/v1/stats')['generation']
+
+    def routing_stats(self) -> dict:
+        return self.client.call('/v1/stats')['routing']
+
+
+class RemoteHistoryStore:
+    """Thin client with the same interface as HistoryStore"""
+
+    def __init__(self, client: ServiceClient):
+        self.client = client
+
+    def __getattr__(self, method: str):
+        def call(*args, **kwargs):
+            return self.client.call('/v1/history', {'method': method, 'args': args, 'kwargs': kwargs})
+        return call
+
+
+class RemoteProfileStore:
+    """Thin client with the same interface as ProfileStore"""
+
+    def __init__(self, client: ServiceClient):
+        self.client = client
+
+    def __getattr__(self, method: str):
+        def call(*args, **kwargs):
+            return self.client.call('/v1/profiles', {'method': method, 'args': args, 'kwargs': kwargs})
+        return call
+
+
+class RemoteVitalsBuffer:
+    """Thin client for writes to and stats of the service's wearable readings buffer"""
+
+    def __init__(self, client: ServiceClient):
+        self.client = client
+
+    def __getattr__(self, method: str):
+        def call(*args, **kwargs):
+            return self.client.call('/v1/readings', {'method': method, 'args': args, 'kwargs': kwargs})
+        return call
+
+
+@st.cache_resource
+def get_service_client():
+    return ServiceClient(config.SERVICE_URL)
+
+
+def fetch_health_data(client: ServiceClient, patient_id: str) -> tuple:
+    """Patient health dataset from the service as (version, DataFrame)"""
+    result = client.call('/v1/data/health', {'patient_id': patient_id})
+    df = pd.read_json(io.StringIO(json.dumps(result['frame'])), orient='split')
+    df['date'] = pd.to_datetime(df['date'])
+    return result['version'], df
@@ -0,0 +1,130 @@
+import streamlit as st
+import threading
+import uuid
+from config import config
+from utils.inference_scheduler import BACKGROUND
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)"""
+    return max(len(text) // 4, 1)
+
+
+class SpeculativeEngine:
+    """Pre-generates likely follow-up requests into the response cache
+
+    A speculation only starts when the inference scheduler has an idle slot,
+    and it runs at background priority, so real requests always go first.
+    Each speculation belongs to a session and targets a page. When the
+    session moves to any other page, queued speculations are cancelled and
+    finished ones that were never used count as wasted tokens.
+    """
+
+    def __init__(self, scheduler, cache, max_inflight: int = 2):
+        self.scheduler = scheduler
+        self.cache = cache
+        self.max_inflight = max_inflight
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.skipped = 0
+        self.cancelled = 0
+        self.completed = 0
+        self.failed = 0
+        self.hits = 0
+        self.generated_tokens = 0
+        self.wasted_tokens = 0
+
+    def submit(self, session_id: str, target: str, key: str, generate) -> bool:
+        """Queue generate() for the cache entry `key` if capacity allows"""
+        job = {'session': session_id, 'target': target, 'state': 'queued', 'tokens': 0}
+
+        def run():
+            try:
+                response = generate()
+            except BaseException:
+                with self._lock:
+                    # A failed job must not keep its slot or block the key
+                    self.failed += 1
+                    if self._jobs.get(key) is job:
+                        del self._jobs[key]
+                raise
+            tokens = estimate_tokens(response)
+            with self._lock:
+                self.completed += 1
+                self.generated_tokens += tokens
+                if self._jobs.get(key) is not job:
+                    # Session left the target page while this was running
+                    self.wasted_tokens += tokens
+                    return
+                job['state'] = 'done'
+                job['tokens'] = tokens
+            self.cache.put(key, response)
+
+        with self._lock:
+            inflight = sum(1 for j in self._jobs.values() if j['state'] == 'queued')
+            if (key in self._jobs or self.cache.contains(key)
+                    or inflight >= self.max_inflight or self.scheduler.idle_slots() == 0):
+                self.skipped += 1
+                return False
+            self._jobs[key] = job
+            self.started += 1
+            job['future'] = self.scheduler.submit(run, BACKGROUND)
+            return True
+
+    def record_hit(self, key: str):
+        """Called on every response cache hit; counts hits on speculated entries"""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job['state'] == 'done':
+                del self._jobs[key]
+                self.hits += 1
+
+    def cancel(self, session_id: str, keep_target: str = None):
+        """Drop a session's speculations for pages other than keep_target"""
+        with self._lock:
+            for key, job in list(self._jobs.items()):
+                if job['session'] != session_id or job['target'] == keep_target:
+                    continue
+                del self._jobs[key]
+                if job['state'] == 'queued':
+                    # A job that already started is counted as wasted when it finishes
+                    if job['future'].cancel():
+                        self.cancelled += 1
+                else:
+                    self.wasted_tokens += job['tokens']
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'started': self.started,
+                'skipped': self.skipped,
+                'cancelled': self.cancelled,
+                'completed': self.completed,
+                'failed': self.failed,
+                'hits': self.hits,
+                'hit_rate': self.hits / self.completed if self.completed else 0.0,
+                'generated_tokens': self.generated_tokens,
+                'wasted_tokens': self.wasted_tokens,
+                'pending': len(self._jobs),
+            }
+
+
+def speculation_session_id() -> str:
+    """Stable id of the current browser session"""
+    if 'speculation_session_id' not in st.session_state:
+        st.session_state.speculation_session_id = uuid.uuid4().hex
+    return st.session_state.speculation_session_id
+
+
+def track_page(page: str):
+    """Cancel this session's speculations aimed at other pages when the user navigates to `page`
+
+    Reruns of the same page (button callbacks, widget changes) keep them.
+    """
+    previous = st.session_state.get('speculation_page')
+    st.session_state.speculation_page = page
+    if previous == page:
+        return
+    if config.SPECULATION_ENABLED and 'ai_model' in st.session_state:
+        st.session_state.ai_model.cancel_speculation(speculation_session_id(), page)
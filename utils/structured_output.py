@@ -0,0 +1,200 @@
+import streamlit as st
+import json
+import re
+from config import config
+
+# Key used for unparseable output, which is then shown as plain text
+RAW_KEY = "_raw"
+
+SYMPTOM_ANALYSIS_FIELDS = {
+    "conditions": {"type": "list", "title": "🩺 Likely Conditions",
+                   "description": "Likely medical conditions, most likely first (top 3-5)", "max_items": 5},
+    "severity": {"type": "enum", "title": "⚖️ Severity", "choices": ["Low", "Moderate", "High"],
+                 "description": "Overall severity level"},
+    "first_aid": {"type": "list", "title": "🩹 First Aid & Precautions",
+                  "description": "Suggested first-aid steps and precautions", "max_items": 6},
+    "urgent_care": {"type": "list", "title": "🚑 When to Seek Urgent Care",
+                    "description": "Warning signs that need urgent care", "max_items": 5},
+}
+
+
+def treatment_plan_fields() -> dict:
+    """Plan sections from Config.TREATMENT_TEMPLATES"""
+    return {
+        name: {"type": "list", "title": name.replace('_', ' ').title(), "description": desc, "max_items": 6}
+        for name, desc in config.TREATMENT_TEMPLATES.items()
+    }
+
+
+def to_json_schema(fields: dict) -> dict:
+    """JSON Schema equivalent of a field spec"""
+    properties = {}
+    for key, spec in fields.items():
+        if spec['type'] == 'enum':
+            properties[key] = {"type": "string", "enum": spec['choices'], "description": spec['description']}
+        else:
+            properties[key] = {"type": "array", "items": {"type": "string"},
+                               "maxItems": spec['max_items'], "description": spec['description']}
+    return {"type": "object", "properties": properties, "required": list(fields)}
+
+
+def schema_instructions(fields: dict) -> str:
+    """Prompt suffix asking for a JSON object in field order"""
+    lines = []
+    for key, spec in fields.items():
+        if spec['type'] == 'enum':
+            kind = "one of " + ", ".join(json.dumps(c) for c in spec['choices'])
+        else:
+            kind = f"array of up to {spec['max_items']} short strings"
+        lines.append(f'- "{key}": {kind} ({spec["description"]})')
+    return ("Respond with only a JSON object with exactly these keys, in this order:\n"
+            + "\n".join(lines)
+            + "\nDo not use markdown or add any text outside the JSON.")
+
+
+def coerce(value, spec: dict):
+    """Normalize a parsed value to its field type"""
+    if spec['type'] == 'enum':
+        text = str(value).strip()
+        for choice in spec['choices']:
+            if choice.lower() == text.lower():
+                return choice
+        return text
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()][:spec['max_items']]
+    return [str(value).strip()] if str(value).strip() else []
+
+
+class IncrementalJSONParser:
+    """Streaming parser that emits top-level members of a JSON object
+
+    feed() takes raw model output chunk by chunk and returns the (key, value)
+    pairs whose values completed in that chunk, so callers can act on each
+    member without waiting for the closing brace. Text before the opening
+    brace (e.g. a markdown fence) is ignored.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.state = 'start'
+        self.key = None
+        self.key_start = None
+        self.value_start = None
+        self.value_kind = None
+        self.done = False
+
+    def _emit(self, end: int, out: list):
+        try:
+            out.append((self.key, json.loads(self.text[self.value_start:end])))
+        except json.JSONDecodeError:
+            pass
+        self.state = 'comma'
+
+    def feed(self, chunk: str) -> list:
+        self.text += chunk
+        out = []
+        text = self.text
+        while self.pos < len(text) and not self.done:
+            c = text[self.pos]
+            if self.state == 'start':
+                if c == '{':
+                    self.depth = 1
+                    self.state = 'key'
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == '\\':
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.state == 'key_string':
+                        self.key = json.loads(text[self.key_start:self.pos + 1])
+                        self.state = 'colon'
+                    elif self.depth == 1 and self.state == 'value' and self.value_kind == 'string':
+                        self._emit(self.pos + 1, out)
+            elif c == '"':
+                self.in_string = True
+                if self.depth == 1 and self.state == 'key':
+                    self.key_start = self.pos
+                    self.state = 'key_string'
+                elif self.depth == 1 and self.state == 'value_wait':
+                    self.value_start, self.value_kind, self.state = self.pos, 'string', 'value'
+            elif c in '{[':
+                if self.depth == 1 and self.state == 'value_wait':
+                    self.value_start, self.value_kind, self.state = self.pos, 'nested', 'value'
+                self.depth += 1
+            elif c in '}]':
+                self.depth -= 1
+                if self.depth == 1 and self.state == 'value' and self.value_kind == 'nested':
+                    self._emit(self.pos + 1, out)
+                elif self.depth == 0:
+                    if self.state == 'value' and self.value_kind == 'scalar':
+                        self._emit(self.pos, out)
+                    self.done = True
+            elif self.depth == 1:
+                if c == ':' and self.state == 'colon':
+                    self.state = 'value_wait'
+                elif c == ',':
+                    if self.state == 'value' and self.value_kind == 'scalar':
+                        self._emit(self.pos, out)
+                    self.state = 'key'
+                elif self.state == 'value_wait' and not c.isspace():
+                    self.value_start, self.value_kind, self.state = self.pos, 'scalar', 'value'
+            self.pos += 1
+        return out
+
+
+def parse_json_object(text: str) -> dict:
+    """Best-effort parse of a complete reply; {} when no JSON object is found"""
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if not match:
+        return {}
+    try:
+        value = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+    return value if isinstance(value, dict) else {}
+
+
+def format_section(key: str, value, fields: dict) -> str:
+    """Markdown for one section"""
+    if key == RAW_KEY:
+        return value
+    spec = fields[key]
+    if spec['type'] == 'enum':
+        return f"**{spec['title']}:** {value}"
+    items = "\n".join(f"- {item}" for item in value) or "- (none)"
+    return f"**{spec['title']}**\n\n{items}"
+
+
+def sections_to_markdown(sections: dict, fields: dict) -> str:
+    """Plain-text rendering for history storage and search"""
+    if RAW_KEY in sections:
+        return sections[RAW_KEY]
+    return "\n\n".join(format_section(key, sections[key], fields) for key in fields if key in sections)
+
+
+def render_structured_stream(events, fields: dict) -> dict:
+    """Render each section the moment it completes; returns all sections"""
+    sections = {}
+    with st.container(border=True):
+        placeholders = {key: st.empty() for key in fields}
+        for key, spec in fields.items():
+            placeholders[key].caption(f"⏳ {spec['title']}...")
+        raw_placeholder = st.empty()
+
+        for key, value in events:
+            sections[key] = value
+            if key == RAW_KEY:
+                raw_placeholder.markdown(value)
+            elif key in placeholders:
+                placeholders[key].markdown(format_section(key, value, fields))
+
+        for key in fields:
+            if key not in sections:
+                placeholders[key].empty()
+    return sections
@@ -0,0 +1,120 @@
+import streamlit as st
+import json
+import operator
+from config import config
+
+VITAL_OPS = {
+    'lt': operator.lt,
+    'lte': operator.le,
+    'gt': operator.gt,
+    'gte': operator.ge,
+}
+
+
+class TriageEngine:
+    """Red-flag rules compiled to bitmasks for instant evaluation
+
+    Each symptom in the rule file and in Config.COMMON_CONDITIONS gets one
+    bit, so a rule's symptom test is a couple of integer operations. Rules
+    are kept in level order, so matches come back most severe first.
+    """
+
+    def __init__(self, rules: list, levels: list, version: int = 1):
+        self.version = version
+        self.levels = list(levels)
+        self._bits = {}
+        self._rules = [self._compile(r) for r in sorted(rules, key=lambda r: self.levels.index(r['level']))]
+        self._conditions = [
+            (name, self._mask(symptoms), len(symptoms))
+            for name, symptoms in config.COMMON_CONDITIONS.items()
+        ]
+
+    @classmethod
+    def load(cls, path: str) -> 'TriageEngine':
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['rules'], data['levels'], data.get('version', 1))
+
+    def _bit(self, symptom: str) -> int:
+        key = symptom.strip().lower()
+        if key not in self._bits:
+            self._bits[key] = 1 << len(self._bits)
+        return self._bits[key]
+
+    def _mask(self, symptoms) -> int:
+        mask = 0
+        for s in symptoms:
+            mask |= self._bit(s)
+        return mask
+
+    def _compile(self, rule: dict) -> tuple:
+        for metric, checks in rule.get('vitals', {}).items():
+            unknown = set(checks) - set(VITAL_OPS)
+            if unknown:
+                raise ValueError(f"Rule {rule['id']}: unknown operator(s) {sorted(unknown)} for {metric}")
+        return (
+            self._mask(rule.get('all_symptoms', [])),
+            self._mask(rule.get('any_symptoms', [])),
+            rule.get('min_severity', 0),
+            frozenset(rule['durations']) if 'durations' in rule else None,
+            tuple((metric, VITAL_OPS[op], limit)
+                  for metric, checks in rule.get('vitals', {}).items()
+                  for op, limit in checks.items()),
+            {k: rule[k] for k in ('id', 'level', 'title', 'message')},
+        )
+
+    def symptom_mask(self, symptoms: list) -> int:
+        """Bitmask of known symptoms; unknown ones cannot match any rule"""
+        bits = self._bits
+        mask = 0
+        for s in symptoms:
+            mask |= bits.get(s.strip().lower(), 0)
+        return mask
+
+    def evaluate(self, symptoms: list, severity: int = 0, duration: str = None,
+                 vitals: dict = None) -> list:
+        """Matching rules, most severe first"""
+        mask = self.symptom_mask(symptoms)
+        vitals = vitals or {}
+        matches = []
+        for all_mask, any_mask, min_severity, durations, checks, info in self._rules:
+            if mask & all_mask != all_mask:
+                continue
+            if any_mask and not mask & any_mask:
+                continue
+            if severity < min_severity:
+                continue
+            if durations is not None and duration not in durations:
+                continue
+            if checks and not all(vitals.get(m) is not None and op(vitals[m], limit)
+                                  for m, op, limit in checks):
+                continue
+            matches.append(info)
+        return matches
+
+    def match_conditions(self, symptoms: list, limit: int = 3) -> list:
+        """COMMON_CONDITIONS ranked by the share of their symptoms reported"""
+        mask = self.symptom_mask(symptoms)
+        scored = [
+            (name, bin(mask & cond_mask).count("1") / n)
+            for name, cond_mask, n in self._conditions
+            if mask & cond_mask
+        ]
+        return sorted(scored, key=lambda x: -x[1])[:limit]
+
+
+@st.cache_resource
+def get_triage_engine():
+    return TriageEngine.load(config.TRIAGE_RULES_PATH)
+
+
+def render_triage_banner(matches: list):
+    """Urgent-care banner for matched red-flag rules"""
+    if not matches:
+        return
+    top = matches[0]
+    lines = [f"**{m['title']}:** {m['message']}" for m in matches[:3]]
+    if top['level'] == 'emergency':
+        st.error("🚨 **Seek emergency care now**\n\n" + "\n\n".join(lines))
+    else:
+        st.warning("⚠️ **Urgent care recommended**\n\n" + "\n\n".join(lines))
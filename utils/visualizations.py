@@ -2,6 +2,7 @@ import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 import pandas as pd
+from utils.compute_pool import correlation_task, get_compute_pool, histogram_task
 
 class HealthVisualizations:
     """Create health data visualizations"""
@@ -11,6 +12,27 @@ class HealthVisualizations:
         """Create line chart for metric trends"""
         fig = go.Figure()
         
+        # Rollup frames carry per-bucket min/max; show them as a range band
+        if f"{metric}_min" in df and f"{metric}_max" in df:
+            fig.add_trace(go.Scatter(
+                x=df['date'],
+                y=df[f"{metric}_max"],
+                mode='lines',
+                line=dict(width=0),
+                showlegend=False,
+                hoverinfo='skip'
+            ))
+            fig.add_trace(go.Scatter(
+                x=df['date'],
+                y=df[f"{metric}_min"],
+                mode='lines',
+                line=dict(width=0),
+                fill='tonexty',
+                fillcolor='rgba(0, 180, 216, 0.15)',
+                name='Min-Max Range',
+                hoverinfo='skip'
+            ))
+        
         fig.add_trace(go.Scatter(
             x=df['date'],
             y=df[metric],
@@ -118,12 +140,24 @@ class HealthVisualizations:
     @staticmethod
     def create_metric_distribution(df: pd.DataFrame, metric: str, title: str):
         """Create histogram for metric distribution"""
-        fig = go.Figure(data=[go.Histogram(
-            x=df[metric],
-            nbinsx=20,
-            marker_color='#00b4d8',
-            opacity=0.7
-        )])
+        pool = get_compute_pool()
+        if len(df) >= pool.min_elements:
+            # Bin large series in the compute pool and ship only the counts
+            counts, edges = pool.run(histogram_task, df[metric].to_numpy(dtype=float), bins=20)
+            fig = go.Figure(data=[go.Bar(
+                x=(edges[:-1] + edges[1:]) / 2,
+                y=counts,
+                width=edges[1] - edges[0],
+                marker_color='#00b4d8',
+                opacity=0.7
+            )])
+        else:
+            fig = go.Figure(data=[go.Histogram(
+                x=df[metric],
+                nbinsx=20,
+                marker_color='#00b4d8',
+                opacity=0.7
+            )])
         
         fig.update_layout(
             title=f"{title} Distribution",
@@ -142,7 +176,9 @@ class HealthVisualizations:
                        'blood_pressure_diastolic', 'blood_glucose', 
                        'temperature', 'oxygen_saturation']
         
-        corr_matrix = df[numeric_cols].corr()
+        corr_matrix = get_compute_pool().run(
+            correlation_task, df[numeric_cols].to_numpy(dtype=float), columns=numeric_cols
+        )
         
         fig = go.Figure(data=go.Heatmap(
             z=corr_matrix.values,
@@ -202,4 +238,80 @@ class HealthVisualizations:
             height=450
         )
         
-        return fig
\ No newline at end of file
+        return fig
+    
+    @staticmethod
+    def create_score_distribution_chart(dist_df: pd.DataFrame):
+        """Create bar chart of patient counts per health score bucket"""
+        colors = ['#ef476f' if s < 60 else '#ffd60a' if s < 80 else '#06d6a0'
+                  for s in dist_df['score']]
+        
+        fig = go.Figure(data=[go.Bar(
+            x=dist_df['score'],
+            y=dist_df['patients'],
+            marker_color=colors
+        )])
+        
+        fig.update_layout(
+            title="Health Score Distribution",
+            xaxis_title="Health Score",
+            yaxis_title="Patients",
+            template='plotly_white',
+            height=400
+        )
+        
+        return fig
+    
+    @staticmethod
+    def create_out_of_range_chart(oor_df: pd.DataFrame):
+        """Create stacked bar chart of patients out of range per metric"""
+        fig = go.Figure()
+        
+        fig.add_trace(go.Bar(
+            x=oor_df['metric'],
+            y=oor_df['pct_low'],
+            name='Low',
+            marker_color='#ffa500'
+        ))
+        fig.add_trace(go.Bar(
+            x=oor_df['metric'],
+            y=oor_df['pct_high'],
+            name='High',
+            marker_color='#ef476f'
+        ))
+        
+        fig.update_layout(
+            title="Patients Out of Range (Latest Reading)",
+            xaxis_title="Metric",
+            yaxis_title="Patients (%)",
+            barmode='stack',
+            template='plotly_white',
+            height=400
+        )
+        
+        return fig
+    
+    @staticmethod
+    def render_static_trends(df: pd.DataFrame, metrics: dict, width: float = 8.0) -> bytes:
+        """PNG of one small trend panel per metric, for PDF/HTML reports
+        
+        Drawn with matplotlib's object API (no browser or pyplot state), so
+        it is safe to call from background report workers.
+        """
+        from io import BytesIO
+        from matplotlib.figure import Figure
+        
+        colors = ['#ef476f', '#06ffa5', '#ffd60a', '#00b4d8', '#118ab2', '#8338ec']
+        fig = Figure(figsize=(width, 1.9 * len(metrics)), dpi=110)
+        axes = fig.subplots(len(metrics), 1, sharex=True, squeeze=False)[:, 0]
+        for i, (ax, (metric, title)) in enumerate(zip(axes, metrics.items())):
+            ax.plot(df['date'], df[metric], color=colors[i % len(colors)], linewidth=1.6)
+            ax.set_title(title, fontsize=10, loc='left')
+            ax.grid(alpha=0.3)
+            ax.tick_params(labelsize=8)
+        fig.autofmt_xdate()
+        fig.tight_layout()
+        
+        buffer = BytesIO()
+        fig.savefig(buffer, format='png')
+        return buffer.getvalue()
@@ -0,0 +1,448 @@
+import streamlit as st
+import array
+import glob
+import math
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from config import config
+from utils.data_handler import HealthDataHandler
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reading_chunks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient_id TEXT NOT NULL,
+    start_ts REAL NOT NULL,
+    end_ts REAL NOT NULL,
+    count INTEGER NOT NULL,
+    metrics TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reading_chunks_patient ON reading_chunks(patient_id, end_ts);
+
+-- Highest log segment whose readings are stored, written with the chunks
+CREATE TABLE IF NOT EXISTS reading_log_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    flushed_segment INTEGER NOT NULL
+);
+"""
+
+METRICS = HealthDataHandler.READING_METRICS
+ROW = len(METRICS) + 1  # timestamp, then one value per metric (NaN when not measured)
+
+# Log record: crc32 and length of the body, then the body
+RECORD_HEADER = struct.Struct("<IH")
+BODY = struct.Struct(f"<{ROW}d")
+
+
+class VitalsBuffer:
+    """Write-behind buffer for wearable readings in front of a SQLite store
+
+    Readings are appended to one compact float array per patient and
+    written out in batches: once READINGS_FLUSH_SIZE readings are buffered,
+    or once the oldest has waited flush_interval seconds. A flush stores one
+    chunk row per patient (timestamps and metric columns as float64 blobs)
+    in a single transaction.
+
+    A batch being flushed stays visible to readings() until its transaction
+    commits. on_flush, if given, is then called with a frame of the flushed
+    readings per patient, e.g. to refresh cached patient data.
+
+    Until it is flushed, every reading is also kept in an append-only log.
+    Concurrent add() calls share one write and fsync of the log (group
+    commit). Each flush starts a new log segment. A flush records the last
+    segment it covers in the same transaction as its chunks, and then
+    deletes the segments. On startup, segments left after a crash are
+    replayed, except those the database already has.
+    """
+
+    def __init__(self, path: str, log_dir: str, flush_size: int = 5000, flush_interval: float = 5.0,
+                 sync: bool = True, latency_window: int = 1000, on_flush=None):
+        self.path = path
+        self.log_dir = log_dir
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.sync = sync
+        self.on_flush = on_flush
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+
+        self._buffers = {}
+        self._inflight = {}
+        self._buffered = 0
+        self._oldest = None
+        self._log_pending = bytearray()
+        self._appended = 0
+        self._synced = 0
+        self._syncing = False
+        self._retired = []
+
+        self._flush_seconds = deque(maxlen=latency_window)
+        self._stats = {'readings': 0, 'flushes': 0, 'size_flushes': 0, 'time_flushes': 0, 'failed_flushes': 0,
+                       'readings_flushed': 0, 'chunks_written': 0, 'log_commits': 0,
+                       'log_seconds': 0.0, 'peak_buffered': 0, 'recovered': 0}
+
+        for directory in (os.path.dirname(path), log_dir):
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        conn.commit()
+        self._committed_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM reading_chunks").fetchone()[0]
+
+        self._segment = self._recover()
+        self._log = open(self._segment_path(self._segment), 'ab')
+        if self._buffered:
+            self.flush()
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="vitals-flusher", daemon=True)
+        self._flusher.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Per-thread connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---- log ----------------------------------------------------------
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.log_dir, f"readings.{number:08d}.log")
+
+    @staticmethod
+    def _encode(patient_id: str, row) -> bytes:
+        key = patient_id.encode('utf-8')
+        body = struct.pack("<H", len(key)) + key + BODY.pack(*row)
+        return RECORD_HEADER.pack(zlib.crc32(body), len(body)) + body
+
+    @staticmethod
+    def _decode_log(data: bytes):
+        """(patient_id, row) records; stops at a torn or corrupt tail"""
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            crc, length = RECORD_HEADER.unpack_from(data, offset)
+            body = data[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + length]
+            if len(body) < length or zlib.crc32(body) != crc:
+                return
+            key_length = struct.unpack_from("<H", body)[0]
+            yield body[2:2 + key_length].decode('utf-8'), BODY.unpack_from(body, 2 + key_length)
+            offset += RECORD_HEADER.size + length
+
+    @staticmethod
+    def _segment_number(segment: str) -> int:
+        return int(os.path.basename(segment).split('.')[1])
+
+    def _recover(self) -> int:
+        """Buffer the readings of log segments left by a previous run; returns the next segment number"""
+        row = self._connect().execute("SELECT flushed_segment FROM reading_log_state").fetchone()
+        flushed = row[0] if row else -1
+        segments = sorted(glob.glob(os.path.join(self.log_dir, "readings.*.log")))
+        for segment in segments:
+            if self._segment_number(segment) <= flushed:
+                # Committed before a crash stopped the flush from deleting it
+                os.remove(segment)
+                continue
+            with open(segment, 'rb') as f:
+                for patient_id, row in self._decode_log(f.read()):
+                    self._buffer(patient_id, [row])
+                    self._stats['recovered'] += 1
+            self._retired.append(segment)
+        last = max([flushed] + [self._segment_number(segment) for segment in segments])
+        return last + 1
+
+    def _write_log(self, data: bytes):
+        self._log.write(data)
+        self._log.flush()
+        if self.sync:
+            os.fsync(self._log.fileno())
+
+    def _commit_log(self, upto: int):
+        """Wait until the log holds record `upto`; the first waiter writes everyone's records"""
+        with self._cond:
+            while self._synced < upto:
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+                data, target = bytes(self._log_pending), self._appended
+                self._log_pending.clear()
+                self._syncing = True
+                self._cond.release()
+                started = time.perf_counter()
+                written = False
+                try:
+                    self._write_log(data)
+                    written = True
+                finally:
+                    self._cond.acquire()
+                    if written:
+                        self._synced = target
+                        self._stats['log_commits'] += 1
+                        self._stats['log_seconds'] += time.perf_counter() - started
+                    else:
+                        self._log_pending[:0] = data
+                    self._syncing = False
+                    self._cond.notify_all()
+
+    # ---- writes -------------------------------------------------------
+
+    @staticmethod
+    def _row(reading: dict) -> tuple:
+        unknown = set(reading) - set(METRICS) - {'timestamp'}
+        if unknown:
+            raise ValueError(f"Unknown reading metric(s): {sorted(unknown)}")
+        timestamp = reading.get('timestamp')
+        if timestamp is None:
+            timestamp = time.time()
+        elif isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp).timestamp()
+        values = [reading.get(m) for m in METRICS]
+        return (float(timestamp),) + tuple(math.nan if v is None else float(v) for v in values)
+
+    def _buffer(self, patient_id: str, rows):
+        values = self._buffers.get(patient_id)
+        if values is None:
+            values = self._buffers[patient_id] = array.array('d')
+        for row in rows:
+            values.extend(row)
+        self._buffered += len(rows)
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        self._stats['peak_buffered'] = max(self._stats['peak_buffered'], self._buffered)
+
+    def add_many(self, patient_id: str, readings: list) -> int:
+        """Buffer readings ({metric: value, 'timestamp': epoch seconds or ISO}) for one patient
+
+        Returns once they are in the log, so they survive a crash.
+        """
+        rows = [self._row(r) for r in readings]
+        if not rows:
+            return 0
+        with self._cond:
+            self._buffer(patient_id, rows)
+            for row in rows:
+                self._log_pending += self._encode(patient_id, row)
+            self._appended += len(rows)
+            self._stats['readings'] += len(rows)
+            upto = self._appended
+            if self._buffered >= self.flush_size:
+                self._wake.set()
+        self._commit_log(upto)
+        return len(rows)
+
+    def add(self, patient_id: str, reading: dict) -> int:
+        return self.add_many(patient_id, [reading])
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(timeout=min(self.flush_interval, 1.0))
+            self._wake.clear()
+            with self._cond:
+                buffered, oldest = self._buffered, self._oldest
+            if buffered >= self.flush_size:
+                self.flush('size_flushes')
+            elif buffered and time.monotonic() - oldest >= self.flush_interval:
+                self.flush('time_flushes')
+
+    def flush(self, reason: str = None) -> int:
+        """Write every buffered reading to SQLite; returns how many were written"""
+        with self._flush_lock:
+            with self._cond:
+                while self._syncing:
+                    self._cond.wait()
+                # Records not yet in the log belong to the segment being retired
+                if self._log_pending:
+                    self._write_log(bytes(self._log_pending))
+                    self._log_pending.clear()
+                    self._synced = self._appended
+                    self._cond.notify_all()
+                buffers, count = self._buffers, self._buffered
+                self._buffers, self._buffered, self._oldest = {}, 0, None
+                if not count:
+                    return 0
+                self._inflight = buffers
+                self._log.close()
+                retired = self._retired + [self._segment_path(self._segment)]
+                self._segment += 1
+                self._log = open(self._segment_path(self._segment), 'ab')
+                self._retired = []
+
+            started = time.perf_counter()
+            try:
+                committed_id = self._write_chunks(buffers, max(map(self._segment_number, retired)))
+            except sqlite3.Error as e:
+                print(f"Error flushing readings: {e}")
+                with self._cond:
+                    self._inflight = {}
+                    # Retry with the next flush; the retired segments keep the readings durable
+                    for patient_id, values in buffers.items():
+                        self._buffer(patient_id, [values[i:i + ROW] for i in range(0, len(values), ROW)])
+                    self._retired = retired + self._retired
+                    self._stats['failed_flushes'] += 1
+                return 0
+
+            with self._cond:
+                self._inflight = {}
+                self._committed_id = committed_id
+            for segment in retired:
+                os.remove(segment)
+            if self.on_flush is not None:
+                try:
+                    self.on_flush({patient_id: self._ordered(self._frame(values))
+                                   for patient_id, values in buffers.items()})
+                except Exception as e:
+                    print(f"Error in on_flush: {e}")
+            with self._cond:
+                self._flush_seconds.append(time.perf_counter() - started)
+                self._stats['flushes'] += 1
+                self._stats['readings_flushed'] += count
+                self._stats['chunks_written'] += len(buffers)
+                if reason:
+                    self._stats[reason] += 1
+            return count
+
+    def _write_chunks(self, buffers: dict, segment: int) -> int:
+        """Store one chunk per patient and mark log segments up to `segment` as stored
+
+        Returns the id of the last chunk written.
+        """
+        rows = []
+        metrics = ",".join(METRICS)
+        for patient_id, values in buffers.items():
+            columns = np.frombuffer(values, dtype=np.float64).reshape(-1, ROW)
+            columns = columns[np.argsort(columns[:, 0], kind='stable')].T
+            rows.append((patient_id, float(columns[0, 0]), float(columns[0, -1]), columns.shape[1], metrics,
+                         np.ascontiguousarray(columns, dtype='<f8').tobytes()))
+        conn = self._connect()
+        with conn:
+            conn.executemany("INSERT INTO reading_chunks (patient_id, start_ts, end_ts, count, metrics, data) "
+                             "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("INSERT OR REPLACE INTO reading_log_state (id, flushed_segment) VALUES (1, ?)", (segment,))
+            return conn.execute("SELECT MAX(id) FROM reading_chunks").fetchone()[0]
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._flusher.join()
+        self.flush()
+        with self._cond:
+            self._log.close()
+
+    # ---- reads --------------------------------------------------------
+
+    @staticmethod
+    def _frame(values) -> pd.DataFrame:
+        """Readings from a flat float array, unsorted, with epoch timestamps"""
+        rows = np.frombuffer(values, dtype=np.float64).reshape(-1, ROW).copy()
+        return pd.DataFrame(rows, columns=['timestamp'] + METRICS)
+
+    def readings(self, patient_id: str, start: float = None, end: float = None,
+                 buffered: bool = True) -> pd.DataFrame:
+        """Readings of a patient ordered by time
+
+        By default buffered readings and a batch being flushed are included.
+        With buffered=False only committed readings are returned, and never
+        while a flush is between its commit and its on_flush call, so
+        callers see each batch either before or after on_flush handled it.
+        """
+        if not buffered:
+            with self._flush_lock:
+                return self._readings(patient_id, start, end, None, [])
+        with self._cond:
+            # Chunks committed after this snapshot are still in the pending arrays
+            committed_id = self._committed_id
+            pending = [self._frame(b[patient_id]) for b in (self._inflight, self._buffers) if b.get(patient_id)]
+        return self._readings(patient_id, start, end, committed_id, pending)
+
+    def _readings(self, patient_id: str, start: float, end: float, committed_id, pending: list) -> pd.DataFrame:
+        sql = "SELECT metrics, count, data FROM reading_chunks WHERE patient_id = ?"
+        params = [patient_id]
+        if committed_id is not None:
+            sql += " AND id <= ?"
+            params.append(committed_id)
+        if start is not None:
+            sql += " AND end_ts >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND start_ts <= ?"
+            params.append(end)
+        frames = []
+        for metrics, count, data in self._connect().execute(sql, params).fetchall():
+            names = ['timestamp'] + metrics.split(",")
+            columns = np.frombuffer(data, dtype='<f8').reshape(len(names), count)
+            frames.append(pd.DataFrame(dict(zip(names, columns))))
+        frames += pending
+
+        if not frames:
+            return pd.DataFrame(columns=['timestamp'] + METRICS)
+        df = pd.concat(frames, ignore_index=True)
+        if start is not None:
+            df = df[df['timestamp'] >= start]
+        if end is not None:
+            df = df[df['timestamp'] <= end]
+        return self._ordered(df)
+
+    @staticmethod
+    def _ordered(df: pd.DataFrame) -> pd.DataFrame:
+        df = df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+        return df
+
+    def stats(self) -> dict:
+        """Backlog, flush latency (mean, p50, p95, max) and log group commit figures"""
+        with self._cond:
+            stats = dict(self._stats)
+            latencies = sorted(self._flush_seconds)
+            stats['buffered'] = self._buffered
+            stats['buffered_patients'] = len(self._buffers)
+            stats['oldest_buffered_seconds'] = time.monotonic() - self._oldest if self._oldest else 0.0
+            stats['log_bytes'] = self._log.tell() + len(self._log_pending) if not self._log.closed else 0
+        ordered = latencies or [0.0]
+        stats['flush_avg_seconds'] = sum(latencies) / len(latencies) if latencies else 0.0
+        stats['flush_p50_seconds'] = ordered[len(ordered) // 2]
+        stats['flush_p95_seconds'] = ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+        stats['flush_max_seconds'] = ordered[-1]
+        commits = stats['log_commits']
+        stats['readings_per_log_commit'] = stats['readings'] / commits if commits else 0.0
+        stats['log_commit_avg_seconds'] = stats.pop('log_seconds') / commits if commits else 0.0
+        return stats
+
+
+@st.cache_resource
+def get_vitals_buffer():
+    if config.SERVICE_URL:
+        from utils.service_client import RemoteVitalsBuffer, get_service_client
+        return RemoteVitalsBuffer(get_service_client())
+    from utils.data_cache import apply_flushed_readings, get_data_cache
+    cache = get_data_cache()
+    return VitalsBuffer(config.READINGS_DB_PATH, config.READINGS_LOG_DIR, config.READINGS_FLUSH_SIZE,
+                        config.READINGS_FLUSH_INTERVAL, config.READINGS_LOG_SYNC,
+                        on_flush=lambda frames: apply_flushed_readings(cache, frames))
+
+
+def render_vitals_debug():
+    """Wearable buffer backlog and flush latency in the sidebar when DEBUG_MODE is on"""
+    if not config.DEBUG_MODE:
+        return
+    stats = get_vitals_buffer().stats()
+    with st.expander("🐞 Wearable Readings"):
+        st.metric("Buffered", f"{stats['buffered']} readings",
+                  f"oldest {stats['oldest_buffered_seconds']:.1f}s", delta_color="off")
+        st.metric("Flush Latency", f"{stats['flush_p50_seconds'] * 1000:.1f} ms p50",
+                  f"p95 {stats['flush_p95_seconds'] * 1000:.1f} ms", delta_color="off")
+        st.caption(f"{stats['readings']} received • {stats['flushes']} flushes • "
+                   f"{stats['readings_per_log_commit']:.1f} readings per log commit • "
+                   f"{stats['log_bytes'] / 1024:.0f} KB log")